@@ -63,10 +63,30 @@ prod_shedules = {
         "task": "management.tasks.record_bucket_ids",
         "schedule": 60.0 * 60.0 * 24.0,  # once a day
     },
+    "refresh-bucket-memberships": {
+        "task": "management.tasks.refresh_bucket_memberships",
+        "schedule": 60.0 * 60.0,  # every hour
+    },
+    "update-statistic-rollups": {
+        "task": "management.tasks.update_statistic_rollups",
+        "schedule": 60.0 * 60.0,  # every hour
+    },
+    "expire-presence": {
+        "task": "chat.tasks.expire_presence",
+        "schedule": 60.0,  # every minute
+    },
+    "sync-match-counters": {
+        "task": "management.tasks.sync_match_counters",
+        "schedule": 60.0 * 60.0 * 24.0,  # once a day
+    },
     "hourly-check-banner-activation": {
         "task": "management.tasks.hourly_check_banner_activation",
         "schedule": 60.0 * 60.0,  # every hour
     },
+    "incremental-update-matching-scores": {
+        "task": "management.tasks.incremental_update_matching_scores",
+        "schedule": 60.0 * 15.0,  # every 15 minutes
+    },
     "daily-fix-unusually-long-livekit-sessions": {
         "task": "video.tasks.daily_fix_unusually_long_livekit_sessions",
         "schedule": 60.0 * 60.0 * 24.0,  # once a day
@@ -115,6 +115,17 @@ USE_WHITENOISE = os.environ.get("DJ_USE_WHITENOISE", "false").lower() in ("true"
 
 EMPHIRIAL = os.environ.get("EMPHIRIAL", "0") == "1"
 
+# Local postal code -> (lat, lon) table for distance scoring, created from pgeocode if missing.
+# Lives in a writable cache directory ( next to pgeocode's own download ), not in the source tree
+POSTAL_CODE_INDEX_FILE = os.environ.get(
+    "DJ_POSTAL_CODE_INDEX_FILE",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "little-world",
+        "postal_codes_de.csv",
+    ),
+)
+
 USE_LANDINGPAGE_REDIRECT = os.environ.get("DJ_USE_LANDINGPAGE_REDIRECT", "false").lower() in ("true", "1", "t")
 LANDINGPAGE_REDIRECT_URL = os.environ.get("DJ_LANDINGPAGE_REDIRECT_URL", "https://home.little-world.com")
 USE_LANDINGPAGE_PLACEHOLDER = os.environ.get("DJ_USE_LANDINGPAGE_PLACEHOLDER", "true").lower() in ("true", "1", "t")
@@ -1,4 +1,4 @@
-from django.db.models import Exists, Max, OuterRef, Q
+from django.db.models import Exists, OuterRef, Q
 from drf_spectacular.utils import extend_schema, inline_serializer
 from management.helpers import DetailedPaginationMixin
 from management.models.matches import Match
@@ -11,7 +11,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from chat.models import Chat, ChatSerializer, Message, MessageSerializer
+from chat.models import Chat, ChatSerializer, ChatUnreadCount, MessageSerializer
 
 
 def chat_res_seralizer(many=True):
@@ -52,10 +52,11 @@ class ChatsModelViewSet(viewsets.ModelViewSet):
             State.ExtraUserPermissionChoices.MATCHING_USER
         )
 
+        # everything the `ChatSerializer` needs is annotated, so a page is loaded with one query
         queryset = (
-            Chat.objects.filter(Q(u1=self.request.user) | Q(u2=self.request.user))
+            Chat.annotate_serializer_data(Chat.objects.filter(Q(u1=self.request.user) | Q(u2=self.request.user)))
             .annotate(
-                has_messages=Exists(Message.objects.filter(chat_id=OuterRef("pk"))),
+                has_messages=Q(newest_message_id__isnull=False),
                 is_active_match=Exists(
                     Match.objects.filter(
                         Q(user1=OuterRef("u1"), user2=OuterRef("u2")) | Q(user1=OuterRef("u2"), user2=OuterRef("u1")),
@@ -67,15 +68,19 @@ class ChatsModelViewSet(viewsets.ModelViewSet):
         )
 
         if is_matching_user:
-            queryset = queryset.annotate(
-                newest_message_time=Max("message__created"),
-                has_messages=Exists(Message.objects.filter(chat_id=OuterRef("pk"))),
-            ).order_by("-has_messages", "-newest_message_time", "-created")
+            queryset = queryset.order_by("-has_messages", "-newest_message_created", "-created")
         else:
-            queryset = queryset.annotate(newest_message_time=Max("message__created")).order_by("-newest_message_time")
+            queryset = queryset.order_by("-newest_message_created")
 
         return queryset
 
+    @extend_schema(
+        responses={200: inline_serializer(name="ChatsUnreadCount", fields={"unread_count": serializers.IntegerField()})}
+    )
+    @action(detail=False, methods=["get"])
+    def unread_count(self, request):
+        return Response({"unread_count": ChatUnreadCount.total(request.user)})
+
     @extend_schema(responses={200: chat_res_seralizer(many=False)})
     @action(detail=False, methods=["post"])
     def get_by_uuid(self, request, chat_uuid=None):
@@ -1,18 +1,22 @@
 import json
+from collections import OrderedDict
 
-from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from management.helpers import DetailedPaginationMixin, UserStaffRestricedModelViewsetMixin
 from management.models.matches import Match
-from management.tasks import send_email_background
 from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from chat.models import Chat, ChatSerializer, Message, MessageAttachment, MessageSerializer
+from chat.models import Chat, ChatUnreadCount, Message, MessageAttachment, MessageSerializer
+from chat.tasks import process_sent_message
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -22,6 +26,110 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination over (`created`, `id`), newest messages first, without COUNT or OFFSET queries.
+    - `?cursor=true`: the newest `page_size` messages
+    - `?before=<message uuid>`: the `page_size` messages older than that message, to scroll back in the history
+    - `?after=<message uuid>`: the `page_size` messages newer than that message, to sync after a reconnect
+    `has_more` tells if there are more messages in the requested direction, `next_before` / `next_after` are the
+    uuids to request the next older / newer page with.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    query_params = ["cursor", "before", "after"]
+
+    @classmethod
+    def is_requested(cls, request):
+        return any(param in request.query_params for param in cls.query_params)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_anchor(self, queryset, uuid):
+        try:
+            return queryset.values("created", "id").get(uuid=uuid)
+        except (Message.DoesNotExist, ValueError, ValidationError):
+            raise NotFound("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        before = request.query_params.get("before")
+        after = request.query_params.get("after")
+
+        self.after = after
+        if after:
+            anchor = self.get_anchor(queryset, after)
+            queryset = queryset.filter(
+                Q(created__gt=anchor["created"]) | Q(created=anchor["created"], id__gt=anchor["id"])
+            ).order_by("created", "id")
+        else:
+            if before:
+                anchor = self.get_anchor(queryset, before)
+                queryset = queryset.filter(
+                    Q(created__lt=anchor["created"]) | Q(created=anchor["created"], id__lt=anchor["id"])
+                )
+            queryset = queryset.order_by("-created", "-id")
+
+        # one extra message tells if there is another page, without counting
+        page = list(queryset[: self.page_size + 1])
+        self.has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if after:
+            page.reverse()
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        # after a message there are always older messages, the anchor at least
+        has_older = bool(self.page) if self.after else self.has_more
+        return Response(
+            OrderedDict(
+                [
+                    ("results", data),
+                    ("page_size", self.page_size),
+                    ("has_more", self.has_more),
+                    ("next_before", self.page[-1].uuid if has_older else None),
+                    ("next_after", self.page[0].uuid if self.page else self.after),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "results": schema,
+                "page_size": {"type": "integer", "example": 20},
+                "has_more": {
+                    "type": "boolean",
+                    "description": "If there are more messages in the requested direction",
+                },
+                "next_before": {
+                    "type": "string",
+                    "format": "uuid",
+                    "nullable": True,
+                    "description": "Message uuid to request the next older page with `?before=`",
+                },
+                "next_after": {
+                    "type": "string",
+                    "format": "uuid",
+                    "nullable": True,
+                    "description": "Message uuid to request newer messages with `?after=`",
+                },
+            },
+        }
+
+
 class SendAttachmentSerializer(serializers.Serializer):
     file = serializers.FileField()
 
@@ -44,17 +152,27 @@ class MessagesModelViewSet(UserStaffRestricedModelViewsetMixin, viewsets.ModelVi
     queryset = Message.objects.all().order_by("created")
     resp_chat_403 = Response({"error": "Chat doesn't exist or you have no permission to interact with it!"}, status=403)
 
+    @property
+    def paginator(self):
+        # page numbers ( with a COUNT ) by default e.g. for the admin panel, keyset pages for `?cursor`, `?before`, `?after`
+        if not hasattr(self, "_paginator"):
+            if MessageCursorPagination.is_requested(self.request):
+                self._paginator = MessageCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def filter_queryset(self, queryset):
         print("FILTERING")
         if hasattr(self, "chat_uuid"):
             if self.request.user.is_staff:
-                qs = Chat.objects.get(uuid=self.chat_uuid).get_messages().order_by("-created")
+                qs = Chat.objects.get(uuid=self.chat_uuid).get_messages().order_by("-created", "-id")
                 return qs
             else:
                 qs = (
                     Chat.objects.get(Q(u1=self.request.user) | Q(u2=self.request.user), uuid=self.chat_uuid)
                     .get_messages()
-                    .order_by("-created")
+                    .order_by("-created", "-id")
                 )
                 return qs
         return super().filter_queryset(queryset)
@@ -65,7 +183,7 @@ class MessagesModelViewSet(UserStaffRestricedModelViewsetMixin, viewsets.ModelVi
         return super().list(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Message.objects.filter(chat__in=Chat.get_chats(self.request.user)).order_by("-created")
+        return Message.objects.filter(chat__in=Chat.get_chats(self.request.user)).order_by("-created", "-id")
 
     @action(detail=True, methods=["post"])
     def read(self, request, pk=None):
@@ -77,8 +195,10 @@ class MessagesModelViewSet(UserStaffRestricedModelViewsetMixin, viewsets.ModelVi
         if not ((obj.sender != request.user) and (obj.recipient == request.user)):
             return Response({"error": "You can't mark this message as read!"}, status=400)
 
-        obj.read = True
-        obj.save()
+        if not obj.read:
+            obj.read = True
+            obj.save()
+            ChatUnreadCount.decrement(obj.chat, request.user)
         return Response(self.serializer_class(obj).data, status=200)
 
     @extend_schema(request=SendMessageSerializer)
@@ -98,6 +218,7 @@ class MessagesModelViewSet(UserStaffRestricedModelViewsetMixin, viewsets.ModelVi
 
         messages = chat.get_messages().filter(read=False, recipient=request.user)
         messages.update(read=True)
+        ChatUnreadCount.reset(chat, request.user)
 
         from chat.consumers.messages import MessagesReadChat
 
@@ -114,57 +235,23 @@ class MessagesModelViewSet(UserStaffRestricedModelViewsetMixin, viewsets.ModelVi
         if not chat_uuid:
             return Response({"error": "chat_uuid is required"}, status=400)
 
-        # Use select_related to reduce database queries, but keep safe existence check
-        chat = Chat.objects.select_related().filter(uuid=chat_uuid)
-        if not chat.exists():
-            return self.resp_chat_403
-        chat = chat.first()
-
-        if not chat.is_participant(request.user):
+        # one query for the chat, both participants with their state and the match that allows sending
+        chat = (
+            Chat.objects.filter(Q(u1=request.user) | Q(u2=request.user), uuid=chat_uuid)
+            .select_related("u1__state", "u2__state")
+            .annotate(match_id=Subquery(Match.get_match(OuterRef("u1"), OuterRef("u2")).values("pk")[:1]))
+            .first()
+        )
+        if chat is None:
             return self.resp_chat_403
 
         serializer = SendMessageSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        partner = chat.get_partner(request.user)
-
         # Check if the users are still matched, otherwise no new messages can be send
-        match = Match.get_match(request.user, partner)
-        if not match.exists():
+        if chat.match_id is None:
             return self.resp_chat_403
-        match = match.first()
-
-        # Update match data
-        match.total_messages_counter += 1
-        match.latest_interaction_at = timezone.now()
-        match.save()
-
-        # Email notification logic - check if recipient should be notified
-        creation_time = timezone.now()
-        recipient_was_email_notified = False
-
-        # Simplified notification check - only get the latest one
-        latest_notified_message = (
-            Message.objects.filter(
-                recipient=partner,
-                recipient_notified=True,
-            )
-            .order_by("-created")
-            .first()
-        )
-
-        def notify_recipient_email():
-            send_email_background.delay("new-messages", user_id=partner.id)
-
-        if latest_notified_message:
-            # Min 5 min delay between notifications!
-            time_since_last_notif = (creation_time - latest_notified_message.created).total_seconds()
-            if time_since_last_notif > 300:
-                recipient_was_email_notified = True
-                notify_recipient_email()
-        else:
-            recipient_was_email_notified = True
-            notify_recipient_email()
+        sender, partner = (chat.u1, chat.u2) if chat.u1_id == request.user.pk else (chat.u2, chat.u1)
 
         message_text = serializer.validated_data.get("text", "")
 
@@ -204,30 +291,25 @@ class MessagesModelViewSet(UserStaffRestricedModelViewsetMixin, viewsets.ModelVi
 
             is_parsable = True
 
-        # Create message - single database operation
-        message = Message.objects.create(
-            chat=chat,
-            sender=request.user,
-            recipient=partner,
-            recipient_notified=recipient_was_email_notified,
-            text=final_message_text,
-            attachments=attachment,
-            parsable_message=is_parsable,
-        )
-
-        # Optimize: Use existing serialized data instead of re-serializing
-        serialized_message = self.serializer_class(message).data
-
-        # Send websocket message
-        from chat.consumers.messages import NewMessage
+        with transaction.atomic():
+            now = timezone.now()
+            Match.objects.filter(pk=chat.match_id).update(
+                total_messages_counter=F("total_messages_counter") + 1, latest_interaction_at=now, updated_at=now
+            )
+            message = Message.objects.create(
+                chat=chat,
+                sender=sender,
+                recipient=partner,
+                text=final_message_text,
+                attachments=attachment,
+                parsable_message=is_parsable,
+            )
+            ChatUnreadCount.increment(chat, partner)
 
-        NewMessage(
-            message=serialized_message,
-            chat_id=chat.uuid,
-            meta_chat_obj=ChatSerializer(chat, context={"user": partner}).data,
-        ).send(partner.hash)
+            # the email notification & the websocket event for the partner don't delay the response
+            transaction.on_commit(lambda: process_sent_message.delay(message.pk))
 
-        return Response(serialized_message, status=200)
+        return Response(self.serializer_class(message).data, status=200)
 
     # Keep the send_attachment method for backward compatibility
     @extend_schema(request=SendAttachmentSerializer)
@@ -0,0 +1,153 @@
+"""
+Benchmark of the chat list endpoint ( `ChatsModelViewSet.list` ) for users with many chats.
+
+`create_synthetic_chats` creates a user with `amount` matched partners, one chat and a few ( partially unread )
+messages per partner. `run_chat_list_benchmark` then requests pages of the chat list `repeats` times and reports
+p50 / p95 wall time and queries per request of:
+- `annotated`: the endpoint, chats annotated with `Chat.annotate_serializer_data`
+- `per_chat`: the same page serialized from plain chat instances, every chat queries its own data
+
+Used by `manage.py benchmark_chat_list`, see there for running it with different amounts of chats.
+
+`run_send_message_benchmark` times sending messages ( `MessagesModelViewSet.send` ) the same way:
+- `send`: the request the sender waits for
+- `process_sent_message`: the email notification & websocket event, run after the commit in the background
+"""
+
+import random
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from django.db import connection
+from management.helpers.query_logger import QueryLogger
+from management.models.matches import Match
+from management.models.user import User
+from management.scores_benchmark import create_synthetic_population
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chat.api.chats import ChatsModelViewSet
+from chat.api.messages import MessagesModelViewSet
+from chat.models import Chat, ChatSerializer, ChatUnreadCount, Message
+from chat.tasks import process_sent_message
+
+
+@dataclass
+class ChatListTiming:
+    name: str
+    chats: int
+    page_size: int
+    p50_ms: float
+    p95_ms: float
+    queries: int
+
+    def dict(self):
+        return asdict(self)
+
+
+@dataclass
+class SendMessageTiming:
+    name: str
+    messages: int
+    p50_ms: float
+    p95_ms: float
+    queries: int
+
+    def dict(self):
+        return asdict(self)
+
+
+def create_synthetic_chats(amount, messages_per_chat=3, seed=42):
+    """
+    Bulk creates a user with `amount` matched partners & chats, returns the user
+    """
+    rand = random.Random(seed)
+    user_id, *partner_ids = create_synthetic_population(amount + 1, seed=seed)
+    user = User.objects.get(pk=user_id)
+
+    Match.objects.bulk_create([Match(user1_id=user_id, user2_id=partner_id) for partner_id in partner_ids])
+    chats = Chat.objects.bulk_create([Chat(u1_id=user_id, u2_id=partner_id) for partner_id in partner_ids])
+    if any(chat.pk is None for chat in chats):
+        chats = list(Chat.objects.filter(u1_id=user_id))
+
+    messages = []
+    for chat in chats:
+        for i in range(rand.randint(1, messages_per_chat)):
+            sender, recipient = (chat.u1_id, chat.u2_id) if i % 2 else (chat.u2_id, chat.u1_id)
+            messages.append(
+                Message(
+                    chat=chat, sender_id=sender, recipient_id=recipient, text=f"Message {i}", read=rand.random() < 0.5
+                )
+            )
+    Message.objects.bulk_create(messages, batch_size=1000)
+    ChatUnreadCount.repair(chats=chats)
+    return user
+
+
+def timed_calls(repeats, call):
+    """
+    Calls `call` `repeats` times, returns the p50 & p95 wall time in ms and the max queries of a call
+    """
+    durations = []
+    query_counts = []
+    for _ in range(repeats):
+        query_logger = QueryLogger()
+        start = time.monotonic()
+        with connection.execute_wrapper(query_logger):
+            call()
+        durations.append(1000 * (time.monotonic() - start))
+        query_counts.append(len(query_logger.queries))
+    return float(np.percentile(durations, 50)), float(np.percentile(durations, 95)), max(query_counts)
+
+
+def timed_requests(name, amount, page_size, repeats, request_page):
+    return ChatListTiming(name, amount, page_size, *timed_calls(repeats, request_page))
+
+
+def run_chat_list_benchmark(amount, page_size=50, repeats=20, seed=42):
+    user = create_synthetic_chats(amount, seed=seed)
+    factory = APIRequestFactory()
+
+    def request_annotated():
+        request = factory.get("/api/chats/", {"page_size": page_size})
+        force_authenticate(request, user=user)
+        response = ChatsModelViewSet.as_view({"get": "list"})(request)
+        assert response.status_code == 200, response.data
+
+    def request_per_chat():
+        request = factory.get("/api/chats/")
+        request.user = user
+        chats = Chat.objects.filter(u1=user).order_by("-created")[:page_size]
+        ChatSerializer(chats, many=True, context={"request": request}).data
+
+    return [
+        timed_requests("annotated", amount, page_size, repeats, request_annotated),
+        timed_requests("per_chat", amount, page_size, repeats, request_per_chat),
+    ]
+
+
+def run_send_message_benchmark(repeats=20, seed=42):
+    """
+    Sends `repeats` messages in one chat, the background step runs for the sent messages afterwards.
+    The partner was notified just before, so no notification emails are dispatched.
+    """
+    user = create_synthetic_chats(1, seed=seed)
+    chat = Chat.objects.get(u1=user)
+    Message.objects.create(chat=chat, sender=user, recipient=chat.u2, text="Notified", recipient_notified=True)
+    factory = APIRequestFactory()
+    sent = []
+
+    def send():
+        request = factory.post(f"/api/messages/{chat.uuid}/send/", {"text": "Hello"})
+        force_authenticate(request, user=user)
+        response = MessagesModelViewSet.as_view({"post": "send"})(request, chat_uuid=chat.uuid)
+        assert response.status_code == 200, response.data
+        sent.append(response.data["uuid"])
+
+    send_timing = SendMessageTiming("send", repeats, *timed_calls(repeats, send))
+
+    message_ids = iter(Message.objects.filter(uuid__in=sent).order_by("created", "id").values_list("pk", flat=True))
+    process_timing = SendMessageTiming(
+        "process_sent_message", repeats, *timed_calls(repeats, lambda: process_sent_message(next(message_ids)))
+    )
+    return [send_timing, process_timing]
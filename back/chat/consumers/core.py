@@ -1,5 +1,13 @@
+import asyncio
+
 from channels.generic.websocket import AsyncWebsocketConsumer
-from chat.consumers.db_ops import connect_user, disconnect_user, get_all_chat_user_ids, is_staff_or_matching
+from chat.consumers.db_ops import (
+    connect_user,
+    disconnect_user,
+    get_online_partner_ids,
+    heartbeat_user,
+    is_staff_or_matching,
+)
 from chat.consumers.messages import (
     InBlockIncomingCall,
     InMatchProposalAdded,
@@ -15,6 +23,7 @@ from chat.consumers.messages import (
     PostCallSurvey,
     PreMatchingAppointmentBooked,
 )
+from chat.presence import HEARTBEAT_INTERVAL
 
 UNAUTH_REJECT_CODE: int = 4001
 
@@ -25,8 +34,13 @@ class CoreConsumer(AsyncWebsocketConsumer):
     """
     Every user that connects joins:
     - `<user_pk>` group: used to deliver general user related update like: new match / incoming call
+
+    While the socket is open the users presence is refreshed every `HEARTBEAT_INTERVAL` ( see `chat.presence` ),
+    partners are only notified when the user goes online / offline and only if they are online themselves.
     """
 
+    heartbeat_task = None
+
     async def connect(self, **kwargs):
         """
         Handle all connections, generally we only permit authenticated users!
@@ -66,34 +80,43 @@ class CoreConsumer(AsyncWebsocketConsumer):
                     # there should also be a way to connect to the subset of users chats that are rendered on the first page
                     return
 
-            # we mark this user as 'online' in the database
-            await connect_user(self.user)
+            # we mark this user as 'online' in the presence store
+            went_online = await connect_user(self.user, self.channel_name)
+            self.heartbeat_task = asyncio.create_task(self.heartbeat())
 
-            # For regular users, join all matches groups
-            user_ids = await get_all_chat_user_ids(self.user)
-            print(f"User {self.user} joined {len(user_ids)} groups {user_ids}", flush=True)
-            for user_id in user_ids:
-                if user_id != self.group_name:
-                    await self.channel_layer.group_send(user_id, OutUserWentOnline(sender_id=self.group_name).dict())
+            if went_online:
+                await self.notify_partners(OutUserWentOnline(sender_id=self.group_name).dict())
 
     async def disconnect(self, close_code):
         user = getattr(self, "user", None)
         if (close_code != UNAUTH_REJECT_CODE) and (user is not None):
             print(f"User {self.user} disconnected from {self.channel_name} ({self.group_name})", flush=True)
             print(f"{self.user} disconnected, with code {close_code}", flush=True)
-            # we mark the user as 'offline' in the database
-            await disconnect_user(self.user)
+            if self.heartbeat_task is not None:
+                self.heartbeat_task.cancel()
+
+            # we mark the user as 'offline' in the presence store, if this was the users last open socket
+            went_offline = await disconnect_user(self.user, self.channel_name)
 
             # then we notify all the other users that this user went offline
-            user_ids = await get_all_chat_user_ids(self.user)
-            print(f"Sending offline to {len(user_ids)} users, {user_ids}", flush=True)
-            for user_id in user_ids:
-                if user_id != self.group_name:
-                    await self.channel_layer.group_send(user_id, OutUserWentOffline(sender_id=self.group_name).dict())
+            if went_offline:
+                await self.notify_partners(OutUserWentOffline(sender_id=self.group_name).dict())
 
             # a user has disconnected, we can safly discard that users group ( stored in self.group_name )
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
+    async def notify_partners(self, event):
+        partner_ids = await get_online_partner_ids(self.user)
+        print(f"Sending {event['type']} of {self.user} to {len(partner_ids)} online partners", flush=True)
+        await asyncio.gather(*[self.channel_layer.group_send(partner_id, event) for partner_id in partner_ids])
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            # the presence expired e.g. because redis was unavailable, so the partners were told the user is offline
+            if await heartbeat_user(self.user, self.channel_name):
+                await self.notify_partners(OutUserWentOnline(sender_id=self.group_name).dict())
+
     async def websocket_disconnect(self, event):
         await super().websocket_disconnect(event)
 
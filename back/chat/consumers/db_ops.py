@@ -1,6 +1,6 @@
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
-from chat.models import Chat, ChatConnections, ChatSessions
-from django.utils import timezone
+from chat import presence
 from management.models.state import State
 
 
@@ -9,40 +9,30 @@ def is_staff_or_matching(user):
     return user.is_staff or user.state.has_extra_user_permission(State.ExtraUserPermissionChoices.MATCHING_USER)
 
 
-@database_sync_to_async
-def connect_user(user):
-    connection = ChatConnections.objects.filter(user=user)
-    if connection.exists():
-        connection = connection.first()
-        connection.is_online = True
-        connection.last_seen = timezone.now()
-        connection.save()
-    else:
-        connection = ChatConnections.objects.create(user=user, is_online=True)
-    return connection
+@sync_to_async
+def connect_user(user, channel_name):
+    """
+    Marks the websocket `channel_name` of `user` as online, returns True if the user went online
+    """
+    return presence.get_presence().connect(user.pk, channel_name)
 
 
-@database_sync_to_async
-def disconnect_user(user):
-    connection = ChatConnections.objects.filter(user=user)
-    last_seen = None
-    if connection.exists():
-        connection = connection.first()
-        last_seen = connection.last_seen
-        connection.is_online = False
-        connection.save()
-    else:
-        raise Exception("User was not connected, but still disconnected")
+@sync_to_async
+def heartbeat_user(user, channel_name):
+    return presence.get_presence().heartbeat(user.pk, channel_name)
 
-    # then we also create a new chat session ( a log of the ongoing connection for that user)
-    ChatSessions.objects.create(user=user, start_time=last_seen, end_time=timezone.now())
+
+@sync_to_async
+def disconnect_user(user, channel_name):
+    """
+    Removes the websocket `channel_name` of `user`, returns True if the user went offline
+    """
+    return presence.get_presence().disconnect(user.pk, channel_name)
 
 
 @database_sync_to_async
-def get_all_chat_user_ids(user):
+def get_online_partner_ids(user):
     """
-    Retruns a list of all raw user_ids that have a chat with that user
-    NOTE: also returns the owns user user_id!
+    The group names ( user hashes ) of all chat partners of `user` that are online
     """
-    chat_uuids = set(list(sum(Chat.get_chats(user).values_list("u1__hash", "u2__hash"), ())))
-    return chat_uuids
+    return presence.online_partner_hashes(user)
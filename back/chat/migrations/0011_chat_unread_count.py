@@ -0,0 +1,45 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_unread_counts(apps, schema_editor):
+    message_model = apps.get_model('chat', 'Message')
+    unread_count_model = apps.get_model('chat', 'ChatUnreadCount')
+    unread = (
+        message_model.objects.filter(read=False)
+        .values_list('chat_id', 'recipient_id')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    unread_count_model.objects.bulk_create(
+        (unread_count_model(chat_id=chat_id, user_id=user_id, count=count) for chat_id, user_id, count in unread),
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_chat_is_random_call_chat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatUnreadCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counts', to='chat.chat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_unread_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='chatunreadcount',
+            constraint=models.UniqueConstraint(fields=('chat', 'user'), name='unique_chat_unread_count'),
+        ),
+        migrations.RunPython(populate_unread_counts, reverse_code=migrations.RunPython.noop),
+    ]
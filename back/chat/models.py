@@ -1,11 +1,30 @@
 from uuid import uuid4
 
 from django.core.paginator import Paginator
-from django.db import models
-from django.db.models import Case, IntegerField, Max, Q, Value, When
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
 from management import models as management_models
 from rest_framework import serializers
 
+from chat import presence
+
+# annotation name -> field of the newest message, see `Chat.annotate_serializer_data`
+NEWEST_MESSAGE_FIELDS = {
+    "id": "pk",
+    "uuid": "uuid",
+    "created": "created",
+    "text": "text",
+    "read": "read",
+    "parsable_message": "parsable_message",
+    "recipient_id": "recipient_id",
+    "sender_id": "sender_id",
+    "sender_hash": "sender__hash",
+    "sender_is_staff": "sender__is_staff",
+    "sender_permissions": "sender__state__extra_user_permissions",
+}
+
 
 class Chat(models.Model):
     uuid = models.UUIDField(default=uuid4, editable=False, unique=True)
@@ -62,11 +81,75 @@ class Chat(models.Model):
         return None
 
     def get_unread_count(self, user):
-        return self.get_messages().filter(read=False, recipient=user).count()
+        if hasattr(self, "annotated_u1_unread_count") and user.pk in (self.u1_id, self.u2_id):
+            return self.annotated_u1_unread_count if user.pk == self.u1_id else self.annotated_u2_unread_count
+        return ChatUnreadCount.get_count(self, user)
 
     def get_newest_message(self):
+        if hasattr(self, "newest_message_uuid"):
+            return self.annotated_newest_message
         return self.get_messages().order_by("-created").first()
 
+    def is_matched(self, user, partner):
+        if hasattr(self, "annotated_matched"):
+            return self.annotated_matched
+        return management_models.matches.Match.get_match(user, partner).exists()
+
+    @property
+    def annotated_newest_message(self):
+        """
+        The newest message built from the `newest_message_*` annotations of `annotate_serializer_data`
+        """
+        if self.newest_message_uuid is None:
+            return None
+        sender = management_models.user.User(
+            pk=self.newest_message_sender_id,
+            hash=self.newest_message_sender_hash,
+            is_staff=self.newest_message_sender_is_staff,
+        )
+        sender.state = management_models.state.State(extra_user_permissions=self.newest_message_sender_permissions)
+        return Message(
+            pk=self.newest_message_id,
+            chat=self,
+            sender=sender,
+            recipient_id=self.newest_message_recipient_id,
+            **{field: getattr(self, f"newest_message_{field}") for field in ["uuid", "created", "text", "read"]},
+            parsable_message=self.newest_message_parsable_message,
+        )
+
+    @classmethod
+    def annotate_serializer_data(cls, queryset):
+        """
+        Annotates everything `ChatSerializer` needs to the chats of `queryset`: the unread counts of both participants,
+        the fields of the newest message & its sender, the match state and the participant profiles.
+        So chats are serialized for either participant with a single query.
+        """
+        newest_message = Message.objects.filter(chat=OuterRef("pk")).order_by("-created")
+
+        def unread_count(participant):
+            return Coalesce(
+                Subquery(
+                    ChatUnreadCount.objects.filter(chat=OuterRef("pk"), user=OuterRef(participant)).values("count")[:1]
+                ),
+                0,
+            )
+
+        return queryset.select_related("u1__profile", "u2__profile").annotate(
+            annotated_u1_unread_count=unread_count("u1"),
+            annotated_u2_unread_count=unread_count("u2"),
+            annotated_matched=Exists(
+                management_models.matches.Match.objects.filter(
+                    Q(user1=OuterRef("u1"), user2=OuterRef("u2")) | Q(user1=OuterRef("u2"), user2=OuterRef("u1")),
+                    active=True,
+                    is_random_call_match=False,
+                )
+            ),
+            **{
+                f"newest_message_{name}": Subquery(newest_message.values(field)[:1])
+                for name, field in NEWEST_MESSAGE_FIELDS.items()
+            },
+        )
+
     @classmethod
     def get_or_create_chat(cls, user1, user2):
         chat = cls.objects.filter(Q(u1=user1, u2=user2) | Q(u1=user2, u2=user1))
@@ -79,6 +162,12 @@ class Chat(models.Model):
         return OpenAiChatSerializer(self, message_depth=message_depth).data
 
 
+# the chat partners of the users are cached for the online / offline notifications
+@receiver([models.signals.post_save, models.signals.post_delete], sender=Chat)
+def invalidate_presence_partners(sender, instance, **kwargs):
+    presence.invalidate_partners(instance.u1_id, instance.u2_id)
+
+
 class ChatInModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chat
@@ -109,7 +198,7 @@ class ChatSerializer(serializers.ModelSerializer):
             partner = instance.get_partner(user)
 
             # TODO: add specific representation for random calls
-            if management_models.matches.Match.get_match(user, partner).exists() and partner.is_active:
+            if instance.is_matched(user, partner) and partner.is_active:
                 profile = management_models.profile.CensoredProfileSerializer(partner.profile).data
                 representation["partner"] = profile
                 representation["partner"]["id"] = partner.hash
@@ -179,6 +268,89 @@ class Message(models.Model):
         ]
 
 
+class ChatUnreadCount(models.Model):
+    """
+    Denormalized amount of unread messages of `user` in `chat`, so unread badges don't need to count messages.
+    Incremented when a message is sent, decremented / reset when messages are read.
+    `manage.py repair_unread_counts` recomputes all counters from `Message`.
+    """
+
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name="unread_counts")
+    user = models.ForeignKey("management.User", on_delete=models.CASCADE, related_name="chat_unread_counts")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["chat", "user"], name="unique_chat_unread_count")]
+
+    @classmethod
+    def increment(cls, chat, user):
+        if cls.objects.filter(chat=chat, user=user).update(count=F("count") + 1):
+            return
+        # first message since the counters were introduced, the new message is already saved so the count includes it
+        count = Message.objects.filter(chat=chat, recipient=user, read=False).count()
+        try:
+            with transaction.atomic():
+                cls.objects.create(chat=chat, user=user, count=count)
+        except IntegrityError:
+            cls.objects.filter(chat=chat, user=user).update(count=F("count") + 1)
+
+    @classmethod
+    def decrement(cls, chat, user):
+        cls.objects.filter(chat=chat, user=user, count__gt=0).update(count=F("count") - 1)
+
+    @classmethod
+    def reset(cls, chat, user):
+        cls.objects.filter(chat=chat, user=user).update(count=0)
+
+    @classmethod
+    def get_count(cls, chat, user):
+        return cls.objects.filter(chat=chat, user=user).values_list("count", flat=True).first() or 0
+
+    @classmethod
+    def total(cls, user):
+        return cls.objects.filter(user=user).aggregate(total=Sum("count"))["total"] or 0
+
+    @classmethod
+    def repair(cls, chats=None, dry_run=False, batch_size=1000):
+        """
+        Recomputes the counters of `chats` ( default: all chats ) from `Message` with one grouped query.
+        Returns {(chat_id, user_id): (stored, actual)} of all wrong counters, with `dry_run` nothing is written.
+        """
+        messages = Message.objects.filter(read=False)
+        counters = cls.objects.all()
+        if chats is not None:
+            messages = messages.filter(chat__in=chats)
+            counters = counters.filter(chat__in=chats)
+
+        actual = {
+            (chat_id, user_id): count
+            for chat_id, user_id, count in messages.values_list("chat_id", "recipient_id")
+            .annotate(count=Count("pk"))
+            .order_by()
+        }
+        stored = {(counter.chat_id, counter.user_id): counter for counter in counters.only("chat", "user", "count")}
+
+        changes = {}
+        outdated = []
+        for key, counter in stored.items():
+            count = actual.get(key, 0)
+            if counter.count != count:
+                changes[key] = (counter.count, count)
+                counter.count = count
+                outdated.append(counter)
+        missing = [
+            cls(chat_id=chat_id, user_id=user_id, count=count)
+            for (chat_id, user_id), count in actual.items()
+            if (chat_id, user_id) not in stored
+        ]
+        changes.update({(counter.chat_id, counter.user_id): (None, counter.count) for counter in missing})
+
+        if not dry_run:
+            cls.objects.bulk_update(outdated, ["count"], batch_size=batch_size)
+            cls.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+        return changes
+
+
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
@@ -238,12 +410,20 @@ class OpenAiChatSerializer(serializers.ModelSerializer):
 
 
 class ChatSessions(models.Model):
+    """
+    Not written anymore, the last seen time is kept in `chat.presence`
+    """
+
     user = models.ForeignKey("management.User", on_delete=models.CASCADE)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
 
 
 class ChatConnections(models.Model):
+    """
+    Not written anymore, the online state is kept in `chat.presence`
+    """
+
     user = models.ForeignKey("management.User", on_delete=models.CASCADE)
     is_online = models.BooleanField(default=False)
     last_seen = models.DateTimeField(auto_now=True)
@@ -251,4 +431,4 @@ class ChatConnections(models.Model):
 
     @classmethod
     def is_user_online(cls, user):
-        return cls.objects.filter(user=user, is_online=True).exists()
+        return presence.is_online(user)
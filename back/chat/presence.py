@@ -0,0 +1,292 @@
+"""
+Online presence of the users connected to the `CoreConsumer` websocket.
+
+Presence is kept in the Redis of the channel layer ( in memory if the channel layer is in memory, e.g. in tests ),
+so connecting & disconnecting doesn't write to the database:
+- `presence:online` sorted set: user id -> expires at ( unix time )
+- `presence:channels:<user_id>` sorted set: channel name -> expires at, one entry per open websocket
+- `presence:last_seen` hash: user id -> unix time
+- `presence:partners:<user_id>` the cached chat partners of the user ( [[id, hash], ...] )
+
+Every open websocket refreshes its entry every `HEARTBEAT_INTERVAL` seconds and entries expire after `PRESENCE_TTL`,
+so users of a crashed worker are offline after at most `PRESENCE_TTL` without ever disconnecting.
+A user is online as long as one of their websockets is alive, `connect` & `disconnect` return if the user
+went online / offline, only then their partners are notified ( only the partners that are online themselves ).
+
+The cached partners are invalidated whenever a match or chat of the user is saved or deleted.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import redis
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 30
+PRESENCE_TTL = 3 * HEARTBEAT_INTERVAL
+PARTNERS_TTL = 24 * 60 * 60
+
+ONLINE_KEY = "presence:online"
+LAST_SEEN_KEY = "presence:last_seen"
+
+# Removes the socket and updates `presence:online` in one step, so a socket connecting meanwhile can't be missed.
+# KEYS: channels key of the user, ONLINE_KEY, LAST_SEEN_KEY; ARGV: user id, channel name, now
+# Returns 1 if the user went offline
+DISCONNECT_SCRIPT = """
+redis.call("ZREM", KEYS[1], ARGV[2])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[3])
+redis.call("HSET", KEYS[3], ARGV[1], ARGV[3])
+local remaining = redis.call("ZRANGE", KEYS[1], -1, -1, "WITHSCORES")
+if #remaining > 0 then
+    redis.call("ZADD", KEYS[2], remaining[2], ARGV[1])
+    return 0
+end
+return redis.call("ZREM", KEYS[2], ARGV[1])
+"""
+
+
+def channels_key(user_id):
+    return f"presence:channels:{user_id}"
+
+
+def partners_key(user_id):
+    return f"presence:partners:{user_id}"
+
+
+def to_datetime(timestamp):
+    return datetime.fromtimestamp(float(timestamp), tz=timezone.utc)
+
+
+class RedisPresenceStore:
+    def __init__(self, client):
+        self.redis = client
+        self.disconnect_script = client.register_script(DISCONNECT_SCRIPT)
+
+    def connect(self, user_id, channel_name, now=None):
+        """
+        Adds or refreshes the websocket `channel_name` of the user, returns True if the user went online
+        """
+        now = now or time.time()
+        expires_at = now + PRESENCE_TTL
+        pipe = self.redis.pipeline()
+        pipe.zscore(ONLINE_KEY, user_id)
+        pipe.zadd(channels_key(user_id), {channel_name: expires_at})
+        pipe.expire(channels_key(user_id), PRESENCE_TTL)
+        pipe.zadd(ONLINE_KEY, {user_id: expires_at})
+        pipe.hset(LAST_SEEN_KEY, user_id, now)
+        previous_expiry = pipe.execute()[0]
+        return previous_expiry is None or previous_expiry <= now
+
+    heartbeat = connect
+
+    def disconnect(self, user_id, channel_name, now=None):
+        """
+        Removes the websocket `channel_name` of the user, returns True if it was the users last one
+        """
+        now = now or time.time()
+        went_offline = self.disconnect_script(
+            keys=[channels_key(user_id), ONLINE_KEY, LAST_SEEN_KEY], args=[user_id, channel_name, repr(now)]
+        )
+        return went_offline > 0
+
+    def online_user_ids(self, user_ids, now=None):
+        """
+        The ids of `user_ids` that are online, in one round trip
+        """
+        now = now or time.time()
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        pipe = self.redis.pipeline()
+        for user_id in user_ids:
+            pipe.zscore(ONLINE_KEY, user_id)
+        return {
+            user_id
+            for user_id, expires_at in zip(user_ids, pipe.execute())
+            if expires_at is not None and expires_at > now
+        }
+
+    def last_seen(self, user_ids):
+        """
+        {user_id: datetime} of the users that have been online before
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        return {
+            user_id: to_datetime(seen)
+            for user_id, seen in zip(user_ids, self.redis.hmget(LAST_SEEN_KEY, user_ids))
+            if seen is not None
+        }
+
+    def expire(self, now=None):
+        """
+        Removes the users whose heartbeats expired, returns their ids
+        """
+        now = now or time.time()
+        pipe = self.redis.pipeline()
+        pipe.zrangebyscore(ONLINE_KEY, "-inf", now)
+        pipe.zremrangebyscore(ONLINE_KEY, "-inf", now)
+        return [int(user_id) for user_id in pipe.execute()[0]]
+
+    def get_partners(self, user_id):
+        cached = self.redis.get(partners_key(user_id))
+        return None if cached is None else [tuple(partner) for partner in json.loads(cached)]
+
+    def set_partners(self, user_id, partners):
+        self.redis.set(partners_key(user_id), json.dumps(partners), ex=PARTNERS_TTL)
+
+    def invalidate_partners(self, user_ids):
+        if user_ids:
+            self.redis.delete(*[partners_key(user_id) for user_id in user_ids])
+
+
+class InMemoryPresenceStore:
+    """
+    Stand-in for `RedisPresenceStore` for a single process ( `channels.layers.InMemoryChannelLayer` )
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = defaultdict(dict)
+        self.seen = {}
+        self.partners = {}
+
+    def _expires_at(self, user_id, now):
+        alive = [expires_at for expires_at in self.channels.get(user_id, {}).values() if expires_at > now]
+        return max(alive, default=None)
+
+    def connect(self, user_id, channel_name, now=None):
+        now = now or time.time()
+        with self.lock:
+            went_online = self._expires_at(user_id, now) is None
+            self.channels[user_id][channel_name] = now + PRESENCE_TTL
+            self.seen[user_id] = now
+        return went_online
+
+    heartbeat = connect
+
+    def disconnect(self, user_id, channel_name, now=None):
+        now = now or time.time()
+        with self.lock:
+            was_online = self._expires_at(user_id, now) is not None
+            self.channels[user_id].pop(channel_name, None)
+            self.seen[user_id] = now
+            return was_online and self._expires_at(user_id, now) is None
+
+    def online_user_ids(self, user_ids, now=None):
+        now = now or time.time()
+        with self.lock:
+            return {user_id for user_id in user_ids if self._expires_at(user_id, now) is not None}
+
+    def last_seen(self, user_ids):
+        with self.lock:
+            return {user_id: to_datetime(self.seen[user_id]) for user_id in user_ids if user_id in self.seen}
+
+    def expire(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            expired = [
+                user_id
+                for user_id, channels in self.channels.items()
+                if channels and self._expires_at(user_id, now) is None
+            ]
+            for user_id in expired:
+                del self.channels[user_id]
+            return expired
+
+    def get_partners(self, user_id):
+        return self.partners.get(user_id)
+
+    def set_partners(self, user_id, partners):
+        self.partners[user_id] = [tuple(partner) for partner in partners]
+
+    def invalidate_partners(self, user_ids):
+        for user_id in user_ids:
+            self.partners.pop(user_id, None)
+
+
+_stores = {}
+
+
+def redis_client(host):
+    """
+    A redis client for a `hosts` entry of the `channels_redis` config
+    """
+    if isinstance(host, dict):
+        return redis.Redis.from_url(host["address"])
+    if isinstance(host, str):
+        return redis.Redis.from_url(host)
+    return redis.Redis(host=host[0], port=host[1])
+
+
+def get_presence():
+    """
+    The presence store of the configured channel layer
+    """
+    layer = settings.CHANNEL_LAYERS["default"]
+    if layer["BACKEND"] != "channels_redis.core.RedisChannelLayer":
+        return _stores.setdefault("memory", InMemoryPresenceStore())
+    if "redis" not in _stores:
+        _stores["redis"] = RedisPresenceStore(redis_client(layer["CONFIG"]["hosts"][0]))
+    return _stores["redis"]
+
+
+@receiver(setting_changed)
+def reset_presence(setting, **kwargs):
+    if setting == "CHANNEL_LAYERS":
+        _stores.clear()
+
+
+def get_partners(user):
+    """
+    [(id, hash), ...] of all users that have a chat with `user`, cached until a match or chat of `user` changes
+    """
+    from chat.models import Chat
+
+    store = get_presence()
+    partners = store.get_partners(user.pk)
+    if partners is None:
+        partners = set()
+        for u1_id, u1_hash, u2_id, u2_hash in Chat.objects.filter(Q(u1=user) | Q(u2=user)).values_list(
+            "u1_id", "u1__hash", "u2_id", "u2__hash"
+        ):
+            partners.add((u2_id, u2_hash) if u1_id == user.pk else (u1_id, u1_hash))
+        partners.discard((user.pk, user.hash))
+        partners = sorted(partners)
+        store.set_partners(user.pk, partners)
+    return partners
+
+
+def invalidate_partners(*user_ids):
+    try:
+        get_presence().invalidate_partners(user_ids)
+    except redis.RedisError as e:
+        # saving a match or chat shouldn't fail because of the cache, the partners expire after `PARTNERS_TTL`
+        logger.warning("Could not invalidate the cached partners of %s: %r", user_ids, e)
+
+
+def online_partner_hashes(user):
+    """
+    The hashes ( = channel group names ) of the partners of `user` that are online
+    """
+    partners = get_partners(user)
+    online = get_presence().online_user_ids([partner_id for partner_id, _ in partners])
+    return [partner_hash for partner_id, partner_hash in partners if partner_id in online]
+
+
+def is_online(user):
+    return user.pk in get_presence().online_user_ids([user.pk])
+
+
+def online_user_ids(user_ids):
+    return get_presence().online_user_ids(user_ids)
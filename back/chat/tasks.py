@@ -0,0 +1,52 @@
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+
+from chat.consumers.messages import NewMessage, OutUserWentOffline
+from chat.models import ChatSerializer, Message, MessageSerializer
+from chat.presence import get_presence, online_partner_hashes
+
+
+@shared_task(name="chat.tasks.expire_presence")
+def expire_presence():
+    """
+    Marks users offline whose websocket heartbeats expired ( e.g. their worker crashed ) and notifies their partners
+    """
+    from management.models.user import User
+
+    expired = get_presence().expire()
+    channel_layer = get_channel_layer()
+    for user in User.objects.filter(pk__in=expired).only("pk", "hash"):
+        event = OutUserWentOffline(sender_id=user.hash).dict()
+        for partner_hash in online_partner_hashes(user):
+            async_to_sync(channel_layer.group_send)(partner_hash, event)
+    return len(expired)
+
+
+@shared_task(name="chat.tasks.process_sent_message")
+def process_sent_message(message_id):
+    """
+    Everything the sender of a message doesn't wait for: emails the recipient ( at most every 5 minutes ) and sends
+    the message with the partner's chat object over the websocket
+    """
+    from management.tasks import send_email_background
+
+    message = Message.objects.select_related("chat", "sender__state", "recipient").get(pk=message_id)
+    partner = message.recipient
+
+    latest_notified = (
+        Message.objects.filter(recipient=partner, recipient_notified=True)
+        .exclude(pk=message.pk)
+        .order_by("-created")
+        .values_list("created", flat=True)
+        .first()
+    )
+    if latest_notified is None or (message.created - latest_notified).total_seconds() > 300:
+        Message.objects.filter(pk=message.pk).update(recipient_notified=True)
+        send_email_background.delay("new-messages", user_id=partner.id)
+
+    NewMessage(
+        message=MessageSerializer(message).data,
+        chat_id=message.chat.uuid,
+        meta_chat_obj=ChatSerializer(message.chat, context={"user": partner}).data,
+    ).send(partner.hash)
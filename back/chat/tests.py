@@ -1 +1,369 @@
-# Create your tests here.
+import json
+import time
+from unittest import mock
+
+from asgiref.testing import ApplicationCommunicator
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from management.models.matches import Match
+from management.models.user import User
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chat.api.chats import ChatsModelViewSet
+from chat.api.messages import MessagesModelViewSet
+from chat.benchmark import create_synthetic_chats, run_chat_list_benchmark, run_send_message_benchmark
+from chat.consumers.core import CoreConsumer
+from chat.models import Chat, ChatSerializer, ChatUnreadCount, Message, MessageSerializer
+from chat.presence import PRESENCE_TTL, InMemoryPresenceStore, get_partners, get_presence, online_user_ids
+from chat.tasks import expire_presence, process_sent_message
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class PresenceStoreTests(TestCase):
+    def test_connections(self):
+        store = InMemoryPresenceStore()
+        assert store.connect(1, "tab1", now=100)
+        assert not store.connect(1, "tab2", now=101)
+        assert store.online_user_ids([1, 2], now=102) == {1}
+
+        assert not store.disconnect(1, "tab1", now=103)
+        assert store.disconnect(1, "tab2", now=104)
+        assert store.online_user_ids([1], now=105) == set()
+        assert store.last_seen([1, 2])[1].timestamp() == 104
+
+    def test_heartbeat_expiry(self):
+        store = InMemoryPresenceStore()
+        store.connect(1, "tab1", now=100)
+        store.connect(2, "tab1", now=100)
+        store.heartbeat(2, "tab1", now=100 + PRESENCE_TTL - 1)
+
+        now = 100 + PRESENCE_TTL + 1
+        assert store.online_user_ids([1, 2], now=now) == {2}
+        assert store.expire(now=now) == [1]
+        assert store.expire(now=now) == []
+        # a heartbeat after the expiry brings the user back online
+        assert store.heartbeat(1, "tab1", now=now)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class PresenceTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f"presence{i}@little-world.com", password="Test123!", first_name="Presence", last_name="Test"
+            )
+            for i in range(3)
+        ]
+        Chat.get_or_create_chat(self.users[0], self.users[1])
+
+    def test_partners_are_cached_until_a_chat_or_match_changes(self):
+        user0, user1, user2 = self.users
+        assert get_partners(user0) == [(user1.pk, user1.hash)]
+
+        get_presence().set_partners(user0.pk, [])
+        assert get_partners(user0) == []
+
+        Chat.get_or_create_chat(user2, user0)
+        assert get_partners(user0) == sorted([(user1.pk, user1.hash), (user2.pk, user2.hash)])
+
+        get_presence().set_partners(user0.pk, [])
+        Match.objects.create(user1=user0, user2=user1)
+        assert len(get_partners(user0)) == 2
+
+    async def _connect(self, user):
+        scope = {"type": "websocket", "path": "/api/core/ws", "headers": [], "subprotocols": [], "user": user}
+        communicator = ApplicationCommunicator(CoreConsumer.as_asgi(), scope)
+        await communicator.send_input({"type": "websocket.connect"})
+        assert (await communicator.receive_output(1))["type"] == "websocket.accept"
+        return communicator
+
+    async def _receive(self, communicator):
+        return json.loads((await communicator.receive_output(1))["text"])
+
+    async def _disconnect(self, communicator):
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait(1)
+
+    async def test_online_offline_notifications(self):
+        user0, user1, _ = self.users
+        partner = await self._connect(user1)
+        assert await partner.receive_nothing(0.1)
+
+        tab1 = await self._connect(user0)
+        event = await self._receive(partner)
+        assert event["action"] == "updateMatchProfile"
+        assert event["payload"] == {"partnerId": user0.hash, "profile": {"isOnline": True}}
+        assert online_user_ids([user0.pk, user1.pk]) == {user0.pk, user1.pk}
+
+        # the second tab & closing one of two tabs doesn't change the presence
+        tab2 = await self._connect(user0)
+        assert await partner.receive_nothing(0.1)
+        await self._disconnect(tab1)
+        assert await partner.receive_nothing(0.1)
+
+        await self._disconnect(tab2)
+        event = await self._receive(partner)
+        assert event["payload"] == {"partnerId": user0.hash, "profile": {"isOnline": False}}
+        assert online_user_ids([user0.pk, user1.pk]) == {user1.pk}
+
+        await self._disconnect(partner)
+
+    def test_expire_presence(self):
+        get_presence().connect(self.users[0].pk, "crashed", now=time.time() - PRESENCE_TTL - 1)
+        get_presence().connect(self.users[1].pk, "alive")
+
+        assert expire_presence() == 1
+        assert online_user_ids([self.users[0].pk, self.users[1].pk]) == {self.users[1].pk}
+
+
+class ChatListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="chat.list@little-world.com", password="Test123!", first_name="Chat", last_name="List"
+        )
+        self.partners = [
+            User.objects.create_user(
+                email=f"chat.list{i}@little-world.com", password="Test123!", first_name=f"Partner{i}", last_name="List"
+            )
+            for i in range(4)
+        ]
+        support = User.objects.create_superuser(
+            email="chat.list.support@little-world.com", password="Test123!", first_name="Support", second_name="List"
+        )
+        self.partners.append(support)
+
+        for i, partner in enumerate(self.partners):
+            chat = Chat.get_or_create_chat(self.user, partner)
+            Match.objects.create(user1=self.user, user2=partner, active=i > 1)
+            for j in range(i):
+                sender, recipient = (partner, self.user) if j % 2 == 0 else (self.user, partner)
+                Message.objects.create(chat=chat, sender=sender, recipient=recipient, text=f"Hi {j}")
+        Message.objects.create(chat=chat, sender=support, recipient=self.user, text="Welcome")
+        ChatUnreadCount.repair()
+
+    def _list(self, user, **params):
+        request = APIRequestFactory().get("/api/chats/", params)
+        force_authenticate(request, user=user)
+        response = ChatsModelViewSet.as_view({"get": "list"})(request)
+        assert response.status_code == 200
+        return response.data["results"]
+
+    def test_annotated_chats_serialize_like_plain_chats(self):
+        results = self._list(self.user)
+
+        request = APIRequestFactory().get("/api/chats/")
+        request.user = self.user
+        chats = [Chat.objects.get(uuid=result["uuid"]) for result in results]
+        assert results == ChatSerializer(chats, many=True, context={"request": request}).data
+
+        by_partner = {result["partner"]["id"]: result for result in results}
+        # the inactive match without messages is not listed, the unmatched one with messages is censored
+        assert self.partners[0].hash not in by_partner
+        assert by_partner["censored"]["is_unmatched"]
+        assert by_partner[self.partners[4].hash]["newest_message"]["parsable"]
+        assert by_partner[self.partners[3].hash]["unread_count"] == 2
+        assert by_partner[self.partners[4].hash]["unread_count"] == 3
+
+    def test_query_count_is_constant(self):
+        small = create_synthetic_chats(3, seed=1)
+        large = create_synthetic_chats(30, seed=2)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            assert len(self._list(small, page_size=50)) == 3
+        with CaptureQueriesContext(connection) as large_queries:
+            assert len(self._list(large, page_size=50)) == 30
+
+        assert len(small_queries.captured_queries) == len(large_queries.captured_queries)
+
+    def test_benchmark(self):
+        annotated, per_chat = run_chat_list_benchmark(10, page_size=10, repeats=2)
+        assert annotated.queries < per_chat.queries
+        assert annotated.p95_ms >= annotated.p50_ms
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatUnreadCountTests(TestCase):
+    def setUp(self):
+        self.user, self.partner = [
+            User.objects.create_user(
+                email=f"unread{i}@little-world.com", password="Test123!", first_name="Unread", last_name="Test"
+            )
+            for i in range(2)
+        ]
+        self.chat = Chat.get_or_create_chat(self.user, self.partner)
+
+    def _post(self, action, user, **kwargs):
+        request = APIRequestFactory().post("/api/messages/")
+        force_authenticate(request, user=user)
+        response = MessagesModelViewSet.as_view({"post": action})(request, **kwargs)
+        assert response.status_code == 200, response.data
+        return response
+
+    def _total(self, user):
+        request = APIRequestFactory().get("/api/chats/unread/")
+        force_authenticate(request, user=user)
+        return ChatsModelViewSet.as_view({"get": "unread_count"})(request).data["unread_count"]
+
+    def test_counters_follow_sent_and_read_messages(self):
+        for i in range(3):
+            self.user.message(f"Hi {i}", sender=self.partner)
+        self.user.message("Read already", sender=self.partner, auto_mark_read=True)
+        assert ChatUnreadCount.get_count(self.chat, self.user) == 3
+        assert self._total(self.user) == 3
+        assert self._total(self.partner) == 0
+
+        message = Message.objects.filter(chat=self.chat, read=False).first()
+        self._post("read", self.user, pk=message.pk)
+        self._post("read", self.user, pk=message.pk)
+        assert ChatUnreadCount.get_count(self.chat, self.user) == 2
+
+        self._post("chat_read", self.user, chat_uuid=self.chat.uuid)
+        assert self._total(self.user) == 0
+
+    def test_repair(self):
+        Message.objects.create(chat=self.chat, sender=self.partner, recipient=self.user, text="Not counted")
+        ChatUnreadCount.objects.create(chat=self.chat, user=self.partner, count=5)
+
+        expected = {(self.chat.pk, self.user.pk): (None, 1), (self.chat.pk, self.partner.pk): (5, 0)}
+        assert ChatUnreadCount.repair(dry_run=True) == expected
+        assert self._total(self.user) == 0
+
+        assert ChatUnreadCount.repair() == expected
+        assert self._total(self.user) == 1
+        assert self._total(self.partner) == 0
+        assert ChatUnreadCount.repair() == {}
+
+
+class MessagePaginationTests(TestCase):
+    def setUp(self):
+        self.user, self.partner = [
+            User.objects.create_user(
+                email=f"pagination{i}@little-world.com", password="Test123!", first_name="Pagination", last_name="Test"
+            )
+            for i in range(2)
+        ]
+        self.chat = Chat.get_or_create_chat(self.user, self.partner)
+        self.messages = [
+            Message.objects.create(chat=self.chat, sender=self.partner, recipient=self.user, text=f"Hi {i}")
+            for i in range(25)
+        ]
+        # messages sent in the same instant are ordered by id
+        Message.objects.filter(pk__in=[message.pk for message in self.messages[10:15]]).update(
+            created=self.messages[10].created
+        )
+        self.newest_first = [str(message.uuid) for message in reversed(self.messages)]
+
+    def _list(self, **params):
+        request = APIRequestFactory().get(f"/api/messages/{self.chat.uuid}/", params)
+        force_authenticate(request, user=self.user)
+        return MessagesModelViewSet.as_view({"get": "list"})(request, chat_uuid=self.chat.uuid)
+
+    def test_scroll_back_through_the_history(self):
+        seen = []
+        params = {"cursor": "true", "page_size": 7}
+        with CaptureQueriesContext(connection) as queries:
+            while True:
+                data = self._list(**params).data
+                seen += [message["uuid"] for message in data["results"]]
+                if not data["has_more"]:
+                    break
+                params = {"before": data["next_before"], "page_size": 7}
+        assert seen == self.newest_first
+        assert data["next_before"] is None
+        assert not any("COUNT(" in query["sql"] for query in queries.captured_queries)
+
+    def test_sync_after_reconnect(self):
+        data = self._list(after=self.messages[12].uuid, page_size=5).data
+        assert [message["uuid"] for message in data["results"]] == self.newest_first[7:12]
+        assert data["has_more"]
+
+        data = self._list(after=data["next_after"], page_size=20).data
+        assert [message["uuid"] for message in data["results"]] == self.newest_first[:7]
+        assert not data["has_more"]
+
+        data = self._list(after=data["next_after"]).data
+        assert data["results"] == []
+        assert data["next_after"] == self.newest_first[0]
+
+    def test_invalid_cursor_and_page_numbers(self):
+        assert self._list(before="not-a-uuid").status_code == 404
+        other_chat_message = Message.objects.create(
+            chat=Chat.get_or_create_chat(self.partner, self.partner),
+            sender=self.partner,
+            recipient=self.partner,
+            text="Hi",
+        )
+        assert self._list(after=other_chat_message.uuid).status_code == 404
+
+        data = self._list(page=2, page_size=10).data
+        assert data["pages_total"] == 3
+        assert [message["uuid"] for message in data["results"]] == self.newest_first[10:20]
+
+    def test_invalid_page_sizes_use_the_default(self):
+        for page_size in ["0", "-5", "many", ""]:
+            data = self._list(cursor="true", page_size=page_size).data
+            assert [message["uuid"] for message in data["results"]] == self.newest_first[:20]
+            assert data["has_more"]
+        assert len(self._list(cursor="true", page_size=1000).data["results"]) == 25
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class SendMessageTests(TestCase):
+    def setUp(self):
+        self.user, self.partner, self.stranger = [
+            User.objects.create_user(
+                email=f"send{i}@little-world.com", password="Test123!", first_name="Send", last_name="Test"
+            )
+            for i in range(3)
+        ]
+        self.chat = Chat.get_or_create_chat(self.user, self.partner)
+        self.match = Match.objects.create(user1=self.partner, user2=self.user)
+
+    def _send(self, user, chat, text="Hello"):
+        request = APIRequestFactory().post(f"/api/messages/{chat.uuid}/send/", {"text": text})
+        force_authenticate(request, user=user)
+        return MessagesModelViewSet.as_view({"post": "send"})(request, chat_uuid=chat.uuid)
+
+    @mock.patch("chat.tasks.process_sent_message.delay")
+    def test_send(self, process_delay):
+        # the first message creates the partner's unread counter
+        self._send(self.user, self.chat)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self._send(self.user, self.chat)
+        assert response.status_code == 200
+        assert len(queries.captured_queries) < 10
+
+        message = Message.objects.get(uuid=response.data["uuid"])
+        assert response.data == MessageSerializer(message).data
+        process_delay.assert_called_once_with(message.pk)
+
+        self.match.refresh_from_db()
+        assert self.match.total_messages_counter == 2
+        assert ChatUnreadCount.get_count(self.chat, self.partner) == 2
+
+    def test_send_needs_an_active_match(self):
+        assert self._send(self.stranger, self.chat).status_code == 403
+
+        self.match.active = False
+        self.match.save()
+        assert self._send(self.user, self.chat).status_code == 403
+        assert not Message.objects.exists()
+
+    @mock.patch("management.tasks.send_email_background.delay")
+    def test_process_sent_message_notifies_at_most_every_five_minutes(self, send_email):
+        first, second = [
+            Message.objects.create(chat=self.chat, sender=self.user, recipient=self.partner, text=f"Hi {i}")
+            for i in range(2)
+        ]
+        process_sent_message(first.pk)
+        process_sent_message(second.pk)
+
+        send_email.assert_called_once_with("new-messages", user_id=self.partner.id)
+        assert list(Message.objects.order_by("id").values_list("recipient_notified", flat=True)) == [True, False]
+
+    def test_benchmark(self):
+        send, process = run_send_message_benchmark(repeats=3)
+        assert send.queries < 10
+        assert send.p95_ms >= send.p50_ms
@@ -55,6 +55,12 @@ chat_api_user = api.chats.ChatsModelViewSet.as_view(
     }
 )
 
+chat_api_user_unread_count = api.chats.ChatsModelViewSet.as_view(
+    {
+        "get": "unread_count",
+    }
+)
+
 chat_api_user_get2 = api.chats.ChatsModelViewSet.as_view(
     {
         "get": "get_by_uuid",
@@ -64,6 +70,7 @@ chat_api_user_get2 = api.chats.ChatsModelViewSet.as_view(
 
 urlpatterns = [
     path("api/chats/", chat_api_user_list),
+    path("api/chats/unread/", chat_api_user_unread_count),
     path("api/chats/<str:chat_uuid>/", chat_api_user_get2),
     # path("api/callbacks/", messages.get_all_websocket_callback_messsages),
     # path("api/callbacks/send/<str:callback_name>/<str:user_id>/", messages.send_test_callback),
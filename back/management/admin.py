@@ -51,6 +51,18 @@ class StatisticAdmin(admin.ModelAdmin):
     list_display = ("created_at", "updated_at", "kind")
 
 
+@admin.register(stats.BucketRefresh)
+class BucketRefreshAdmin(admin.ModelAdmin):
+    list_display = ("kind", "bucket", "refreshed_at", "count", "duration", "failed")
+    list_filter = ("kind", "failed")
+
+
+@admin.register(stats.StatisticRollupRefresh)
+class StatisticRollupRefreshAdmin(admin.ModelAdmin):
+    list_display = ("base_list", "rolled_up_until", "refreshed_at", "duration", "failed")
+    list_filter = ("failed",)
+
+
 @admin.register(models.backend_state.BackendState)
 class BackendStateAdmin(admin.ModelAdmin):
     list_display = ("slug", "name", "hash", "meta", "created_at")
@@ -0,0 +1,137 @@
+"""
+Exact search for the availability slot combinations that cover the most users.
+
+Every slot ( e.g. "mo__08_10" ) is a bitset of the users that are available in it ( a python int, bit i = user i ),
+the users covered by a combination are the OR of its slot bitsets and `int.bit_count` is the coverage.
+
+`best_slot_combinations` runs a branch and bound search over the slots ordered by their user count:
+the coverage of a partial combination plus the largest marginal gains of the slots that can still be added
+is an upper bound for all combinations below it ( coverage is submodular ),
+branches whose bound can't reach the worst of the current top combinations are skipped.
+The results are exact as long as the search stays within `MAX_SEARCH_NODES`, for large populations with evenly
+spread availabilities the bound prunes little, then the remaining branches only follow their best slot ( greedy )
+and the results are marked as not exact.
+"""
+
+import heapq
+
+import numpy as np
+
+from management.validators import DAYS, SLOTS
+
+FLAT_ALL_SLOTS = [f"{day}__{slot}" for day in DAYS for slot in SLOTS]
+
+# Search nodes of all combination sizes before the search falls back to greedy, keeps the request within a few seconds
+MAX_SEARCH_NODES = 20_000
+
+
+def slot_bitsets(slot_matrix):
+    """
+    One int bitset of the matrix rows per slot column of `availability_slot_matrix`
+    """
+    return [
+        int.from_bytes(np.packbits(slot_matrix[:, i], bitorder="little").tobytes(), "little")
+        for i in range(slot_matrix.shape[1])
+    ]
+
+
+class SlotCombinationSearch:
+    def __init__(self, bitsets, slot_names, n, top_k, disallow_same_day_combinations=False, max_nodes=MAX_SEARCH_NODES):
+        self.n = n
+        self.top_k = top_k
+        self.max_nodes = max_nodes
+        self.slot_names = slot_names
+        self.disallow_same_day = disallow_same_day_combinations
+
+        # slots with more users first, so good combinations & a high pruning threshold are found early
+        self.order = sorted(range(len(bitsets)), key=lambda i: bitsets[i].bit_count(), reverse=True)
+        self.bitsets = [bitsets[i] for i in self.order]
+        self.days = [slot_names[i].split("__")[0] for i in self.order]
+
+        self.top = []  # min heap of (coverage, combination)
+        self.combinations_tested = 0
+        self.nodes = 0
+        self.exact = True
+
+    def threshold(self):
+        return self.top[0][0] if len(self.top) >= self.top_k else -1
+
+    def add(self, coverage, combination):
+        self.combinations_tested += 1
+        if coverage < self.threshold():
+            return
+        entry = (coverage, tuple(sorted(self.slot_names[self.order[i]] for i in combination)))
+        if len(self.top) < self.top_k:
+            heapq.heappush(self.top, entry)
+        elif entry > self.top[0]:
+            heapq.heapreplace(self.top, entry)
+
+    def upper_bound(self, covered_count, gains, candidates, picks):
+        if self.disallow_same_day:
+            # at most one more slot per day
+            best_per_day = {}
+            for gain, i in zip(gains, candidates):
+                best_per_day[self.days[i]] = max(best_per_day.get(self.days[i], 0), gain)
+            gains = best_per_day.values()
+        return covered_count + sum(heapq.nlargest(picks, gains))
+
+    def search(self, combination=(), covered=0, start=0, used_days=frozenset()):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            self.exact = False
+
+        picks = self.n - len(combination)
+        candidates = [
+            i for i in range(start, len(self.bitsets)) if not (self.disallow_same_day and self.days[i] in used_days)
+        ]
+        if len(candidates) < picks:
+            return
+
+        covered_count = covered.bit_count()
+        gains = [(self.bitsets[i] & ~covered).bit_count() for i in candidates]
+        if self.upper_bound(covered_count, gains, candidates, picks) <= self.threshold():
+            return
+
+        if picks == 1:
+            for gain, i in zip(gains, candidates):
+                self.add(covered_count + gain, (*combination, i))
+            return
+
+        if not self.exact:
+            # out of budget: only follow the slot that adds the most users and leaves enough slots after it
+            reachable = len(candidates) - picks + 1
+            candidates = [max(zip(gains[:reachable], candidates[:reachable]), key=lambda gain_slot: gain_slot[0])[1]]
+
+        for i in candidates:
+            self.search((*combination, i), covered | self.bitsets[i], i + 1, used_days | {self.days[i]})
+
+    def run(self):
+        if 0 < self.n <= len(self.bitsets):
+            self.search()
+        return sorted(self.top, reverse=True)
+
+
+def best_slot_combinations(
+    slot_matrix,
+    sizes,
+    top_k=100,
+    disallow_same_day_combinations=False,
+    slot_names=FLAT_ALL_SLOTS,
+    max_nodes=MAX_SEARCH_NODES,
+):
+    """
+    The `top_k` combinations of every size in `sizes` with the most covered users ( rows of `slot_matrix` ).
+    Returns ({size: [(users_covered, combination), ...]}, amount of evaluated combinations, if the results are exact)
+    """
+    bitsets = slot_bitsets(slot_matrix)
+
+    results = {}
+    combinations_tested = 0
+    exact = True
+    for size in sizes:
+        search = SlotCombinationSearch(bitsets, slot_names, size, top_k, disallow_same_day_combinations, max_nodes)
+        results[size] = search.run()
+        combinations_tested += search.combinations_tested
+        exact = exact and search.exact
+        max_nodes = max(max_nodes - search.nodes, 0)
+    return results, combinations_tested, exact
@@ -0,0 +1,143 @@
+"""
+Materialized user & match bucket memberships.
+
+Evaluating the filter lists ( `FILTER_LISTS`, `MATCH_JOURNEY_FILTERS` ) is expensive, so
+`refresh_bucket_memberships` evaluates them periodically and stores the members in `BucketMembership`.
+A refresh only writes the difference to the stored members and records the time in `BucketRefresh`.
+
+The statistics endpoints and the filter lists of the matching panel read counts and members from the table
+as long as all buckets they need were refreshed within `MAX_AGE`, otherwise they fall back to the live filters.
+Note: materialized buckets are evaluated on all users / matches and then intersected with the pre filtered ones.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from management.api.user_journey_classifier import BucketSnapshot
+from management.models.stats import BucketMembership, BucketRefresh
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE = timedelta(hours=3)
+
+
+def get_filter_lists(kind):
+    from management.api.match_journey_filter_list import MATCH_JOURNEY_FILTERS
+    from management.api.user_advanced_filter_lists import FILTER_LISTS
+
+    if kind == BucketMembership.Kind.USER:
+        return FILTER_LISTS
+    return MATCH_JOURNEY_FILTERS
+
+
+def refresh_bucket(kind, entry):
+    """
+    Re-evaluates one filter list entry and writes the changed members. Returns (added, removed).
+    If the filter fails the old members are kept and the refresh is marked as `failed`.
+    """
+    start = time.monotonic()
+    try:
+        ids = set(entry.queryset().values_list("id", flat=True))
+    except Exception as e:
+        BucketRefresh.objects.update_or_create(
+            kind=kind, bucket=entry.name, defaults={"failed": True, "error": repr(e)}
+        )
+        raise
+
+    members = BucketMembership.objects.filter(kind=kind, bucket=entry.name)
+    with transaction.atomic():
+        stored = set(members.values_list("object_id", flat=True))
+        removed = stored - ids
+        added = ids - stored
+
+        if removed:
+            members.filter(object_id__in=removed).delete()
+        BucketMembership.objects.bulk_create(
+            [BucketMembership(kind=kind, bucket=entry.name, object_id=object_id) for object_id in added],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        BucketRefresh.objects.update_or_create(
+            kind=kind,
+            bucket=entry.name,
+            defaults={
+                "refreshed_at": timezone.now(),
+                "count": len(ids),
+                "duration": time.monotonic() - start,
+                "failed": False,
+                "error": "",
+            },
+        )
+    return len(added), len(removed)
+
+
+def refresh_bucket_memberships(kinds=None, names=None):
+    """
+    Refreshes all buckets of `kinds` ( default: users and matches ), or only the ones in `names`
+    """
+    if kinds is None:
+        kinds = [BucketMembership.Kind.USER, BucketMembership.Kind.MATCH]
+
+    summary = {}
+    for kind in kinds:
+        for entry in get_filter_lists(kind):
+            if entry.queryset is None or (names is not None and entry.name not in names):
+                continue
+            try:
+                added, removed = refresh_bucket(kind, entry)
+                summary[f"{kind}:{entry.name}"] = {"added": added, "removed": removed}
+            except Exception as e:
+                logger.exception("Refreshing bucket %s:%s failed", kind, entry.name)
+                summary[f"{kind}:{entry.name}"] = {"error": repr(e)}
+
+    # buckets that were removed from the filter lists
+    for kind in kinds:
+        if names is None:
+            existing = [entry.name for entry in get_filter_lists(kind)]
+            BucketMembership.objects.filter(kind=kind).exclude(bucket__in=existing).delete()
+            BucketRefresh.objects.filter(kind=kind).exclude(bucket__in=existing).delete()
+
+    return summary
+
+
+def get_refreshed_at(kind, names, max_age=MAX_AGE):
+    """
+    Oldest refresh time of the `names` buckets, None if one of them was never refreshed or is older than `max_age`
+    """
+    names = set(names)
+    refreshes = list(
+        BucketRefresh.objects.filter(kind=kind, bucket__in=names, refreshed_at__isnull=False).values_list(
+            "refreshed_at", flat=True
+        )
+    )
+    if not names or len(refreshes) != len(names):
+        return None
+    refreshed = min(refreshes)
+    if max_age is not None and refreshed < timezone.now() - max_age:
+        return None
+    return refreshed
+
+
+def bucket_members(kind, name):
+    """
+    Ids in bucket `name`, a subquery for `pk__in` lookups
+    """
+    return BucketMembership.objects.filter(kind=kind, bucket=name).values("object_id")
+
+
+def materialized_snapshot(kind, pre_filtered, names):
+    """
+    `BucketSnapshot` of the `pre_filtered` users / matches read from the membership table, two indexed queries
+    """
+    snapshot = BucketSnapshot(
+        ids=list(pre_filtered.order_by().values_list("pk", flat=True)), members={name: set() for name in names}
+    )
+    for bucket, object_id in BucketMembership.objects.filter(
+        kind=kind, bucket__in=names, object_id__in=pre_filtered.order_by().values("pk")
+    ).values_list("bucket", "object_id"):
+        snapshot.members[bucket].add(object_id)
+    return snapshot
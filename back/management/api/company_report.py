@@ -0,0 +1,141 @@
+"""
+Video call & matching report of all users of a company.
+
+All data is loaded with a fixed amount of queries, independent of the amount of users, matches and calls:
+- the users of the company
+- all non support matches of these users and their confirmations
+- all video calls where both users have been active
+- the capped call time per user, as grouped aggregates
+
+The report can be rendered as text lines ( `lines` ) or csv rows ( `csv_rows` ), both are generators
+so they can be streamed or written to a file by `management.tasks.export_company_report`.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import DurationField, ExpressionWrapper, F, Q, Sum
+from video.models import LivekitSession
+
+from management.models.matches import Match
+from management.models.user import User
+
+MAX_VIDEO_CALL_DURATION_SECONDS = 2 * 60 * 60  # 2 hours in seconds
+
+CSV_HEADER = ["user", "record", "partner", "status", "details", "duration_minutes"]
+
+
+def confirmation_status(match, confirmed_by):
+    if match["confirmed"]:
+        return "Both confirmed"
+    if match["user1_id"] in confirmed_by:
+        return f"{match['user1__username']} confirmed"
+    if match["user2_id"] in confirmed_by:
+        return f"{match['user2__username']} confirmed"
+    return "No one confirmed"
+
+
+class CompanyReport:
+    def __init__(self, company):
+        users = User.objects.filter(state__company=company)
+        user_ids = users.values("pk")
+
+        self.users = list(users.order_by("pk").values_list("pk", "username"))
+
+        matches = Match.objects.filter(Q(user1__in=user_ids) | Q(user2__in=user_ids), support_matching=False)
+        confirmed_by = defaultdict(set)
+        for match_id, user_id in Match.confirmed_by.through.objects.filter(match__in=matches.values("pk")).values_list(
+            "match_id", "user_id"
+        ):
+            confirmed_by[match_id].add(user_id)
+
+        self.matches = defaultdict(list)
+        for match in matches.order_by("created_at", "pk").values(
+            "pk", "confirmed", "user1_id", "user1__username", "user2_id", "user2__username"
+        ):
+            match["confirmation"] = confirmation_status(match, confirmed_by[match["pk"]])
+            self.matches[match["user1_id"]].append(match)
+            self.matches[match["user2_id"]].append(match)
+
+        calls = LivekitSession.objects.filter(Q(u1__in=user_ids) | Q(u2__in=user_ids), both_have_been_active=True)
+        self.calls = defaultdict(list)
+        for call in calls.order_by("created_at", "pk").values(
+            "u1_id", "u1__username", "u2_id", "u2__username", "is_active", "created_at", "end_time"
+        ):
+            self.calls[call["u1_id"]].append(call)
+            self.calls[call["u2_id"]].append(call)
+
+        # calls longer than the max duration are not counted
+        counted_calls = calls.annotate(
+            duration=ExpressionWrapper(F("end_time") - F("created_at"), output_field=DurationField())
+        ).filter(end_time__isnull=False, duration__lte=timedelta(seconds=MAX_VIDEO_CALL_DURATION_SECONDS))
+        self.video_time_seconds = defaultdict(float)
+        for side in ["u1", "u2"]:
+            for row in (
+                counted_calls.filter(**{f"{side}__in": user_ids})
+                .values(side)
+                .annotate(total=Sum("duration"))
+                .order_by()
+            ):
+                self.video_time_seconds[row[side]] += row["total"].total_seconds()
+
+    @property
+    def total_video_time_seconds(self):
+        return sum(self.video_time_seconds[user_id] for user_id, _ in self.users)
+
+    def user_matches(self, user_id):
+        for match in self.matches[user_id]:
+            partner = match["user2__username"] if match["user1_id"] == user_id else match["user1__username"]
+            status = "Confirmed" if match["confirmed"] else "Pending Confirmation"
+            yield partner, status, match["confirmation"]
+
+    def user_calls(self, user_id):
+        """
+        (partner, status, duration or None, counted)
+        """
+        for call in self.calls[user_id]:
+            partner = call["u2__username"] if call["u1_id"] == user_id else call["u1__username"]
+            status = "Active" if call["is_active"] else "Inactive"
+            duration = call["end_time"] - call["created_at"] if call["end_time"] else None
+            counted = duration is not None and duration.total_seconds() <= MAX_VIDEO_CALL_DURATION_SECONDS
+            yield partner, status, duration, counted
+
+    def lines(self):
+        for user_id, username in self.users:
+            yield f"User: {username}"
+            yield "=" * 40
+
+            yield "Matches:"
+            for partner, status, confirmation in self.user_matches(user_id):
+                yield f"\tMatch with {partner} - {status} ({confirmation})"
+
+            yield "=" * 20
+
+            yield "Video Calls:"
+            for partner, status, duration, counted in self.user_calls(user_id):
+                if duration is None:
+                    yield f"\tVideo call with {partner}: Status: {status}"
+                elif not counted:
+                    yield f"\tSkipping excessively long video call with {partner}: Duration {duration}"
+                else:
+                    yield f"\tVideo call with {partner}: Duration {duration}, Status: {status}"
+
+            yield f"Total Video Time for {username}: {self.video_time_seconds[user_id] / 60:.2f} minutes"
+            yield "=" * 40
+
+        total_minutes = self.total_video_time_seconds / 60
+        yield f"Total Video Time for All Users: {total_minutes:.2f} minutes"
+        yield f"Total Video Time for All Users: {total_minutes / 60.0:.2f} hours"
+
+    def csv_rows(self):
+        yield CSV_HEADER
+        for user_id, username in self.users:
+            for partner, status, confirmation in self.user_matches(user_id):
+                yield [username, "match", partner, status, confirmation, ""]
+            for partner, status, duration, counted in self.user_calls(user_id):
+                minutes = f"{duration.total_seconds() / 60:.2f}" if duration is not None else ""
+                details = "not counted, longer than 2 hours" if duration is not None and not counted else ""
+                yield [username, "video_call", partner, status, details, minutes]
+            yield [username, "total", "", "", "", f"{self.video_time_seconds[user_id] / 60:.2f}"]
+
+        yield ["", "total", "", "", "", f"{self.total_video_time_seconds / 60:.2f}"]
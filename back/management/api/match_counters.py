@@ -0,0 +1,130 @@
+"""
+Bulk sync of the denormalized match counters.
+
+`sync_match_counters` computes the same values as the old per match `Match.sync_counters`
+( message count, mutual video call count, latest interaction, confirmed & completed ) for all matches
+with a fixed amount of grouped queries:
+- message count & newest message per user pair
+- mutual video call count & newest call per user pair
+- the ids of the completed matches ( `completed_match` )
+
+Messages and calls are grouped by the ordered user pair ( Least / Greatest of the two user ids ),
+so both directions count for the match of the pair. Changed matches are written with `bulk_update` in chunks,
+with `dry_run=True` only the differences are returned.
+"""
+
+from chat.models import Message
+from django.db import connection
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from video.models import LivekitSession
+
+from management.models.matches import Match
+from management.models.user import User
+
+SYNC_CHUNK_SIZE = 1000
+
+SYNCED_FIELDS = [
+    "total_messages_counter",
+    "total_mutal_video_calls_counter",
+    "latest_interaction_at",
+    "confirmed",
+    "completed",
+]
+
+
+def pair_aggregates(queryset, user_a, user_b, created):
+    """
+    {(lower user id, higher user id): (count, newest)} of `queryset`
+    """
+    rows = (
+        queryset.annotate(low=Least(user_a, user_b), high=Greatest(user_a, user_b))
+        .values("low", "high")
+        .annotate(count=Count("pk"), newest=Max(created))
+        .order_by()
+    )
+    return {(row["low"], row["high"]): (row["count"], row["newest"]) for row in rows}
+
+
+def synced_values(match, messages, calls, completed_ids):
+    """
+    The values `Match.sync_counters` would set, given the pair aggregates of `messages` & `calls`
+    """
+    pair = (min(match.user1_id, match.user2_id), max(match.user1_id, match.user2_id))
+    message_count, newest_message = messages.get(pair, (0, None))
+    call_count, newest_call = calls.get(pair, (0, None))
+
+    values = {
+        "total_messages_counter": message_count,
+        "total_mutal_video_calls_counter": call_count,
+    }
+    if newest_message and newest_call:
+        values["latest_interaction_at"] = max(newest_message, newest_call)
+
+    # a match with messages or calls is always confirmed, and completed matches stay completed
+    if message_count > 0 or call_count > 0:
+        values["confirmed"] = True
+    if match.pk in completed_ids:
+        values["completed"] = True
+    return values
+
+
+def sync_match_counters(matches=None, dry_run=False, chunk_size=SYNC_CHUNK_SIZE):
+    """
+    Syncs the counters of `matches` ( default: all matches ).
+    Returns {match_id: {field: (old, new)}} of all changed matches, with `dry_run` nothing is written.
+    """
+    from management.api.match_journey_filters import completed_match
+
+    messages = Message.objects.all()
+    calls = LivekitSession.objects.filter(both_have_been_active=True)
+    if matches is None:
+        matches = Match.objects.all()
+    else:
+        user_ids = User.objects.filter(Q(match_user1__in=matches) | Q(match_user2__in=matches)).values("pk")
+        messages = messages.filter(sender__in=user_ids, recipient__in=user_ids)
+        calls = calls.filter(u1__in=user_ids, u2__in=user_ids)
+
+    message_aggregates = pair_aggregates(messages, "sender_id", "recipient_id", "created")
+    call_aggregates = pair_aggregates(calls, "u1_id", "u2_id", "created_at")
+    # evaluated on the stored counters, like the per match sync did.
+    # `completed_match` extracts days from durations, which is only supported on PostgreSQL,
+    # on other backends ( SQLite in development ) no new matches are marked as completed.
+    completed_ids = set()
+    if connection.vendor == "postgresql":
+        completed_ids = set(completed_match(matches).values_list("id", flat=True))
+
+    changes = {}
+    last_pk = 0
+    while True:
+        # keyset pagination, so the chunks stay stable while the matches are updated
+        chunk = list(
+            matches.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "user1_id", "user2_id", *SYNCED_FIELDS)[:chunk_size]
+        )
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        changed = []
+        for match in chunk:
+            values = synced_values(match, message_aggregates, call_aggregates, completed_ids)
+            diff = {
+                field: (getattr(match, field), value)
+                for field, value in values.items()
+                if getattr(match, field) != value
+            }
+            if not diff:
+                continue
+            changes[match.pk] = diff
+            for field, (_, value) in diff.items():
+                setattr(match, field, value)
+            match.updated_at = timezone.now()
+            changed.append(match)
+
+        if changed and not dry_run:
+            Match.objects.bulk_update(changed, [*SYNCED_FIELDS, "updated_at"])
+
+    return changes
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 
 from chat.consumers.messages import InMatchProposalAdded, InUnconfirmedMatchAdded
 from chat.models import Chat, ChatConnections, ChatSerializer
+from chat.presence import online_user_ids
 from django.db.models import Q
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import serializers, status
@@ -28,6 +29,63 @@ from management.models.unconfirmed_matches import ProposedMatch, serialize_propo
 from management.models.user import User
 
 
+class AdvancedUserMatchPrefetch:
+    """
+    Everything `AdvancedUserMatchSerializer` looks up per match, loaded for many (match, user) pairs at once.
+    Pass it as `context["prefetch"]`, the matches should come with `user1` & `user2` and their `profile` & `state` loaded.
+    Chats that don't exist yet are still created one by one, that happens at most once per match.
+    """
+
+    def __init__(self, match_users):
+        pairs = {(user, match.get_partner(user)) for match, user in match_users}
+        user_ids = {usr.pk for pair in pairs for usr in pair}
+
+        self.online_user_ids = online_user_ids(user_ids)
+
+        self.chats = {}
+        self.load_chats(Chat.objects.filter(u1_id__in=user_ids, u2_id__in=user_ids))
+        missing = [
+            Chat.get_or_create_chat(user, partner).pk
+            for user, partner in pairs
+            if frozenset((user.pk, partner.pk)) not in self.chats
+        ]
+        if missing:
+            self.load_chats(Chat.objects.filter(pk__in=missing))
+
+        self.sessions = list(
+            LivekitSession.objects.filter(
+                Q(u1_active=True) | Q(u2_active=True),
+                room__u1_id__in=user_ids,
+                room__u2_id__in=user_ids,
+                is_active=True,
+            )
+            .select_related("room", "u1__profile", "u2__profile")
+            .order_by("pk")
+        )
+
+    def load_chats(self, queryset):
+        for chat in Chat.annotate_serializer_data(queryset).order_by("pk"):
+            self.chats.setdefault(frozenset((chat.u1_id, chat.u2_id)), chat)
+
+    def is_online(self, user):
+        return user.pk in self.online_user_ids
+
+    def chat(self, user, partner):
+        return self.chats[frozenset((user.pk, partner.pk))]
+
+    def active_session(self, user, partner):
+        # same conditions as the query in `AdvancedUserMatchSerializer`, sessions in the partners room
+        # only count if exactly one of the two is active
+        for session in self.sessions:
+            if (session.room.u1_id, session.room.u2_id) == (user.pk, partner.pk):
+                return session
+            if (session.room.u1_id, session.room.u2_id) == (partner.pk, user.pk) and not (
+                session.u1_active and session.u2_active
+            ):
+                return session
+        return None
+
+
 class AdvancedUserMatchSerializer(serializers.ModelSerializer):
     class Meta:
         model = Match
@@ -39,21 +97,28 @@ class AdvancedUserMatchSerializer(serializers.ModelSerializer):
         user = self.context["user"]
         partner = instance.get_partner(user)
 
-        is_online = ChatConnections.is_user_online(partner)
-        chat = Chat.get_or_create_chat(user, partner)
+        prefetch = self.context.get("prefetch")
+        if prefetch is not None:
+            is_online = prefetch.is_online(partner)
+            chat = prefetch.chat(user, partner)
+        else:
+            is_online = ChatConnections.is_user_online(partner)
+            chat = Chat.get_or_create_chat(user, partner)
         chat_serialized = ChatSerializer(chat, context={"user": user}).data
         # fetch incoming calls that are currently active
         active_call_room = None
-        active_sessions = LivekitSession.objects.filter(
-            Q(room__u1=user, room__u2=partner, is_active=True, u1_active=True, u2_active=True)
-            | Q(room__u1=user, room__u2=partner, is_active=True, u1_active=True, u2_active=True)
-            | Q(room__u1=partner, room__u2=user, is_active=True, u1_active=True, u2_active=False)
-            | Q(room__u1=partner, room__u2=user, is_active=True, u1_active=False, u2_active=True)
-            | Q(room__u1=user, room__u2=partner, is_active=True, u1_active=True, u2_active=False)
-            | Q(room__u1=user, room__u2=partner, is_active=True, u1_active=False, u2_active=True)
-        )
-        if active_sessions.exists():
-            active_session = active_sessions.first()
+        if prefetch is not None:
+            active_session = prefetch.active_session(user, partner)
+        else:
+            active_session = LivekitSession.objects.filter(
+                Q(room__u1=user, room__u2=partner, is_active=True, u1_active=True, u2_active=True)
+                | Q(room__u1=user, room__u2=partner, is_active=True, u1_active=True, u2_active=True)
+                | Q(room__u1=partner, room__u2=user, is_active=True, u1_active=True, u2_active=False)
+                | Q(room__u1=partner, room__u2=user, is_active=True, u1_active=False, u2_active=True)
+                | Q(room__u1=user, room__u2=partner, is_active=True, u1_active=True, u2_active=False)
+                | Q(room__u1=user, room__u2=partner, is_active=True, u1_active=False, u2_active=True)
+            ).first()
+        if active_session is not None:
             active_call_room = SerializeLivekitSession(active_session).data
 
         partner_data = {
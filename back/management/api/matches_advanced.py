@@ -6,6 +6,7 @@ from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from management.api.bucket_memberships import bucket_members, get_refreshed_at
 from management.api.match_journey_filter_list import MATCH_JOURNEY_FILTERS, determine_match_bucket
 from management.api.utils_advanced import enrich_report_unmatch_with_user_info, filterset_schema_dict
 from management.controller import unmatch_users
@@ -13,6 +14,7 @@ from management.helpers import DetailedPaginationMixin, IsAdminOrMatchingUser
 from management.models.matches import Match
 from management.models.profile import MinimalProfileSerializer
 from management.models.state import State
+from management.models.stats import BucketMembership
 from management.models.user import User
 
 
@@ -113,6 +115,8 @@ class MatchFilter(filters.FilterSet):
 
     def filter_list(self, queryset, name, value):
         selected_filter = next(filter(lambda entry: entry.name == value, MATCH_JOURNEY_FILTERS))
+        if selected_filter.queryset and get_refreshed_at(BucketMembership.Kind.MATCH, [value]):
+            return queryset.filter(pk__in=bucket_members(BucketMembership.Kind.MATCH, value))
         if selected_filter.queryset:
             return selected_filter.queryset(queryset)
         else:
@@ -52,15 +52,16 @@ Last one is a little try and caused some users to have very limited options in t
 
 import dataclasses
 import itertools
-import json
 import math
+import random
+import time
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
 from datetime import timedelta
 from enum import Enum
 
-import pgeocode
-from back.utils import CoolerJson
 from django.core.paginator import Paginator
+from django.db import connection
 from django.db.models import Exists, OuterRef, Q
 from drf_spectacular.utils import extend_schema
 from rest_framework import serializers
@@ -70,17 +71,21 @@ from rest_framework_dataclasses.serializers import DataclassSerializer
 
 from management import controller
 from management.api.user_advanced_filter import needs_matching
-from management.helpers import IsAdminOrMatchingUser
+from management.helpers import IsAdminOrMatchingUser, QueryLogger, get_postal_code_index
 from management.models import scores
 from management.models.matches import Match
 from management.models.profile import Profile
-from management.models.scores import TwoUserMatchingScore
+from management.models.scores import TwoUserMatchingScore, TwoUserMatchingScoreWriter
 from management.models.state import State
 from management.models.unconfirmed_matches import ProposedMatch
 from management.models.user import User
-from management.tasks import burst_calculate_matching_scores, matching_algo_v2
+from management.tasks import (
+    burst_calculate_matching_scores,
+    burst_calculate_matching_scores_vectorized,
+    matching_algo_v2,
+)
 from management.utils import check_task_status
-from management.validators import DAYS, SLOTS
+from management.validators import bitmask_to_availability
 
 
 @dataclass
@@ -119,14 +124,125 @@ class ScoringFunctionsEnum(Enum):
     target_group = "target_group"
 
 
+class PairRelationshipIndex:
+    """
+    Match & proposal relations of a set of users, loaded with two queries per scoring run.
+    Pass it to `ScoringBase(..., relationships=index)` so the relationship checks are set lookups instead of queries.
+    Pairs are stored as (smaller user id, bigger user id).
+    """
+
+    def __init__(self, user_ids):
+        self.user_ids = set(user_ids)
+        self.active_match_pairs = set()
+        self.inactive_match_pairs = set()
+        self.open_proposal_pairs = set()
+        self.non_support_match_count = {}
+
+        matches = Match.objects.filter(Q(user1_id__in=self.user_ids) | Q(user2_id__in=self.user_ids)).values_list(
+            "user1_id", "user2_id", "active", "support_matching"
+        )
+        for user1_id, user2_id, active, support_matching in matches:
+            pair = self.pair(user1_id, user2_id)
+            (self.active_match_pairs if active else self.inactive_match_pairs).add(pair)
+            if not support_matching:
+                for user_id in pair:
+                    self.non_support_match_count[user_id] = self.non_support_match_count.get(user_id, 0) + 1
+
+        proposals = ProposedMatch.objects.filter(
+            Q(user1_id__in=self.user_ids) | Q(user2_id__in=self.user_ids), closed=False
+        ).values_list("user1_id", "user2_id")
+        self.open_proposal_pairs = {self.pair(user1_id, user2_id) for user1_id, user2_id in proposals}
+
+    @staticmethod
+    def pair(user1_id, user2_id):
+        return (user1_id, user2_id) if user1_id < user2_id else (user2_id, user1_id)
+
+    def covers(self, *users):
+        return all(user.pk in self.user_ids for user in users)
+
+    def matched_or_proposed(self, user1, user2):
+        pair = self.pair(user1.pk, user2.pk)
+        return pair in self.active_match_pairs or pair in self.open_proposal_pairs
+
+    def matched_in_past(self, user1, user2):
+        return self.pair(user1.pk, user2.pk) in self.inactive_match_pairs
+
+    def has_non_support_match(self, user):
+        return self.non_support_match_count.get(user.pk, 0) > 0
+
+
+class ScoringProfiler:
+    """
+    Opt-in instrumentation for the scoring functions, pass it to `ScoringBase` ( or `BatchScoringEngine` )
+    to record calls, wall time and db queries ( via `QueryLogger` ) per scoring function.
+    One profiler can be shared by all pairs of a calculation, `dict()` gives the aggregates.
+    """
+
+    def __init__(self):
+        self.stats = {}
+
+    @contextmanager
+    def measure(self, function_name, calls=1):
+        query_logger = QueryLogger()
+        failed = True
+        start = time.monotonic()
+        try:
+            with connection.execute_wrapper(query_logger):
+                yield
+            failed = False
+        finally:
+            seconds = time.monotonic() - start
+            stats = self.stats.setdefault(
+                function_name, {"calls": 0, "errors": 0, "seconds": 0.0, "queries": 0, "query_seconds": 0.0}
+            )
+            stats["calls"] += calls
+            stats["errors"] += int(failed)
+            stats["seconds"] += seconds
+            stats["queries"] += len(query_logger.queries)
+            stats["query_seconds"] += sum(query["duration"] for query in query_logger.queries)
+
+    def dict(self):
+        return self.summarize(self.stats)
+
+    @staticmethod
+    def summarize(stats):
+        total_seconds = sum(function_stats["seconds"] for function_stats in stats.values())
+        functions = {}
+        for function_name, function_stats in sorted(stats.items(), key=lambda item: -item[1]["seconds"]):
+            calls = max(function_stats["calls"], 1)
+            functions[function_name] = {
+                **function_stats,
+                "ms_per_call": 1000 * function_stats["seconds"] / calls,
+                "queries_per_call": function_stats["queries"] / calls,
+                "time_share": function_stats["seconds"] / total_seconds if total_seconds else 0.0,
+            }
+        return {"total_seconds": total_seconds, "functions": functions}
+
+    @classmethod
+    def merge(cls, summaries):
+        """
+        Combines the `dict()` of several profilers, e.g.: of all tasks of a burst calculation
+        """
+        stats = {}
+        for summary in summaries:
+            for function_name, function_stats in summary.get("functions", {}).items():
+                merged = stats.setdefault(
+                    function_name, {"calls": 0, "errors": 0, "seconds": 0.0, "queries": 0, "query_seconds": 0.0}
+                )
+                for key in merged:
+                    merged[key] += function_stats[key]
+        return cls.summarize(stats)
+
+
 class ScoringBase:
     def __init__(
-        self,
-        user1,
-        user2,
+        self, user1, user2, relationships: PairRelationshipIndex = None, profiler: ScoringProfiler = None
     ) -> None:
         self.user1 = user1
         self.user2 = user2
+        # Only used if it contains both users, otherwise the relationship checks query the db
+        self.relationships = relationships if relationships is not None and relationships.covers(user1, user2) else None
+        self.profiler = profiler
         # register scoring functions
         self.scoring_fuctions = {
             ScoringFunctionsEnum.language_level.value: self.score__language_level,
@@ -147,17 +263,9 @@ class ScoringBase:
         Table based scores amount overlaps
         `{"<=0": unmatchable, "=1: 15, "=2": 25, "=3": 29, "=4": 32, "=5": 35, ">=6": 37}
         """
-        slots1 = self.user1.profile.availability
-        slots2 = self.user2.profile.availability
-
-        amnt_common_slots = 0
-        common_slots = {}
-
-        for day in DAYS:
-            for slot in SLOTS:
-                if day in slots1 and day in slots2 and slot in slots1[day] and slot in slots2[day]:
-                    common_slots[day] = common_slots.get(day, []) + [slot]
-                    amnt_common_slots += 1
+        common_mask = self.user1.profile.availability_bitmask & self.user2.profile.availability_bitmask
+        amnt_common_slots = common_mask.bit_count()
+        common_slots = {day: slots for day, slots in bitmask_to_availability(common_mask).items() if slots}
 
         # If no common slots, make unmatchable
         if amnt_common_slots <= 0:
@@ -247,8 +355,7 @@ class ScoringBase:
         `{"<50": 50, "<100": 40, "<200": 30, "<300": 20, "<400": 10, "<500": 5, ">500": 0}`
         """
 
-        dist = pgeocode.GeoDistance("de")
-        distance = dist.query_postal_code(self.user1.profile.postal_code, self.user2.profile.postal_code)
+        distance = get_postal_code_index().distance(self.user1.profile.postal_code, self.user2.profile.postal_code)
         conditions = [
             [lambda x: x < 50.0, 18.0],
             [lambda x: x < 100.0, 16.0],
@@ -372,9 +479,12 @@ class ScoringBase:
 
     def score__learner_no_match_bonus(self):
         learner_user = self.user1 if self.user1.profile.user_type == Profile.TypeChoices.LEARNER else self.user2
-        learner_has_no_match_yet = (
-            Match.objects.filter(Q(user1=learner_user) | Q(user2=learner_user), support_matching=False).count() == 0
-        )
+        if self.relationships is not None:
+            learner_has_no_match_yet = not self.relationships.has_non_support_match(learner_user)
+        else:
+            learner_has_no_match_yet = (
+                Match.objects.filter(Q(user1=learner_user) | Q(user2=learner_user), support_matching=False).count() == 0
+            )
         # We deliberately don't require active=True, as we don't wanna give the bonus to people that resolved their match
         if learner_has_no_match_yet:
             return ScoringFuctionResult(
@@ -426,13 +536,16 @@ class ScoringBase:
         )
 
     def score__already_matched_or_proposed(self):
-        mutal_proposed_match = ProposedMatch.objects.filter(
-            Q(user1=self.user1, user2=self.user2) | Q(user1=self.user2, user2=self.user1), closed=False
-        )
-        mutal_match = Match.objects.filter(
-            Q(user1=self.user1, user2=self.user2) | Q(user1=self.user2, user2=self.user1), active=True
-        )
-        has_mutal_proposed_or_regular_match = mutal_proposed_match.exists() or mutal_match.exists()
+        if self.relationships is not None:
+            has_mutal_proposed_or_regular_match = self.relationships.matched_or_proposed(self.user1, self.user2)
+        else:
+            mutal_proposed_match = ProposedMatch.objects.filter(
+                Q(user1=self.user1, user2=self.user2) | Q(user1=self.user2, user2=self.user1), closed=False
+            )
+            mutal_match = Match.objects.filter(
+                Q(user1=self.user1, user2=self.user2) | Q(user1=self.user2, user2=self.user1), active=True
+            )
+            has_mutal_proposed_or_regular_match = mutal_proposed_match.exists() or mutal_match.exists()
 
         return ScoringFuctionResult(
             matchable=not has_mutal_proposed_or_regular_match,
@@ -442,10 +555,13 @@ class ScoringBase:
         )
 
     def score__reported_or_unmatched_in_past(self):
-        mutal_past_match = Match.objects.filter(
-            Q(user1=self.user1, user2=self.user2) | Q(user1=self.user2, user2=self.user1), active=False
-        )
-        mutal_past_match_exists = mutal_past_match.exists()
+        if self.relationships is not None:
+            mutal_past_match_exists = self.relationships.matched_in_past(self.user1, self.user2)
+        else:
+            mutal_past_match = Match.objects.filter(
+                Q(user1=self.user1, user2=self.user2) | Q(user1=self.user2, user2=self.user1), active=False
+            )
+            mutal_past_match_exists = mutal_past_match.exists()
 
         if mutal_past_match_exists:
             return ScoringFuctionResult(
@@ -525,7 +641,8 @@ class ScoringBase:
         results = []
         for score_function in list(self.scoring_fuctions.keys()):
             try:
-                res = self.scoring_fuctions[score_function]()
+                with self.profiler.measure(score_function) if self.profiler else nullcontext():
+                    res = self.scoring_fuctions[score_function]()
                 assert res, f"Score function must return a ScoringFuctionResult: {score_function} doesn't"
             except Exception as e:
                 print(f"Error in score function {score_function}:", e)
@@ -545,11 +662,14 @@ def score_between_db_update(user1, user2):
     base = ScoringBase(user1, user2)
     total_score, matchable, results = base.calculate_score()
 
-    score = TwoUserMatchingScore.get_or_create(user1, user2)
-    score.score = total_score
-    score.matchable = matchable
-    score.scoring_results = json.loads(json.dumps(results, cls=CoolerJson))
-    score.save()
+    if user1.id > user2.id:
+        user1, user2 = user2, user1
+
+    score, _ = TwoUserMatchingScore.objects.update_or_create(
+        user1=user1,
+        user2=user2,
+        defaults={"score": total_score, "matchable": matchable, "scoring_results": results},
+    )
 
     return total_score, matchable, results, score
 
@@ -637,11 +757,24 @@ def get_users_to_consider(usr=None, consider_only_registered_within_last_x_days=
 
 
 def calculate_scores_user(
-    user_pk, consider_only_registered_within_last_x_days=None, report=lambda data: print(data), exlude_user_ids=[]
+    user_pk,
+    consider_only_registered_within_last_x_days=None,
+    report=lambda data: print(data),
+    exlude_user_ids=[],
+    write_chunk_size=500,
+    prefilter=True,
+    top_k=None,
 ):
+    """
+    Scores `user_pk` against the scoring pool.
+    With `prefilter` pool users that are unmatchable by a hard constraint are skipped ( see `scores_prefilter` ),
+    with `top_k` only the K candidates with the best upper bound score are scored.
+    Scores with skipped or unconsidered users are deleted.
+    """
     from django.db.models import Exists, OuterRef, Q
 
     from management import controller
+    from management.api.scores_prefilter import prefilter_candidates, top_k_candidates
 
     usr = controller.get_user_by_pk(user_pk)
 
@@ -655,11 +788,21 @@ def calculate_scores_user(
     total_considered_users = all_users_to_consider.count()
     total_unconsidered_users = all_users_not_to_consider.count()
 
+    candidates = all_users_to_consider
+    if prefilter:
+        candidates = prefilter_candidates(usr, candidates)
+    if top_k is not None:
+        candidates = all_users_to_consider.filter(pk__in=top_k_candidates(usr, candidates, top_k))
+    candidate_ids = list(candidates.values_list("pk", flat=True))
+    pruned_candidates = total_considered_users - len(candidate_ids)
+
     # we always delete all scores of unconsidered users, that way we assure that we don't blow database sizes!
     from management.models.scores import TwoUserMatchingScore
 
-    cleaned_scores = TwoUserMatchingScore.objects.filter(
-        (~Q(user1__in=all_users_to_consider) and Q(user2=usr)) | (~Q(user2__in=all_users_to_consider) and Q(user1=usr))
+    cleaned_scores = (
+        TwoUserMatchingScore.objects.filter(Q(user1=usr) | Q(user2=usr))
+        .exclude(user1_id__in=candidate_ids)
+        .exclude(user2_id__in=candidate_ids)
     )
     count_cleaned_scores = cleaned_scores.count()
     cleaned_scores.delete()
@@ -670,6 +813,7 @@ def calculate_scores_user(
         {
             "total_considered_users": total_considered_users,
             "total_unconsidered_users": total_unconsidered_users,
+            "pruned_candidates": pruned_candidates,
             "scores_cleaned": count_cleaned_scores,
             "progress": 0,
             "matchable_count": matchable_count,
@@ -677,28 +821,34 @@ def calculate_scores_user(
         }
     )
 
-    for user in all_users_to_consider:
-        c += 1
-        total_score, matchable, results, score = score_between_db_update(usr, user)
-
-        if matchable:
-            matchable_count += 1
-
-        report(
-            {
-                "total_considered_users": total_considered_users,
-                "total_unconsidered_users": total_unconsidered_users,
-                "scores_cleaned": count_cleaned_scores,
-                "progress": c,
-                "matchable_count": matchable_count,
-                "state": "processing",
-                "current_user": user.pk,
-            }
-        )
+    relationships = PairRelationshipIndex([usr.pk, *candidate_ids])
+
+    with TwoUserMatchingScoreWriter(chunk_size=write_chunk_size) as writer:
+        for user in User.objects.with_related("profile").filter(pk__in=candidate_ids):
+            c += 1
+            total_score, matchable, results = ScoringBase(usr, user, relationships=relationships).calculate_score()
+            writer.add(usr.pk, user.pk, total_score, matchable, results)
+
+            if matchable:
+                matchable_count += 1
+
+            report(
+                {
+                    "total_considered_users": total_considered_users,
+                    "total_unconsidered_users": total_unconsidered_users,
+                    "pruned_candidates": pruned_candidates,
+                    "scores_cleaned": count_cleaned_scores,
+                    "progress": c,
+                    "matchable_count": matchable_count,
+                    "state": "processing",
+                    "current_user": user.pk,
+                }
+            )
 
     return {
         "total_considered_users": total_considered_users,
         "total_unconsidered_users": total_unconsidered_users,
+        "pruned_candidates": pruned_candidates,
         "scores_cleaned": count_cleaned_scores,
         "matchable_count": matchable_count,
         "progress": c,
@@ -731,6 +881,16 @@ class BurstCalculateMatchingScoresV2RequestSerializer(serializers.Serializer):
     delete_old_scores = serializers.BooleanField(
         help_text="Delete all old scores before starting", default=True, required=False
     )
+    vectorized = serializers.BooleanField(
+        help_text="Score all learner / volunteer pairs at once in a single task ( see `scores_batch` )",
+        default=True,
+        required=False,
+    )
+    profile_scoring = serializers.BooleanField(
+        help_text="Report time & queries per scoring function in the task progress ( see `ScoringProfiler` )",
+        default=False,
+        required=False,
+    )
 
 
 @extend_schema(
@@ -765,6 +925,20 @@ def burst_calculate_matching_scores_v2(request):
         exclude_non_german_residents=True,
     )
     user_id_set = set(requires_matching.values_list("id", flat=True))
+
+    if serializer.validated_data["vectorized"]:
+        if len(user_id_set) < 2:
+            ongoing_update.delete()
+            return Response({"msg": "No matching needed"}, status=200)
+
+        task = burst_calculate_matching_scores_vectorized.delay(
+            list(user_id_set), profile_scoring=serializer.validated_data["profile_scoring"]
+        )
+        ongoing_update.meta["tasks"] = [task.id]
+        ongoing_update.meta["completed_tasks"] = []
+        ongoing_update.save()
+        return Response([task.id])
+
     list_combinations = list(itertools.combinations(user_id_set, 2))
 
     total_combinations = len(list_combinations)
@@ -775,7 +949,10 @@ def burst_calculate_matching_scores_v2(request):
     if not task_batches:
         return Response({"msg": "No matching needed"}, status=200)
 
-    created_tasks = [burst_calculate_matching_scores.delay(batch) for batch in task_batches]
+    created_tasks = [
+        burst_calculate_matching_scores.delay(batch, profile_scoring=serializer.validated_data["profile_scoring"])
+        for batch in task_batches
+    ]
 
     created_tasks_ids = [task.id for task in created_tasks]
 
@@ -797,66 +974,66 @@ def get_active_burst_calculation(request):
         tasks = ongoing_update.first().meta["tasks"]
         task_states = [check_task_status(task_id) for task_id in tasks]
 
-        return Response({"active": True, "tasks": task_states})
+        response = {"active": True, "tasks": task_states}
+        scoring_profiles = [
+            state["info"]["scoring_profile"]
+            for state in task_states
+            if isinstance(state["info"], dict) and "scoring_profile" in state["info"]
+        ]
+        if scoring_profiles:
+            response["scoring_profile"] = ScoringProfiler.merge(scoring_profiles)
+        return Response(response)
     else:
         return Response({"active": False})
 
 
-def instantly_possible_matches():
-    import networkx as nx
+@api_view(["GET"])
+@permission_classes([IsAdminOrMatchingUser])
+def profile_scoring_functions(request):
+    """
+    Scores `sample_pairs` random pairs of the current scoring pool with a `ScoringProfiler`
+    and returns time & queries per scoring function
+    """
+    sample_pairs = min(int(request.query_params.get("sample_pairs", 200)), 5000)
 
-    from management.models.scores import TwoUserMatchingScore
+    pool_ids = list(get_users_to_consider().values_list("pk", flat=True))
+    if len(pool_ids) < 2:
+        return Response({"msg": "Not enough users in the scoring pool"}, status=400)
 
-    matches = SimpleMatchingScoreSerializer(
-        TwoUserMatchingScore.objects.filter(matchable=True).order_by("-score"), many=True
-    ).data
+    pairs = [random.sample(pool_ids, 2) for _ in range(sample_pairs)]
+    users = User.objects.with_related("profile").in_bulk({user_id for pair in pairs for user_id in pair})
+    relationships = PairRelationshipIndex(users.keys())
 
-    G = nx.Graph()
-    print("CONSIDERED", matches)
+    profiler = ScoringProfiler()
+    for user1_id, user2_id in pairs:
+        ScoringBase(users[user1_id], users[user2_id], relationships=relationships, profiler=profiler).calculate_score()
 
-    # Add an edge for each pair of users with the score as weight
-    for match in matches:
-        G.add_edge(match["user1"], match["user2"], weight=float(match["score"]))
+    return Response({"sample_pairs": len(pairs), "pool_size": len(pool_ids), **profiler.dict()})
 
-    # Use the max_weight_matching function of NetworkX
-    matches = nx.max_weight_matching(G, maxcardinality=True)
 
-    # max_weight_matching returns a set of frozensets, convert to list of tuples
-    matches = [tuple(match) for match in matches]
-    return matches
+def instantly_possible_matches():
+    from management.api.scores_matching import solve_score_maximization
+
+    return solve_score_maximization().pairs
 
 
 @api_view(["GET"])
 @permission_classes([IsAdminOrMatchingUser])
 def score_maximization_matching(request):
+    from management.api.scores_matching import DEFAULT_TIME_BUDGET, solve_score_maximization
     from management.api.user_advanced import AdvancedMatchingScoreSerializer
     from management.models.scores import TwoUserMatchingScore
 
-    matches = instantly_possible_matches()
-
-    print("MATCHES", matches)
-
-    # perform a finaly check if not users are matched twice
-    user_pks = []
-    for match in matches:
-        if match[0] in user_pks or match[1] in user_pks:
-            # Fow now if the user was already matched we just ignore that score
-            pass
-            # TODO: make ignoring this case optional
-            # raise ValueError("User matched twice")
-        else:
-            user_pks.append(match[0])
-            user_pks.append(match[1])
+    time_budget = float(request.query_params.get("time_budget", DEFAULT_TIME_BUDGET))
+    result = solve_score_maximization(time_budget=time_budget)
 
     items_per_page = int(request.query_params.get("items_per_page", 50))
     page = int(request.query_params.get("page", 1))
 
-    scores = []
-    for match in matches:
-        user1 = User.objects.get(id=match[0])
-        user2 = User.objects.get(id=match[1])
-        score = TwoUserMatchingScore.get_score(user1, user2)
-        scores.append(score)
+    # the assignment never contains a user twice, so all scores can be loaded at once
+    scores = (
+        TwoUserMatchingScore.objects.filter(id__in=result.score_ids).select_related("user1", "user2").order_by("-score")
+    )
 
     paginator = Paginator(scores, items_per_page)
     pages = paginator.page(page)
@@ -867,7 +1044,7 @@ def score_maximization_matching(request):
             page=page,
             items_per_page=items_per_page,
             total_pages=paginator.num_pages,
-            total_items=len(scores),
+            total_items=len(result.score_ids),
             results=serialized,
         ).dict()
     )
@@ -7,7 +7,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from management.api.match_journey_filter_list import MATCH_JOURNEY_FILTERS
-from management.api.scores import instantly_possible_matches
+from management.api.scores_matching import solve_score_maximization
 from management.api.user_advanced import AdvancedUserSerializer
 from management.api.utils_advanced import filterset_schema_dict
 from management.helpers import DetailedPaginationMixin, IsAdminOrMatchingUser
@@ -62,17 +62,7 @@ class TwoUserMatchingScoreFilter(filters.FilterSet):
 
     def filter_current_match_suggestion(self, queryset, name, value):
         if value:
-            suggested_matches = instantly_possible_matches()
-            user_pairs = [(user1, user2) for user1, user2 in suggested_matches]
-            queries = [
-                Q(user1_id=user1, user2_id=user2) | Q(user1_id=user2, user2_id=user1) for user1, user2 in user_pairs
-            ]
-            if len(queries) == 0:
-                return queryset.none()
-            query = queries.pop()
-            for item in queries:
-                query |= item
-            return queryset.filter(query)
+            return queryset.filter(id__in=solve_score_maximization().score_ids)
         return queryset
 
 
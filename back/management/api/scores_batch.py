@@ -0,0 +1,489 @@
+"""
+Vectorized scoring engine for the full learner x volunteer score matrix.
+
+`ScoringBase` scores one pair at a time and loads both users, their profiles and their matches for every pair.
+For a burst calculation over a few thousand searching users that is millions of ORM round trips.
+
+Here all candidate profiles are loaded once into compact NumPy feature arrays:
+- availability as the 49 bit `Profile.availability_bitmask`
+- interests / target groups as bitsets over the values present in the population
+- language levels, gender & partner gender as small integer codes
+- postal code coordinates
+- the (active / proposed / past) match pairs of the population
+
+Every scoring function of `ScoringBase` has a vectorized counterpart here that works on arrays of user indices.
+Scores and `matchable` are identical to `ScoringBase.calculate_score` for every learner / volunteer pair.
+Learner + learner or volunteer + volunteer pairs are never matchable, so they are not part of the matrix.
+"""
+
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+import numpy as np
+
+from management.api.scores import PairRelationshipIndex, ScoringFunctionsEnum
+from management.helpers.postal_codes import get_postal_code_index, haversine_distance
+from management.models.profile import Profile
+
+logger = logging.getLogger(__name__)
+
+# Same order as the functions registered in `ScoringBase.__init__`
+SCORING_FUNCTIONS = [
+    ScoringFunctionsEnum.language_level.value,
+    ScoringFunctionsEnum.learner_vs_volunteer.value,
+    ScoringFunctionsEnum.time_slot_overlap.value,
+    ScoringFunctionsEnum.postal_code_distance.value,
+    ScoringFunctionsEnum.gender.value,
+    ScoringFunctionsEnum.interest_overlap.value,
+    ScoringFunctionsEnum.already_matched_or_proposed.value,
+    ScoringFunctionsEnum.learner_no_match_bonus.value,
+    ScoringFunctionsEnum.match_in_past.value,
+    ScoringFunctionsEnum.target_group.value,
+]
+
+LANG_LEVEL_TO_INT = {
+    Profile.LanguageSkillChoices.LEVEL_0: 0,
+    Profile.LanguageSkillChoices.LEVEL_1: 1,
+    Profile.LanguageSkillChoices.LEVEL_2: 2,
+    Profile.LanguageSkillChoices.LEVEL_3: 3,
+    Profile.MinLangLevelPartnerChoices.LEVEL_0: 0,
+    Profile.MinLangLevelPartnerChoices.LEVEL_1: 1,
+    Profile.MinLangLevelPartnerChoices.LEVEL_2: 2,
+    Profile.MinLangLevelPartnerChoices.LEVEL_3: 3,
+}
+
+# 'any' has to be 0, the gender check relies on it
+GENDER_TO_INT = {
+    None: 0,
+    Profile.GenderChoices.ANY: 0,
+    Profile.GenderChoices.MALE: 1,
+    Profile.GenderChoices.FEMALE: 2,
+    Profile.GenderChoices.DIVERSE: 3,
+    Profile.PartnerGenderChoices.ANY: 0,
+    Profile.PartnerGenderChoices.MALE: 1,
+    Profile.PartnerGenderChoices.FEMALE: 2,
+    Profile.PartnerGenderChoices.DIVERSE: 3,
+}
+
+# score tables, indexed by the amount of common slots / interests ( capped at the last entry )
+TIME_SLOT_OVERLAP_SCORES = np.array([0, 15, 25, 29, 32, 35, 37], dtype=np.float64)
+INTEREST_OVERLAP_SCORES = np.array([0, 5, 10, 15, 20, 25, 30], dtype=np.float64)
+
+# (upper distance bound in km, score), distances >= 500km or unknown postal codes score 0
+POSTAL_CODE_DISTANCE_SCORES = [
+    (50.0, 18.0),
+    (100.0, 16.0),
+    (200.0, 14.0),
+    (300.0, 12.0),
+    (400.0, 10.0),
+    (500.0, 5.0),
+]
+
+# Condensed version of the `ScoringBase` reports, `{detail}` is filled per pair where available
+MARKDOWN_INFO = {
+    ScoringFunctionsEnum.language_level.value: "Volunteer min lang level vs learner german level",
+    ScoringFunctionsEnum.learner_vs_volunteer.value: "Volunteer + Learner",
+    ScoringFunctionsEnum.time_slot_overlap.value: "Common slots: ({detail})",
+    ScoringFunctionsEnum.postal_code_distance.value: "Distance is {detail:.2f}km",
+    ScoringFunctionsEnum.gender.value: "Gender choices",
+    ScoringFunctionsEnum.interest_overlap.value: "Interests Overlap: {detail}",
+    ScoringFunctionsEnum.already_matched_or_proposed.value: "Not matched or proposed already",
+    ScoringFunctionsEnum.learner_no_match_bonus.value: "Learner has no match yet",
+    ScoringFunctionsEnum.match_in_past.value: "Never been matched in the past",
+    ScoringFunctionsEnum.target_group.value: "Target group",
+}
+
+
+def popcount(values):
+    """
+    Counts the set bits of every element of an unsigned integer array.
+    Uses `np.bitwise_count` when available ( numpy >= 2.0 ) and a byte lookup table otherwise.
+    """
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values).astype(np.int64)
+    table = np.array([i.bit_count() for i in range(256)], dtype=np.int64)
+    return table[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def encode_sets(value_lists):
+    """
+    Encodes a list of iterables ( e.g.: all users interests ) as bitsets.
+    Returns an array of shape (n, words) of uint64 and the value -> bit index vocabulary.
+    """
+    vocabulary = {}
+    for values in value_lists:
+        for value in values:
+            vocabulary.setdefault(value, len(vocabulary))
+
+    words = max(1, (len(vocabulary) + 63) // 64)
+    encoded = np.zeros((len(value_lists), words), dtype=np.uint64)
+    for i, values in enumerate(value_lists):
+        for value in values:
+            bit = vocabulary[value]
+            encoded[i, bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+    return encoded, vocabulary
+
+
+def postal_code_distance_scores(distance):
+    """
+    Maps distances to the `score__postal_code_distance` table, NaN distances ( unknown postal codes ) score 0
+    """
+    score = np.zeros(np.shape(distance), dtype=np.float64)
+    unscored = np.ones(np.shape(distance), dtype=bool)
+    for upper_bound, points in POSTAL_CODE_DISTANCE_SCORES:
+        hit = unscored & (distance < upper_bound)
+        score[hit] = points
+        unscored &= ~hit
+    return score
+
+
+def _german_level(lang_skill):
+    # mirrors `score__language_level`, any lookup error makes the function fail for that user
+    try:
+        german_level = list(filter(lambda x: x["lang"] == "german", lang_skill))[0]["level"]
+        return LANG_LEVEL_TO_INT[german_level]
+    except (KeyError, IndexError, TypeError):
+        return -1
+
+
+def _pair_keys(pairs, index_of, n):
+    keys = [index_of[u1] * n + index_of[u2] for u1, u2 in pairs if u1 in index_of and u2 in index_of]
+    keys += [index_of[u2] * n + index_of[u1] for u1, u2 in pairs if u1 in index_of and u2 in index_of]
+    return np.unique(np.array(keys, dtype=np.int64))
+
+
+@dataclass
+class FunctionResult:
+    score: np.ndarray
+    matchable: np.ndarray
+
+
+class BatchScoringEngine:
+    """
+    Loads all profiles of `user_ids` once and scores every learner against every volunteer.
+
+    All `score__*` methods take two broadcastable arrays of user indices (learners, volunteers).
+    Pass `learners[:, None], volunteers[None, :]` for the full matrix or two flat arrays for a list of pairs.
+    """
+
+    def __init__(self, user_ids, profiler=None):
+        # optional `ScoringProfiler`, records every vectorized scoring function with the amount of pairs as calls
+        self.profiler = profiler
+        self.user_ids = np.array(sorted(set(user_ids)), dtype=np.int64)
+        self.index_of = {int(user_id): i for i, user_id in enumerate(self.user_ids)}
+        self.load_profiles()
+        self.load_relations()
+
+    def load_profiles(self):
+        n = len(self.user_ids)
+        rows = Profile.objects.filter(user_id__in=self.user_ids.tolist()).values_list(
+            "user_id",
+            "user_type",
+            "availability_bitmask",
+            "lang_skill",
+            "min_lang_level_partner",
+            "gender",
+            "partner_gender",
+            "target_group",
+            "target_groups",
+            "postal_code",
+            "interests",
+        )
+
+        self.is_learner = np.zeros(n, dtype=bool)
+        self.is_volunteer = np.zeros(n, dtype=bool)
+        self.availability = np.zeros(n, dtype=np.uint64)
+        self.german_level = np.full(n, -1, dtype=np.int8)
+        self.min_lang_level = np.full(n, -1, dtype=np.int8)
+        self.gender = np.full(n, -1, dtype=np.int8)
+        self.partner_gender = np.full(n, -1, dtype=np.int8)
+        self.interests_error = np.zeros(n, dtype=bool)
+
+        target_group = [None] * n
+        learner_target_groups = [[] for _ in range(n)]
+        interests = [[] for _ in range(n)]
+        postal_codes = [""] * n
+
+        for (
+            user_id,
+            user_type,
+            availability_bitmask,
+            lang_skill,
+            min_lang_level,
+            gender,
+            partner_gender,
+            _target_group,
+            target_groups,
+            postal_code,
+            _interests,
+        ) in rows:
+            i = self.index_of[user_id]
+            self.is_learner[i] = user_type == Profile.TypeChoices.LEARNER
+            self.is_volunteer[i] = user_type == Profile.TypeChoices.VOLUNTEER
+            self.availability[i] = availability_bitmask
+            self.german_level[i] = _german_level(lang_skill)
+            self.min_lang_level[i] = LANG_LEVEL_TO_INT.get(min_lang_level, -1)
+            self.gender[i] = GENDER_TO_INT.get(gender, -1)
+            self.partner_gender[i] = GENDER_TO_INT.get(partner_gender, -1)
+            target_group[i] = _target_group
+            # If learner hasn't specified any target groups, use the single target_group field
+            learner_target_groups[i] = list(target_groups) if target_groups else [_target_group]
+            if _interests is None:
+                self.interests_error[i] = True
+            else:
+                interests[i] = list(_interests)
+            postal_codes[i] = postal_code or ""
+
+        self.interests, _ = encode_sets(interests)
+
+        self.target_groups, target_group_bits = encode_sets(
+            learner_target_groups + [[tg] for tg in target_group] + [list(Profile.TargetGroupChoices2.values)]
+        )
+        self.target_groups = self.target_groups[:n]
+        self.target_group_bit = np.array([target_group_bits[tg] for tg in target_group], dtype=np.int64)
+        self.target_group_refugee = np.array(
+            [tg == Profile.TargetGroupChoices2.REFUGEE for tg in target_group], dtype=bool
+        )
+        self.target_group_any = np.array([tg == Profile.TargetGroupChoices2.ANY for tg in target_group], dtype=bool)
+
+        try:
+            self.lat, self.lon = get_postal_code_index().coordinates(postal_codes)
+            self.postal_code_error = None
+        except Exception as e:
+            # `ScoringBase` fails the distance function for every pair in this case, so do we
+            logger.exception("Couldn't look up postal code coordinates, distance scoring fails for all pairs")
+            self.lat = self.lon = np.full(n, np.nan)
+            self.postal_code_error = e
+
+    def load_relations(self):
+        n = len(self.user_ids)
+        relationships = PairRelationshipIndex(self.user_ids.tolist())
+
+        self.has_match = np.array(
+            [relationships.non_support_match_count.get(int(user_id), 0) > 0 for user_id in self.user_ids], dtype=bool
+        )
+        self.matched_or_proposed_keys = _pair_keys(
+            relationships.active_match_pairs | relationships.open_proposal_pairs, self.index_of, n
+        )
+        self.past_match_keys = _pair_keys(relationships.inactive_match_pairs, self.index_of, n)
+
+    @property
+    def learners(self):
+        return np.flatnonzero(self.is_learner)
+
+    @property
+    def volunteers(self):
+        return np.flatnonzero(self.is_volunteer)
+
+    def _pair_in(self, keys, learner, volunteer):
+        return np.isin(learner * len(self.user_ids) + volunteer, keys)
+
+    def score__language_level(self, learner, volunteer):
+        german_level = self.german_level[learner]
+        min_lang_level = self.min_lang_level[volunteer]
+        error = (german_level < 0) | (min_lang_level < 0)
+        matchable = ~error & (min_lang_level <= german_level)
+        return FunctionResult(np.where(matchable, 30.0, 0.0), matchable)
+
+    def score__volunteer_vs_learner(self, learner, volunteer):
+        shape = np.broadcast_shapes(np.shape(learner), np.shape(volunteer))
+        return FunctionResult(np.zeros(shape), np.ones(shape, dtype=bool))
+
+    def score__time_slot_overlap(self, learner, volunteer):
+        common_slots = popcount(self.availability[learner] & self.availability[volunteer])
+        matchable = common_slots > 0
+        score = np.where(matchable, TIME_SLOT_OVERLAP_SCORES[np.minimum(common_slots, 6)], 0.0)
+        return FunctionResult(score, matchable)
+
+    def score__postal_code_distance(self, learner, volunteer):
+        distance = haversine_distance(self.lat[learner], self.lon[learner], self.lat[volunteer], self.lon[volunteer])
+        if self.postal_code_error is not None:
+            return FunctionResult(np.zeros(np.shape(distance)), np.zeros(np.shape(distance), dtype=bool))
+        return FunctionResult(postal_code_distance_scores(distance), np.ones(np.shape(distance), dtype=bool))
+
+    def score__gender(self, learner, volunteer):
+        gender1, partner_gender1 = self.gender[learner], self.partner_gender[learner]
+        gender2, partner_gender2 = self.gender[volunteer], self.partner_gender[volunteer]
+        error = (gender1 < 0) | (partner_gender1 < 0) | (gender2 < 0) | (partner_gender2 < 0)
+
+        # disallow when any gender wish is broken, 'any' is encoded as 0
+        wish_broken = ((partner_gender1 > 0) & (gender2 == 0)) | ((partner_gender2 > 0) & (gender1 == 0))
+        wish1 = gender1 == partner_gender2
+        wish2 = gender2 == partner_gender1
+        still_ok1 = wish1 | (partner_gender2 == 0)
+        still_ok2 = wish2 | (partner_gender1 == 0)
+
+        matchable = ~error & ~wish_broken & still_ok1 & still_ok2
+        score = np.where(matchable & wish1 & wish2, 20.0, np.where(matchable, 10.0, 0.0))
+        return FunctionResult(score, matchable)
+
+    def score__interest_overlap(self, learner, volunteer):
+        common_interests = popcount(self.interests[learner] & self.interests[volunteer]).sum(axis=-1)
+        error = self.interests_error[learner] | self.interests_error[volunteer]
+        score = np.where(error, 0.0, INTEREST_OVERLAP_SCORES[np.minimum(common_interests, 6)])
+        return FunctionResult(score, ~error)
+
+    def score__already_matched_or_proposed(self, learner, volunteer):
+        matchable = ~self._pair_in(self.matched_or_proposed_keys, learner, volunteer)
+        return FunctionResult(np.zeros(np.shape(matchable)), matchable)
+
+    def score__learner_no_match_bonus(self, learner, volunteer):
+        shape = np.broadcast_shapes(np.shape(learner), np.shape(volunteer))
+        has_match = np.broadcast_to(self.has_match[learner], shape)
+        return FunctionResult(np.where(has_match, 0.0, 20.0), np.ones(np.shape(has_match), dtype=bool))
+
+    def score__reported_or_unmatched_in_past(self, learner, volunteer):
+        matchable = ~self._pair_in(self.past_match_keys, learner, volunteer)
+        return FunctionResult(np.zeros(np.shape(matchable)), matchable)
+
+    def score__target_group(self, learner, volunteer):
+        bit = self.target_group_bit[volunteer]
+        word = self.target_groups[learner, bit // 64]
+        in_group = ((word >> (bit % 64).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+        refugee = self.target_group_refugee[volunteer]
+        specific = ~refugee & ~self.target_group_any[volunteer]
+
+        matchable = ~(refugee & ~in_group)
+        score = np.where(
+            refugee,
+            np.where(in_group, 30.0, 0.0),
+            np.where(specific, np.where(in_group, 20.0, -20.0), 5.0),
+        )
+        return FunctionResult(score, matchable)
+
+    @property
+    def scoring_functions(self):
+        return {
+            ScoringFunctionsEnum.language_level.value: self.score__language_level,
+            ScoringFunctionsEnum.learner_vs_volunteer.value: self.score__volunteer_vs_learner,
+            ScoringFunctionsEnum.time_slot_overlap.value: self.score__time_slot_overlap,
+            ScoringFunctionsEnum.postal_code_distance.value: self.score__postal_code_distance,
+            ScoringFunctionsEnum.gender.value: self.score__gender,
+            ScoringFunctionsEnum.interest_overlap.value: self.score__interest_overlap,
+            ScoringFunctionsEnum.already_matched_or_proposed.value: self.score__already_matched_or_proposed,
+            ScoringFunctionsEnum.learner_no_match_bonus.value: self.score__learner_no_match_bonus,
+            ScoringFunctionsEnum.match_in_past.value: self.score__reported_or_unmatched_in_past,
+            ScoringFunctionsEnum.target_group.value: self.score__target_group,
+        }
+
+    def score_pairs(self, learner, volunteer):
+        """
+        Scores the broadcast pairs of `learner` & `volunteer` indices.
+        Returns (total_score, matchable, {function: FunctionResult})
+        """
+        functions = self.scoring_functions
+        shape = np.broadcast_shapes(np.shape(learner), np.shape(volunteer))
+
+        results = {}
+        for name in SCORING_FUNCTIONS:
+            with self.profiler.measure(name, calls=int(np.prod(shape))) if self.profiler else nullcontext():
+                results[name] = functions[name](learner, volunteer)
+
+        total_score = np.zeros(shape, dtype=np.float64)
+        matchable = np.ones(shape, dtype=bool)
+        for res in results.values():
+            total_score += res.score
+            matchable &= res.matchable
+        return total_score, matchable, results
+
+    def calculate(self):
+        """
+        Scores every learner against every volunteer of the population.
+        """
+        learners, volunteers = self.learners, self.volunteers
+        total_score, matchable, results = self.score_pairs(learners[:, None], volunteers[None, :])
+        results = {
+            name: FunctionResult(
+                np.broadcast_to(res.score, total_score.shape), np.broadcast_to(res.matchable, total_score.shape)
+            )
+            for name, res in results.items()
+        }
+        return BatchScoringResult(
+            engine=self,
+            learners=learners,
+            volunteers=volunteers,
+            score=total_score,
+            matchable=matchable,
+            results=results,
+        )
+
+    def scoring_results(self, learner, volunteer, results=None):
+        """
+        Per pair scoring results in the `ScoringBase.calculate_score` format for a flat list of pairs.
+        Pass the already calculated `results` of these pairs to not score them again.
+        """
+        learner = np.asarray(learner, dtype=np.int64)
+        volunteer = np.asarray(volunteer, dtype=np.int64)
+        if results is None:
+            _, _, results = self.score_pairs(learner, volunteer)
+
+        details = {
+            ScoringFunctionsEnum.time_slot_overlap.value: popcount(
+                self.availability[learner] & self.availability[volunteer]
+            ),
+            ScoringFunctionsEnum.postal_code_distance.value: haversine_distance(
+                self.lat[learner], self.lon[learner], self.lat[volunteer], self.lon[volunteer]
+            ),
+            ScoringFunctionsEnum.interest_overlap.value: popcount(
+                self.interests[learner] & self.interests[volunteer]
+            ).sum(axis=-1),
+        }
+
+        pair_results = []
+        for k in range(len(learner)):
+            pair = []
+            for name, res in results.items():
+                score, matchable = float(res.score[k]), bool(res.matchable[k])
+                info = MARKDOWN_INFO[name].format(detail=details[name][k] if name in details else None)
+                info += f" (score: {score})" if matchable else f" (score: {score}) :x:"
+                pair.append(
+                    {
+                        "score_function": name,
+                        "res": {"matchable": matchable, "score": score, "weight": 1.0, "markdown_info": info},
+                    }
+                )
+            pair_results.append(pair)
+        return pair_results
+
+
+@dataclass
+class BatchScoringResult:
+    engine: BatchScoringEngine
+    learners: np.ndarray
+    volunteers: np.ndarray
+    score: np.ndarray
+    matchable: np.ndarray
+    # {function: FunctionResult} of the full matrix
+    results: dict
+
+    def iter_pairs(self, chunk_size=1000, with_results=True):
+        """
+        Yields lists of (learner_id, volunteer_id, score, matchable, scoring_results) in chunks of `chunk_size` pairs.
+        """
+        total = self.score.size
+        n_volunteers = len(self.volunteers)
+        for start in range(0, total, chunk_size):
+            flat = np.arange(start, min(start + chunk_size, total))
+            learner = self.learners[flat // n_volunteers]
+            volunteer = self.volunteers[flat % n_volunteers]
+            if with_results:
+                chunk_results = {
+                    name: FunctionResult(res.score.flat[flat], res.matchable.flat[flat])
+                    for name, res in self.results.items()
+                }
+                results = self.engine.scoring_results(learner, volunteer, chunk_results)
+            else:
+                results = [None] * len(flat)
+            yield [
+                (
+                    int(self.engine.user_ids[learner[k]]),
+                    int(self.engine.user_ids[volunteer[k]]),
+                    float(self.score.flat[flat[k]]),
+                    bool(self.matchable.flat[flat[k]]),
+                    results[k],
+                )
+                for k in range(len(flat))
+            ]
@@ -0,0 +1,222 @@
+"""
+Max-weight learner / volunteer assignment over the matchable `TwoUserMatchingScore` rows.
+
+Matchable scores only exist between a learner and a volunteer, so the score graph is bipartite.
+Instead of a general graph blossom algorithm this solves the rectangular assignment problem directly:
+- scores are read with one `values_list` query into NumPy arrays
+- the edges are split into connected components, components are independent assignment problems
+- per component learners are rows, volunteers are columns, pairs without a matchable score have weight 0
+- every existing edge gets a constant bonus larger than any possible score sum, so like
+  `networkx.max_weight_matching(maxcardinality=True)` the most pairs win first and the highest total score second
+- the assignment is solved with the shortest augmenting path Hungarian algorithm, vectorized per row
+
+The Hungarian algorithm is O(n² * m) and needs a dense n x m cost matrix, for components larger than
+`max_exact_cells` or when the `time_budget` runs out the remaining learners are assigned greedily by descending score.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from management.models.profile import Profile
+from management.models.scores import TwoUserMatchingScore
+
+DEFAULT_TIME_BUDGET = 10.0  # seconds
+# Above this amount of learner x volunteer cells in a component its dense matrices ( ~12 bytes per cell )
+# are skipped and the component is only assigned greedily
+MAX_EXACT_CELLS = 1_000_000
+
+
+@dataclass
+class ScoreMatchingResult:
+    score_ids: list = field(default_factory=list)
+    pairs: list = field(default_factory=list)  # (user1_id, user2_id) as stored in `TwoUserMatchingScore`
+    total_score: float = 0.0
+    method: str = "none"  # 'hungarian', 'hungarian+greedy' or 'greedy'
+
+
+def hungarian_assignment(cost, deadline=None):
+    """
+    Minimum cost assignment of every row of `cost` (n x m, n <= m) to a distinct column.
+    Returns `row_to_col`, rows that were not reached before `deadline` (`time.monotonic()`) are -1.
+    The rows assigned so far always form a valid, optimal assignment of these rows.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    # column j (1 based) -> assigned row (1 based), 0 = free
+    col_to_row = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+        col_to_row[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+
+        while True:
+            used[j0] = True
+            i0 = col_to_row[j0]
+            free = ~used
+            free[0] = False
+
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            improved = free[1:] & (reduced < minv[1:])
+            minv[1:][improved] = reduced[improved]
+            way[1:][improved] = j0
+
+            candidates = np.where(free, minv, np.inf)
+            j1 = int(np.argmin(candidates))
+            delta = candidates[j1]
+
+            u[col_to_row[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+
+            j0 = j1
+            if col_to_row[j0] == 0:
+                break
+
+        # flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            col_to_row[j0] = col_to_row[j1]
+            j0 = j1
+
+    row_to_col = np.full(n, -1, dtype=np.int64)
+    assigned = np.nonzero(col_to_row[1:])[0]
+    row_to_col[col_to_row[1:][assigned] - 1] = assigned
+    return row_to_col
+
+
+def greedy_assignment(rows, cols, weights, row_taken, col_taken):
+    """
+    Takes the edges in order of descending weight if both ends are still free, marks `row_taken` / `col_taken` in place.
+    Returns the indices of the chosen edges.
+    """
+    chosen = []
+    for edge in np.argsort(-weights, kind="stable"):
+        row, col = rows[edge], cols[edge]
+        if row_taken[row] or col_taken[col]:
+            continue
+        row_taken[row] = True
+        col_taken[col] = True
+        chosen.append(edge)
+    return chosen
+
+
+def connected_components(learner_index, volunteer_index, n_learners, n_volunteers):
+    """
+    Component label per edge of the bipartite graph, by propagating the smallest node index along the edges
+    """
+    # learners are nodes 0..n_learners-1, volunteers follow
+    heads, tails = learner_index, volunteer_index + n_learners
+    labels = np.arange(n_learners + n_volunteers)
+    while True:
+        edge_labels = np.minimum(labels[heads], labels[tails])
+        propagated = labels.copy()
+        np.minimum.at(propagated, heads, edge_labels)
+        np.minimum.at(propagated, tails, edge_labels)
+        # every label is a node of the same component, following it once more speeds up the propagation
+        propagated = propagated[propagated]
+        if np.array_equal(propagated, labels):
+            return labels[heads]
+        labels = propagated
+
+
+def assign_component(edges, learner_index, volunteer_index, weights, deadline):
+    """
+    Exact assignment of one component, returns the chosen edges and if all of its rows were reached before `deadline`
+    """
+    learners, rows = np.unique(learner_index[edges], return_inverse=True)
+    volunteers, cols = np.unique(volunteer_index[edges], return_inverse=True)
+
+    transposed = len(learners) > len(volunteers)
+    if transposed:
+        rows, cols = cols, rows
+    shape = (len(volunteers), len(learners)) if transposed else (len(learners), len(volunteers))
+
+    edge_matrix = np.full(shape, -1, dtype=np.int32)
+    edge_matrix[rows, cols] = np.arange(len(edges))
+    # make every existing edge worth more than any sum of scores
+    cost = np.zeros(shape)
+    cost[rows, cols] = -(weights[edges] + weights[edges].max() * min(shape) + 1.0)
+
+    row_to_col = hungarian_assignment(cost, deadline=deadline)
+    assigned = np.nonzero(row_to_col >= 0)[0]
+    assigned_edges = edge_matrix[assigned, row_to_col[assigned]]
+    return edges[assigned_edges[assigned_edges >= 0]], len(assigned) == shape[0]
+
+
+def solve_score_maximization(queryset=None, time_budget=DEFAULT_TIME_BUDGET, max_exact_cells=MAX_EXACT_CELLS):
+    if queryset is None:
+        queryset = TwoUserMatchingScore.objects.filter(matchable=True)
+
+    rows = list(queryset.values_list("id", "user1_id", "user2_id", "score"))
+    if not rows:
+        return ScoreMatchingResult()
+
+    score_ids, user1_ids, user2_ids = (np.array(column, dtype=np.int64) for column in list(zip(*rows))[:3])
+    scores = np.array([row[3] for row in rows], dtype=np.float64)
+
+    learner_ids = set(
+        Profile.objects.filter(
+            user_id__in=np.union1d(user1_ids, user2_ids).tolist(), user_type=Profile.TypeChoices.LEARNER
+        ).values_list("user_id", flat=True)
+    )
+    user1_is_learner = np.isin(user1_ids, list(learner_ids))
+    user2_is_learner = np.isin(user2_ids, list(learner_ids))
+
+    # learner + learner / volunteer + volunteer are never matchable, skip them should they exist anyways
+    bipartite = user1_is_learner != user2_is_learner
+    score_ids, scores = score_ids[bipartite], scores[bipartite]
+    user1_ids, user2_ids = user1_ids[bipartite], user2_ids[bipartite]
+    user1_is_learner = user1_is_learner[bipartite]
+    if not len(score_ids):
+        return ScoreMatchingResult()
+
+    learners, learner_index = np.unique(np.where(user1_is_learner, user1_ids, user2_ids), return_inverse=True)
+    volunteers, volunteer_index = np.unique(np.where(user1_is_learner, user2_ids, user1_ids), return_inverse=True)
+
+    learner_taken = np.zeros(len(learners), dtype=bool)
+    volunteer_taken = np.zeros(len(volunteers), dtype=bool)
+    chosen = []
+    exact, complete = False, True
+
+    # shift scores to be positive
+    weights = scores - scores.min() + 1.0
+    deadline = time.monotonic() + time_budget
+    components = connected_components(learner_index, volunteer_index, len(learners), len(volunteers))
+    by_component = np.argsort(components, kind="stable")
+    for edges in np.split(by_component, np.nonzero(np.diff(components[by_component]))[0] + 1):
+        cells = len(np.unique(learner_index[edges])) * len(np.unique(volunteer_index[edges]))
+        if cells > max_exact_cells:
+            complete = False
+            continue
+
+        component_chosen, component_complete = assign_component(
+            edges, learner_index, volunteer_index, weights, deadline
+        )
+        exact = True
+        complete = complete and component_complete
+        chosen += component_chosen.tolist()
+        learner_taken[learner_index[component_chosen]] = True
+        volunteer_taken[volunteer_index[component_chosen]] = True
+
+    # when all rows of all components were reached the assignment is optimal, otherwise the rest is filled greedily
+    method = ("hungarian" if complete else "hungarian+greedy") if exact else "greedy"
+
+    if method != "hungarian":
+        chosen += greedy_assignment(learner_index, volunteer_index, scores, learner_taken, volunteer_taken)
+    chosen = np.array(sorted(set(chosen)), dtype=np.int64)
+
+    return ScoreMatchingResult(
+        score_ids=score_ids[chosen].tolist(),
+        pairs=list(zip(user1_ids[chosen].tolist(), user2_ids[chosen].tolist())),
+        total_score=float(scores[chosen].sum()),
+        method=method,
+    )
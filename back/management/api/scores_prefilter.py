@@ -0,0 +1,134 @@
+"""
+Candidate pruning for `calculate_scores_user`.
+
+Most pool users can never be matched with a given user for cheap reasons, so instead of running every
+scoring function against the whole pool the candidates go through two phases first:
+
+1. `prefilter_candidates` applies the hard `unmatchable` rules of the cheap scoring functions in SQL
+   ( learner_vs_volunteer, time_slot_overlap via `Profile.availability_bitmask`, gender, language_level ).
+   Every removed pair would be unmatchable in `ScoringBase.calculate_score` anyways.
+2. Optionally `top_k_candidates` keeps only the K candidates with the highest upper bound score.
+   The bound uses the exact slot, interest & gender scores and the maximum of every other scoring function,
+   so a candidate that is cut off can't score higher than the K-th best bound.
+
+Only the survivors are scored with `ScoringBase`, pruned candidates don't get a `TwoUserMatchingScore` row.
+"""
+
+import heapq
+
+from django.db.models import F, Q
+
+from management.api.scores_batch import (
+    INTEREST_OVERLAP_SCORES,
+    LANG_LEVEL_TO_INT,
+    POSTAL_CODE_DISTANCE_SCORES,
+    TIME_SLOT_OVERLAP_SCORES,
+)
+from management.models.profile import Profile
+
+# Best possible results of the scoring functions the upper bound doesn't calculate exactly
+MAX_LANGUAGE_LEVEL_SCORE = 30.0
+MAX_POSTAL_CODE_DISTANCE_SCORE = max(points for _, points in POSTAL_CODE_DISTANCE_SCORES)
+MAX_LEARNER_NO_MATCH_BONUS = 20.0
+MAX_TARGET_GROUP_SCORE = 30.0
+
+ANY_GENDER = Profile.GenderChoices.ANY
+
+
+def _gender(value):
+    return ANY_GENDER if value is None else value
+
+
+def _german_level(lang_skill):
+    german = [skill for skill in lang_skill if skill["lang"] == "german"]
+    return LANG_LEVEL_TO_INT.get(german[0]["level"]) if german else None
+
+
+def prefilter_candidates(usr, candidates):
+    """
+    Removes every user from the `candidates` queryset that can't be matched with `usr` for one of the
+    hard constraints of `ScoringBase`. Returns a queryset.
+    """
+    profile = usr.profile
+
+    if profile.user_type == Profile.TypeChoices.LEARNER:
+        opposite_type = Profile.TypeChoices.VOLUNTEER
+    elif profile.user_type == Profile.TypeChoices.VOLUNTEER:
+        opposite_type = Profile.TypeChoices.LEARNER
+    else:
+        return candidates.none()
+
+    # time_slot_overlap: no common slot is unmatchable
+    if profile.availability_bitmask == 0:
+        return candidates.none()
+    candidates = candidates.filter(profile__user_type=opposite_type).alias(
+        common_slots=F("profile__availability_bitmask").bitand(profile.availability_bitmask)
+    )
+    candidates = candidates.exclude(common_slots=0)
+
+    # gender: both wishes have to be 'any' or exactly the partners gender
+    gender, wish = _gender(profile.gender), _gender(profile.partner_gender)
+    if wish != ANY_GENDER:
+        candidates = candidates.filter(profile__gender=wish)
+    candidates = candidates.filter(
+        Q(profile__partner_gender=ANY_GENDER)
+        | Q(profile__partner_gender__isnull=True)
+        | Q(profile__partner_gender=gender)
+    )
+
+    # language_level: the learners german level has to reach the volunteers minimum level
+    if opposite_type == Profile.TypeChoices.VOLUNTEER:
+        learner_level = _german_level(profile.lang_skill)
+        if learner_level is None:
+            return candidates.none()
+        allowed_levels = [level for level, value in LANG_LEVEL_TO_INT.items() if value <= learner_level]
+        candidates = candidates.filter(profile__min_lang_level_partner__in=allowed_levels)
+    else:
+        min_level = LANG_LEVEL_TO_INT.get(profile.min_lang_level_partner)
+        if min_level is None:
+            return candidates.none()
+        # `lang_skill` is a json list, the `contains` lookup isn't available on every backend so this part is python
+        learner_ids = [
+            user_id
+            for user_id, lang_skill in candidates.values_list("pk", "profile__lang_skill")
+            if (level := _german_level(lang_skill or [])) is not None and level >= min_level
+        ]
+        candidates = candidates.filter(pk__in=learner_ids)
+
+    return candidates
+
+
+def upper_bound_score(profile_values, candidate_values):
+    """
+    Highest total score `ScoringBase.calculate_score` could give a pair that passed `prefilter_candidates`.
+    Takes (availability_bitmask, gender, partner_gender, interests) of both users.
+    """
+    mask, gender, wish, interests = profile_values
+    candidate_mask, candidate_gender, candidate_wish, candidate_interests = candidate_values
+
+    common_slots = (mask & candidate_mask).bit_count()
+    common_interests = len(set(interests or []) & set(candidate_interests or []))
+    exact_gender_wishes = _gender(candidate_gender) == _gender(wish) and _gender(gender) == _gender(candidate_wish)
+
+    return (
+        TIME_SLOT_OVERLAP_SCORES[min(common_slots, 6)]
+        + INTEREST_OVERLAP_SCORES[min(common_interests, 6)]
+        + (20.0 if exact_gender_wishes else 10.0)
+        + MAX_LANGUAGE_LEVEL_SCORE
+        + MAX_POSTAL_CODE_DISTANCE_SCORE
+        + MAX_LEARNER_NO_MATCH_BONUS
+        + MAX_TARGET_GROUP_SCORE
+    )
+
+
+def top_k_candidates(usr, candidates, k):
+    """
+    Ids of the `k` candidates with the highest `upper_bound_score` with `usr`.
+    """
+    profile = usr.profile
+    profile_values = (profile.availability_bitmask, profile.gender, profile.partner_gender, profile.interests)
+    rows = candidates.values_list(
+        "pk", "profile__availability_bitmask", "profile__gender", "profile__partner_gender", "profile__interests"
+    )
+    best = heapq.nlargest(k, rows, key=lambda row: upper_bound_score(profile_values, row[1:]))
+    return [row[0] for row in best]
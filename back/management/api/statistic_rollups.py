@@ -0,0 +1,254 @@
+"""
+Daily rollups of the time series statistics ( signups, messages, calls & call minutes ).
+
+`user_signups`, `message_statistics` and `livekit_session_statistics` used to aggregate the raw
+`User`, `Message` and `LivekitSession` tables on every request, so their cost grew with all history.
+`update_statistic_rollups` stores the daily totals per filter list and company in `StatisticRollup`:
+- the first run rolls up all history of a filter list
+- later runs only recalculate the last `REFRESH_OVERLAP_DAYS` days up to yesterday ( sessions end late ... )
+
+`daily_values` answers from the rollups up to `StatisticRollupRefresh.rolled_up_until`
+and calculates the days after that ( usually only today ) live.
+Only the `ROLLUP_BASE_LISTS` are rolled up: a rolled up day keeps the list members of the time it was rolled up,
+so lists that users move in and out of ( e.g. the journey buckets ) are always calculated live.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from chat.models import Message
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from video.models import LivekitSession
+
+from management.models.profile import Profile
+from management.models.stats import StatisticRollup, StatisticRollupRefresh
+from management.models.user import User
+
+logger = logging.getLogger(__name__)
+
+Metric = StatisticRollup.Metric
+
+REFRESH_OVERLAP_DAYS = 2
+
+# Filter lists whose members don't change after the signup ( the company is set on registration )
+ROLLUP_BASE_LISTS = ["all", "users_with_company"]
+
+
+def get_rollup_filter_lists():
+    from management.api.user_advanced_filter_lists import FILTER_LISTS
+
+    return [entry for entry in FILTER_LISTS if entry.name in ROLLUP_BASE_LISTS and entry.queryset is not None]
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def in_days(field, start_day, end_day):
+    """
+    `field` lies in the days `start_day` to `end_day` ( both included, None for open ranges )
+    """
+    q = Q()
+    if start_day is not None:
+        q &= Q(**{f"{field}__gte": day_start(start_day)})
+    if end_day is not None:
+        q &= Q(**{f"{field}__lt": day_start(end_day + timedelta(days=1))})
+    return q
+
+
+def shared_company(user1_field, user2_field):
+    """
+    The company of both users, "" if they are in different or no companies
+    """
+    return Case(
+        When(
+            **{f"{user1_field}__state__company": F(f"{user2_field}__state__company")},
+            then=Coalesce(f"{user1_field}__state__company", Value("")),
+        ),
+        default=Value(""),
+        output_field=CharField(),
+    )
+
+
+def calculate_daily_values(users, start_day=None, end_day=None):
+    """
+    Aggregates the raw tables, returns {metric: {(day, company): value}} for the events of `users`.
+    Messages & calls are counted if both users are part of `users`, like the statistics endpoints always did.
+    """
+    values = {metric: {} for metric in Metric.values}
+
+    signups = (
+        users.filter(in_days("date_joined", start_day, end_day))
+        .annotate(day=TruncDate("date_joined"), company=Coalesce("state__company", Value("")))
+        .values("day", "company")
+    )
+    for row in signups.annotate(value=Count("id")).order_by():
+        values[Metric.SIGNUPS][(row["day"], row["company"])] = row["value"]
+    for row in signups.filter(profile__user_type=Profile.TypeChoices.VOLUNTEER).annotate(value=Count("id")).order_by():
+        values[Metric.VOLUNTEER_SIGNUPS][(row["day"], row["company"])] = row["value"]
+
+    messages = (
+        Message.objects.filter(in_days("created", start_day, end_day), sender__in=users, recipient__in=users)
+        .annotate(day=TruncDate("created"), company=shared_company("sender", "recipient"))
+        .values("day", "company")
+        .annotate(value=Count("id"))
+        .order_by()
+    )
+    for row in messages:
+        values[Metric.MESSAGES][(row["day"], row["company"])] = row["value"]
+
+    calls = (
+        LivekitSession.objects.filter(
+            in_days("created_at", start_day, end_day), u1__in=users, u2__in=users, both_have_been_active=True
+        )
+        .annotate(day=TruncDate("created_at"), company=shared_company("u1", "u2"))
+        .values("day", "company")
+        .annotate(value=Count("id"), total_time=Sum(F("end_time") - F("created_at")))
+        .order_by()
+    )
+    for row in calls:
+        values[Metric.CALLS][(row["day"], row["company"])] = row["value"]
+        if row["total_time"] is not None:
+            values[Metric.CALL_SECONDS][(row["day"], row["company"])] = row["total_time"].total_seconds()
+
+    return values
+
+
+def refresh_rollups(entry, today=None, rebuild=False):
+    """
+    Rolls up the days of filter list `entry` that are not rolled up yet, up to yesterday. Returns the amount of rows.
+    """
+    start = time.monotonic()
+    yesterday = (today or timezone.localdate()) - timedelta(days=1)
+
+    refresh = StatisticRollupRefresh.objects.filter(base_list=entry.name).first()
+    start_day = None
+    if not rebuild and refresh is not None and refresh.rolled_up_until is not None:
+        start_day = min(refresh.rolled_up_until, yesterday) - timedelta(days=REFRESH_OVERLAP_DAYS - 1)
+
+    try:
+        values = calculate_daily_values(entry.queryset(qs=User.objects.all()), start_day, yesterday)
+    except Exception as e:
+        StatisticRollupRefresh.objects.update_or_create(
+            base_list=entry.name, defaults={"failed": True, "error": repr(e)}
+        )
+        raise
+
+    rows = [
+        StatisticRollup(metric=metric, base_list=entry.name, company=company, day=day, value=value)
+        for metric, metric_values in values.items()
+        for (day, company), value in metric_values.items()
+    ]
+    with transaction.atomic():
+        outdated = StatisticRollup.objects.filter(base_list=entry.name)
+        if start_day is not None:
+            outdated = outdated.filter(day__gte=start_day)
+        outdated.delete()
+        StatisticRollup.objects.bulk_create(rows, batch_size=1000)
+        StatisticRollupRefresh.objects.update_or_create(
+            base_list=entry.name,
+            defaults={
+                "rolled_up_until": yesterday,
+                "refreshed_at": timezone.now(),
+                "duration": time.monotonic() - start,
+                "failed": False,
+                "error": "",
+            },
+        )
+    return len(rows)
+
+
+def update_statistic_rollups(base_lists=None, rebuild=False):
+    """
+    Updates the rollups of all `ROLLUP_BASE_LISTS`, or only the ones in `base_lists`
+    """
+    # rollups of lists that are not rolled up anymore would never be refreshed again
+    StatisticRollup.objects.exclude(base_list__in=ROLLUP_BASE_LISTS).delete()
+    StatisticRollupRefresh.objects.exclude(base_list__in=ROLLUP_BASE_LISTS).delete()
+
+    summary = {}
+    for entry in get_rollup_filter_lists():
+        if base_lists is not None and entry.name not in base_lists:
+            continue
+        try:
+            summary[entry.name] = {"rows": refresh_rollups(entry, rebuild=rebuild)}
+        except Exception as e:
+            logger.exception("Refreshing the statistic rollups of %s failed", entry.name)
+            summary[entry.name] = {"error": repr(e)}
+    return summary
+
+
+def get_rolled_up_until(base_list):
+    refresh = StatisticRollupRefresh.objects.filter(base_list=base_list, failed=False).first()
+    return refresh.rolled_up_until if refresh is not None else None
+
+
+def daily_values(metrics, base_list, users, start_day=None, end_day=None, company=None, use_rollups=True):
+    """
+    {metric: {day: value}} of the `users` in filter list `base_list` between `start_day` and `end_day` ( included ).
+    Reads the rolled up days of the `ROLLUP_BASE_LISTS` and calculates the rest live,
+    `use_rollups=False` if `users` are pre filtered further than the filter list ( e.g. managed users ).
+    """
+    totals = {metric: defaultdict(float) for metric in metrics}
+
+    use_rollups = use_rollups and base_list in ROLLUP_BASE_LISTS
+    rolled_up_until = get_rolled_up_until(base_list) if use_rollups else None
+    if rolled_up_until is not None:
+        rollups = StatisticRollup.objects.filter(base_list=base_list, metric__in=metrics, day__lte=rolled_up_until)
+        if start_day is not None:
+            rollups = rollups.filter(day__gte=start_day)
+        if end_day is not None:
+            rollups = rollups.filter(day__lte=end_day)
+        if company is not None:
+            rollups = rollups.filter(company=company)
+        for row in rollups.values("metric", "day").annotate(total=Sum("value")).order_by():
+            totals[row["metric"]][row["day"]] += row["total"]
+
+        live_start_day = rolled_up_until + timedelta(days=1)
+        if start_day is not None:
+            live_start_day = max(live_start_day, start_day)
+    else:
+        live_start_day = start_day
+
+    if end_day is None or live_start_day is None or live_start_day <= end_day:
+        live = calculate_daily_values(users, live_start_day, end_day)
+        for metric in metrics:
+            for (day, row_company), value in live[metric].items():
+                if company is None or row_company == company:
+                    totals[metric][day] += value
+
+    return totals
+
+
+def bucket_start(day, bucket_size):
+    """
+    Same buckets as `TruncDay`, `TruncWeek` and `TruncMonth`
+    """
+    if bucket_size == 7:
+        return day - timedelta(days=day.weekday())
+    if bucket_size == 30:
+        return day.replace(day=1)
+    return day
+
+
+def bucketed(values, bucket_size):
+    """
+    Sums the {day: value} of `values` into `bucket_size` buckets, returns {bucket datetime: value} ordered by bucket
+    """
+    buckets = defaultdict(float)
+    for day, value in values.items():
+        buckets[bucket_start(day, bucket_size)] += value
+    return {day_start(day): buckets[day] for day in sorted(buckets)}
@@ -1,19 +1,25 @@
-from chat.models import Chat, ChatSerializer, Message, MessageSerializer
+from chat.models import Chat, ChatSerializer, ChatUnreadCount, Message, MessageSerializer
+from django.db import models
 from django.db.models import CharField, Q, Value
 from django.db.models.functions import Concat
+from django.http import StreamingHttpResponse
 from django.urls import path
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django_filters import rest_framework as filters
-from drf_spectacular.utils import extend_schema, extend_schema_view, inline_serializer
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view, inline_serializer
 from emails.models import AdvancedEmailLogSerializer, EmailLog
 from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from management.api.bucket_memberships import bucket_members, get_refreshed_at
 from management.api.matches import AdvancedUserMatchSerializer
 from management.api.scores import score_between_db_update
+from management.api.user_advanced_batch import AdvancedUserPage
 from management.api.user_advanced_filter_lists import FILTER_LISTS, get_choices, get_dynamic_userlists
+from management.api.user_export import EXPORT_COLUMNS, export_csv_rows, export_json_chunks, get_export_columns
+from management.api.user_journey_classifier import USER_CATEGORY_BUCKETS, classify_users
 from management.api.utils_advanced import filterset_schema_dict
 from management.controller import delete_user, make_tim_support_user
 from management.helpers import (
@@ -22,6 +28,7 @@ from management.helpers import (
     IsAdminOrMatchingUser,
 )
 from management.helpers.detailed_pagination import get_paginated_format_v2
+from management.helpers.report_export import EXPORT_KIND_USERS, export_download_response, streaming_csv_response
 from management.models.dynamic_user_list import DynamicUserList
 from management.models.management_tasks import ManagementTaskSerializer, MangementTask
 from management.models.matches import Match
@@ -33,31 +40,18 @@ from management.models.profile import MinimalProfileSerializer, Profile
 from management.models.scores import TwoUserMatchingScore
 from management.models.sms import SmsModel, SmsSerializer
 from management.models.state import State, StateSerializer
+from management.models.stats import BucketMembership
 from management.models.unconfirmed_matches import ProposedMatch, serialize_proposed_matches
 from management.models.user import User
-from management.tasks import matching_algo_v2, send_email_background
-
-user_category_buckets = [
-    "journey_v2__user_created",
-    "journey_v2__email_verified",
-    "journey_v2__user_form_completed",
-    "journey_v2__booked_onboarding_call",
-    "journey_v2__too_low_german_level",
-    "journey_v2__pre_matching",
-    "journey_v2__match_takeoff",
-    "journey_v2__ongoing_non_completed_match",
-    "journey_v2__first_search_v2",
-    "journey_v2__happy_inactive",
-    "journey_v2__happy_active",
-    "journey_v2__no_show",
-    "journey_v2__failed_matching",
-    "journey_v2__gave_up_searching",
-    "journey_v2__user_deleted",
-    "journey_v2__marked_unresponsive",
-]
+from management.tasks import export_users, matching_algo_v2, send_email_background
+
+user_category_buckets = USER_CATEGORY_BUCKETS
 
 
-def get_match_waiting_time(user):
+def get_match_waiting_time(user, page=None):
+    """
+    `page` is an optional `AdvancedUserPage` to take the matches and appointments from instead of querying them.
+    """
     if not user.state.had_prematching_call:
         return {"number_of_days": None, "waiting_time_string": "Prematch call not completed", "first_search": None}
 
@@ -65,13 +59,19 @@ def get_match_waiting_time(user):
         return {"number_of_days": None, "waiting_time_string": "Not actively searching", "first_search": None}
 
     # Check if the user has already been matched
-    already_matched = Match.objects.filter(Q(user1=user) | Q(user2=user), support_matching=False).exists()
+    if page is not None:
+        already_matched = page.already_matched(user)
+    else:
+        already_matched = Match.objects.filter(Q(user1=user) | Q(user2=user), support_matching=False).exists()
 
     # Determine waiting_since based on match status
     if already_matched:
         waiting_since = user.state.searching_state_last_updated
     else:
-        latest_pre_match_appointment = PreMatchingAppointment.objects.filter(user=user).order_by("-created").first()
+        if page is not None:
+            latest_pre_match_appointment = page.latest_pre_match_appointment(user)
+        else:
+            latest_pre_match_appointment = PreMatchingAppointment.objects.filter(user=user).order_by("-created").first()
         if not latest_pre_match_appointment:
             return {
                 "number_of_days": None,
@@ -97,23 +97,38 @@ def get_match_waiting_time(user):
     }
 
 
-class ExportUserSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = User
-        fields = ["id", "email", "hash"]
+def get_match_waiting_times(users):
+    """
+    `get_match_waiting_time` for all `users` in one query, returns [(user_id, number_of_days, first_search)].
+    Users without a waiting time ( no prematch call, not searching, no appointment ) are left out.
+    """
+    already_matched = Match.objects.filter(
+        Q(user1=models.OuterRef("pk")) | Q(user2=models.OuterRef("pk")), support_matching=False
+    )
+    latest_pre_match_appointment = PreMatchingAppointment.objects.filter(user=models.OuterRef("pk")).order_by(
+        "-created"
+    )
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation["profile"] = {
-            "first_name": instance.profile.first_name,
-            "second_name": instance.profile.second_name,
-            "user_type": instance.profile.user_type,
-            "postal_code": instance.profile.postal_code,
-            "gender": instance.profile.gender,
-            "birth_year": instance.profile.birth_year,
-        }
+    rows = (
+        users.filter(
+            state__had_prematching_call=True,
+            state__searching_state=State.SearchingStateChoices.SEARCHING,
+        )
+        .annotate(
+            already_matched=models.Exists(already_matched),
+            appointment_end_time=models.Subquery(latest_pre_match_appointment.values("end_time")[:1]),
+        )
+        .values_list("pk", "already_matched", "state__searching_state_last_updated", "appointment_end_time")
+        .order_by()
+    )
 
-        return representation
+    now = timezone.now()
+    waiting_times = []
+    for user_id, matched, searching_state_last_updated, appointment_end_time in rows:
+        waiting_since = searching_state_last_updated if matched else appointment_end_time
+        if waiting_since is not None:
+            waiting_times.append((user_id, (now - waiting_since).days, not matched))
+    return waiting_times
 
 
 class ListUserSerializer(serializers.ModelSerializer):
@@ -122,19 +137,65 @@ class ListUserSerializer(serializers.ModelSerializer):
         fields = ["id", "email", "date_joined", "last_login"]
 
 
+class AdvancedUserListSerializer(serializers.ListSerializer):
+    """
+    Serializes a whole page of users with the lookups batched by `AdvancedUserPage`,
+    so the amount of queries doesn't grow with the page size.
+    """
+
+    def to_representation(self, data):
+        users = data.all() if isinstance(data, models.manager.BaseManager) else data
+        page = AdvancedUserPage(users)
+        return [self.child.to_representation(user, page=page) for user in page.users]
+
+
 class AdvancedUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["hash", "id", "email", "date_joined", "last_login"]
+        list_serializer_class = AdvancedUserListSerializer
 
-    def to_representation(self, instance):
+    def to_representation(self, instance, page=None):
         representation = super().to_representation(instance)
         representation["profile"] = MinimalProfileSerializer(instance.profile).data
 
         determine_bucket = ("determine_bucket" in self.context) and self.context["determine_bucket"]
 
+        if page is not None and not determine_bucket:
+            representation["matches"] = page.serialized_matches(instance)
+        else:
+            representation["matches"] = self.get_matches(instance, determine_bucket)
+
+        representation["waiting_time"] = get_match_waiting_time(instance, page=page)
+
+        representation["state"] = StateSerializer(instance.state).data
+
+        # NOTE:
+        # Some of the filter lists in FILTER_LISTS use JSONField `__contains`
+        # lookups (for example on `profile__lang_skill`). These are only
+        # supported on PostgreSQL and will raise NotSupportedError on SQLite.
+        # To avoid breaking the API in development (SQLite) while keeping the
+        # behaviour in production (PostgreSQL), we only evaluate bucket
+        # membership on PostgreSQL and fall back to "unknown" otherwise.
+        from django.db import connection
+
+        if determine_bucket:
+            if connection.vendor == "postgresql":
+                try:
+                    snapshot = classify_users(User.objects.filter(pk=instance.pk))
+                    representation["bucket"] = snapshot.bucket_of(instance.pk)
+                except (KeyError, AttributeError):
+                    representation["bucket"] = "unknown"
+            else:
+                # On non-PostgreSQL backends (e.g. SQLite in development) we
+                # can't safely run the JSONField `contains` lookups used in
+                # the filter lists, so we just set a sensible default.
+                representation["bucket"] = "unknown"
+
+        return representation
+
+    def get_matches(self, user, determine_bucket):
         items_per_page = 5
-        user = instance
         confirmed_matches = get_paginated_format_v2(Match.get_confirmed_matches(user), items_per_page, 1)
         confirmed_matches["results"] = AdvancedUserMatchSerializer(
             confirmed_matches["results"],
@@ -188,7 +249,7 @@ class AdvancedUserSerializer(serializers.ModelSerializer):
             },
         ).data
 
-        representation["matches"] = {
+        return {
             "confirmed": confirmed_matches,
             "unconfirmed": unconfirmed_matches,
             "support": support_matches,
@@ -197,38 +258,6 @@ class AdvancedUserSerializer(serializers.ModelSerializer):
             "inactive": inactive_matches,
         }
 
-        representation["waiting_time"] = get_match_waiting_time(instance)
-
-        representation["state"] = StateSerializer(instance.state).data
-
-        # NOTE:
-        # Some of the filter lists in FILTER_LISTS use JSONField `__contains`
-        # lookups (for example on `profile__lang_skill`). These are only
-        # supported on PostgreSQL and will raise NotSupportedError on SQLite.
-        # To avoid breaking the API in development (SQLite) while keeping the
-        # behaviour in production (PostgreSQL), we only evaluate bucket
-        # membership on PostgreSQL and fall back to "unknown" otherwise.
-        from django.db import connection
-
-        if determine_bucket:
-            if connection.vendor == "postgresql":
-                try:
-                    bucket_map = {entry.name: entry for entry in FILTER_LISTS if entry.name in user_category_buckets}
-                    for bucket in user_category_buckets:
-                        if bucket_map[bucket].queryset(User.objects.filter(pk=instance.pk)).exists():
-                            representation["bucket"] = bucket
-                    if "bucket" not in representation:
-                        representation["bucket"] = "unknown"
-                except (KeyError, AttributeError):
-                    representation["bucket"] = "unknown"
-            else:
-                # On non-PostgreSQL backends (e.g. SQLite in development) we
-                # can't safely run the JSONField `contains` lookups used in
-                # the filter lists, so we just set a sensible default.
-                representation["bucket"] = "unknown"
-
-        return representation
-
 
 class AdvancedMatchingScoreSerializer(serializers.ModelSerializer):
     class Meta:
@@ -380,6 +409,8 @@ class UserFilter(filters.FilterSet):
                 FILTER_LISTS,
             )
         )
+        if selected_filter.queryset and get_refreshed_at(BucketMembership.Kind.USER, [value]):
+            return queryset.filter(pk__in=bucket_members(BucketMembership.Kind.USER, value))
         if selected_filter.queryset:
             return selected_filter.queryset(queryset)
         else:
@@ -539,8 +570,10 @@ class AdvancedUserViewset(viewsets.ModelViewSet):
             return res
 
         message = Message.objects.get(uuid=message_id)
-        message.read = True
-        message.save()
+        if not message.read:
+            message.read = True
+            message.save()
+            ChatUnreadCount.decrement(message.chat, message.recipient)
 
         return Response({"msg": "Message marked as read"})
 
@@ -560,6 +593,8 @@ class AdvancedUserViewset(viewsets.ModelViewSet):
 
         message = Message.objects.get(uuid=message_id)
         message.delete()
+        if not message.read:
+            ChatUnreadCount.decrement(message.chat, message.recipient)
 
         return Response({"msg": "Message deleted"})
 
@@ -829,8 +864,10 @@ class AdvancedUserViewset(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"])
     def request_score_update(self, request, pk=None):
         consider_within_days = int(request.query_params.get("days_searching", 60))
+        # optionally only score the K most promising candidates, see `management.api.scores_prefilter`
+        top_k = request.query_params.get("top_k", None)
 
-        task = matching_algo_v2.delay(pk, consider_within_days)
+        task = matching_algo_v2.delay(pk, consider_within_days, top_k=int(top_k) if top_k else None)
         return Response({"task_id": task.id})
 
     @extend_schema(request=inline_serializer(name="CompleteTaskRequest", fields={"task_id": serializers.CharField()}))
@@ -939,12 +976,57 @@ class AdvancedUserViewset(viewsets.ModelViewSet):
 
         return Response(email_logs)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="export_format",
+                type=str,
+                enum=["json", "csv"],
+                default="json",
+                description="The export is streamed in both formats",
+            ),
+            OpenApiParameter(
+                name="columns",
+                type=str,
+                description=f"Comma separated columns, available: {', '.join(EXPORT_COLUMNS)}",
+            ),
+            OpenApiParameter(
+                name="run_async",
+                type=bool,
+                default=False,
+                description="Export in a celery task, download the file from the `download` url once done",
+            ),
+        ],
+    )
     @action(detail=False, methods=["get"])
     def export(self, request):
+        export_format = request.query_params.get("export_format", "json")
+        if export_format not in ["json", "csv"]:
+            return Response({"msg": "Export format not supported. Only json & csv are supported"}, status=400)
+        try:
+            columns = get_export_columns(request.query_params.get("columns", None))
+        except ValueError as e:
+            return Response({"msg": str(e)}, status=400)
+
+        if request.query_params.get("run_async", "false").lower() in ["true", "1"]:
+            params = {
+                name: values
+                for name, values in request.query_params.lists()
+                if name not in ["export_format", "columns", "run_async"]
+            }
+            task = export_users.delay(request.user.pk, params, columns, export_format)
+            return Response(
+                {"task_id": task.task_id, "download": f"/api/matching/users_export/download/{task.task_id}/"}
+            )
+
         queryset = self.filter_queryset(self.get_queryset())
-        serializer = ExportUserSerializer(queryset, many=True)
+        if export_format == "csv":
+            return streaming_csv_response(export_csv_rows(queryset, columns), "users.csv")
+        return StreamingHttpResponse(export_json_chunks(queryset, columns), content_type="application/json")
 
-        return Response(serializer.data)
+    @action(detail=False, methods=["get"])
+    def export_download(self, request, task_id=None):
+        return export_download_response(request, task_id, EXPORT_KIND_USERS)
 
     @action(detail=True, methods=["get"])
     def match_waiting_time(self, request, pk=None):
@@ -956,6 +1038,7 @@ class AdvancedUserViewset(viewsets.ModelViewSet):
 
 viewset_actions = [
     path("api/matching/users_export/", AdvancedUserViewset.as_view({"get": "export"})),
+    path("api/matching/users_export/download/<str:task_id>/", AdvancedUserViewset.as_view({"get": "export_download"})),
     path(
         "api/matching/users/<pk>/scores/",
         AdvancedUserViewset.as_view({"get": "scores"}),
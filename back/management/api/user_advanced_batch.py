@@ -0,0 +1,165 @@
+"""
+Batched data loading for the `AdvancedUserViewset.list` page of the matching panel.
+
+`AdvancedUserSerializer` looks up matches, proposals, the waiting time ... with several queries per user.
+`AdvancedUserPage` loads the same data for all users of a page in a fixed amount of queries:
+- profiles, states and the many to many fields of `StateSerializer`
+- one light query for all matches of the page users and one for their confirmations,
+  the matches are split into the match categories and paginated in python, only the shown ones are fully loaded
+- one query for all open & unsuccessful proposals
+- the latest pre matching appointment of every user
+- chats, online states and call sessions through `AdvancedUserMatchPrefetch`
+
+`AdvancedUserListSerializer` uses it to build the exact same representation as `AdvancedUserSerializer`.
+"""
+
+from django.db.models import Q, prefetch_related_objects
+
+from management.api.matches import AdvancedUserMatchPrefetch, AdvancedUserMatchSerializer
+from management.helpers.detailed_pagination import get_paginated_format_v2
+from management.models.matches import Match
+from management.models.pre_matching_appointment import PreMatchingAppointment
+from management.models.unconfirmed_matches import ProposedMatch, serialize_proposed_matches
+
+ITEMS_PER_PAGE = 5
+
+STATE_MANY_TO_MANY_FIELDS = ["matches", "notifications", "managed_users", "management_tasks"]
+
+MATCH_CATEGORIES = ["confirmed", "unconfirmed", "support", "inactive"]
+
+
+def match_category(active, support_matching, confirmed_by_user):
+    """
+    Same split as `Match.get_confirmed_matches`, `get_unconfirmed_matches`, `get_support_matches` & `get_inactive_matches`
+    """
+    if not active:
+        return None if support_matching else "inactive"
+    if support_matching:
+        return "support"
+    return "confirmed" if confirmed_by_user else "unconfirmed"
+
+
+class AdvancedUserPage:
+    def __init__(self, users, items_per_page=ITEMS_PER_PAGE):
+        self.users = list(users)
+        self.items_per_page = items_per_page
+        user_ids = [usr.pk for usr in self.users]
+
+        prefetch_related_objects(
+            self.users, "profile", "state", *[f"state__{field}" for field in STATE_MANY_TO_MANY_FIELDS]
+        )
+
+        self._load_matches(user_ids)
+        self._load_proposals(user_ids)
+
+        self.latest_pre_match_appointments = {}
+        for appointment in PreMatchingAppointment.objects.filter(user_id__in=user_ids).order_by("user_id", "-created"):
+            self.latest_pre_match_appointments.setdefault(appointment.user_id, appointment)
+
+    def _load_matches(self, user_ids):
+        page_user_ids = set(user_ids)
+        confirmations = set(
+            Match.confirmed_by.through.objects.filter(user_id__in=user_ids).values_list("match_id", "user_id")
+        )
+
+        # match ids per user & category, ordered by `created_at` like the `Match.get_*_matches` querysets
+        match_ids = {user_id: {category: [] for category in MATCH_CATEGORIES} for user_id in user_ids}
+        self.matched_user_ids = set()
+        for match_id, user1_id, user2_id, active, support_matching in (
+            Match.objects.filter(Q(user1_id__in=user_ids) | Q(user2_id__in=user_ids))
+            .order_by("created_at", "pk")
+            .values_list("pk", "user1_id", "user2_id", "active", "support_matching")
+        ):
+            for user_id in {user1_id, user2_id} & page_user_ids:
+                if not support_matching:
+                    self.matched_user_ids.add(user_id)
+                category = match_category(active, support_matching, (match_id, user_id) in confirmations)
+                if category is not None:
+                    match_ids[user_id][category].append(match_id)
+
+        self.match_pages = {
+            user_id: {
+                category: get_paginated_format_v2(ids, self.items_per_page, 1) for category, ids in categories.items()
+            }
+            for user_id, categories in match_ids.items()
+        }
+        shown_ids = {
+            match_id
+            for categories in self.match_pages.values()
+            for match_page in categories.values()
+            for match_id in match_page["results"]
+        }
+        self.matches = Match.objects.select_related(
+            "user1__profile", "user1__state", "user2__profile", "user2__state"
+        ).in_bulk(shown_ids)
+
+        users = {usr.pk: usr for usr in self.users}
+        self.match_prefetch = AdvancedUserMatchPrefetch(
+            [
+                (self.matches[match_id], users[user_id])
+                for user_id, categories in self.match_pages.items()
+                for match_page in categories.values()
+                for match_id in match_page["results"]
+            ]
+        )
+
+    def _load_proposals(self, user_ids):
+        proposals = list(
+            ProposedMatch.objects.filter(Q(user1_id__in=user_ids) | Q(user2_id__in=user_ids))
+            .filter(Q(closed=False) | Q(Q(expired=True) | Q(rejected=True), closed=True))
+            .select_related("user1__profile", "user2__profile", "rejected_by")
+            .order_by("potential_matching_created_at", "pk")
+        )
+        # like `ProposedMatch.get_open_proposals` expired proposals get closed when they are listed
+        for proposal in proposals:
+            if not proposal.closed:
+                proposal.is_expired(close_if_expired=True, send_mail_if_expired=True)
+
+        self.open_proposals = {user_id: [] for user_id in user_ids}
+        self.unsuccessful_proposals = {user_id: [] for user_id in user_ids}
+        for proposal in proposals:
+            for user_id in {proposal.user1_id, proposal.user2_id} & set(user_ids):
+                if not proposal.closed:
+                    self.open_proposals[user_id].append(proposal)
+                elif proposal.expired or proposal.rejected:
+                    self.unsuccessful_proposals[user_id].append(proposal)
+
+    def already_matched(self, user):
+        return user.pk in self.matched_user_ids
+
+    def latest_pre_match_appointment(self, user):
+        return self.latest_pre_match_appointments.get(user.pk)
+
+    def serialized_matches(self, user):
+        """
+        The `matches` entry of `AdvancedUserSerializer`
+        """
+        serialized = {}
+        for category, match_page in self.match_pages[user.pk].items():
+            serialized[category] = {
+                **match_page,
+                "results": AdvancedUserMatchSerializer(
+                    [self.matches[match_id] for match_id in match_page["results"]],
+                    many=True,
+                    context={
+                        "user": user,
+                        "status": category,
+                        "determine_bucket": False,
+                        "prefetch": self.match_prefetch,
+                    },
+                ).data,
+            }
+
+        proposed = get_paginated_format_v2(self.open_proposals[user.pk], self.items_per_page, 1)
+        proposed["results"] = serialize_proposed_matches(proposed["results"], user)
+        old_proposals = get_paginated_format_v2(self.unsuccessful_proposals[user.pk], self.items_per_page, 1)
+        old_proposals["results"] = serialize_proposed_matches(old_proposals["results"], user)
+
+        return {
+            "confirmed": serialized["confirmed"],
+            "unconfirmed": serialized["unconfirmed"],
+            "support": serialized["support"],
+            "proposed": proposed,
+            "old_proposals": old_proposals,
+            "inactive": serialized["inactive"],
+        }
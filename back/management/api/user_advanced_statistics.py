@@ -1,33 +1,61 @@
+import itertools
 from datetime import date, timedelta
 
+import numpy as np
 import requests
-from chat.models import Message
 from django.conf import settings
 from django.db import connection
-from django.db.models import Avg, Count, F, Q, Sum
-from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.db.models import Count, Q
 from django.urls import path
 from django.utils import timezone
+from django.utils.text import slugify
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema, inline_serializer
 from rest_framework import serializers
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from video.models import LivekitSession
 
+from management.api.availability_optimizer import FLAT_ALL_SLOTS, best_slot_combinations
+from management.api.bucket_memberships import get_refreshed_at, materialized_snapshot
+from management.api.company_report import CompanyReport
 from management.api.match_journey_filter_list import MATCH_JOURNEY_FILTERS, get_match_list_by_name
-from management.api.user_advanced import get_match_waiting_time
+from management.api.statistic_rollups import bucketed, daily_values, to_date
+from management.api.user_advanced import get_match_waiting_times
 from management.api.user_advanced_filter_lists import FILTER_LISTS, USER_JOURNEY_FILTER_LISTS, get_list_by_name
+from management.api.user_journey_classifier import BucketSnapshot, classify_users
 from management.helpers import IsAdminOrMatchingUser
 from management.helpers.query_logger import QueryLogger
+from management.helpers.report_export import (
+    EXPORT_KIND_COMPANY_REPORT,
+    export_download_response,
+    streaming_csv_response,
+    streaming_text_response,
+    text_lines,
+)
 from management.models.matches import Match
 from management.models.profile import Profile
 from management.models.short_links import ShortLinkClick
 from management.models.state import State
+from management.models.stats import BucketMembership, StatisticRollup
 from management.models.unconfirmed_matches import ProposedMatch
 from management.models.user import User
 
 
+def get_statistics_base(request):
+    """
+    The users of the requested `base_list` and if the rollups of that list can be used.
+    Rollups are stored for all users, so they can't be used for users that only see their managed users.
+    """
+    list_name = request.data.get("base_list", "all")
+    selected_filter = next(filter(lambda entry: entry.name == list_name, FILTER_LISTS))
+
+    pre_filtered_users = User.objects.all()
+    if not request.user.is_staff:
+        pre_filtered_users = pre_filtered_users.filter(id__in=request.user.state.managed_users.all())
+
+    return list_name, selected_filter.queryset(qs=pre_filtered_users), request.user.is_staff
+
+
 @extend_schema(
     request=inline_serializer(
         name="UserStatisticsCountOverTimeRequest",
@@ -39,6 +67,7 @@ from management.models.user import User
             ),
             "start_date": serializers.DateField(default="2022-01-01"),
             "end_date": serializers.DateField(default=date.today()),
+            "company": serializers.CharField(required=False),
         },
     ),
 )
@@ -48,82 +77,43 @@ def user_signups(request):
     # Validate the inputs
     today = date.today()
     bucket_size = request.data.get("bucket_size", 1)
-    start_date = request.data.get("start_date", "2022-01-01")
-    end_date = request.data.get("end_date", today)
+    start_date = to_date(request.data.get("start_date", "2022-01-01"))
+    end_date = to_date(request.data.get("end_date", today))
+    company = request.data.get("company", None)
     cumulative = request.query_params.get("cumulative", False)
 
-    list_name = request.data.get("base_list", "all")
-    selected_filter = next(filter(lambda entry: entry.name == list_name, FILTER_LISTS))
-
-    pre_filtered_users = User.objects.all()
-    if not request.user.is_staff:
-        pre_filtered_users = pre_filtered_users.filter(id__in=request.user.state.managed_users.all())
-
-    queryset = selected_filter.queryset(qs=pre_filtered_users)
-
-    if bucket_size == 1:
-        trunc_func = TruncDay
-    elif bucket_size == 7:
-        trunc_func = TruncWeek
-    elif bucket_size == 30:
-        trunc_func = TruncMonth
-    else:
+    if bucket_size not in [1, 7, 30]:
         return Response({"msg": "Bucket size not supported. Only 1, 7, & 30 days are supported"}, status=400)
 
-    # Calculate the count of users who joined before the start_date
-    pre_start_date_count = queryset.filter(date_joined__lt=start_date).count()
-    pre_start_data_count_volunteer = queryset.filter(
-        date_joined__lt=start_date, profile__user_type=Profile.TypeChoices.VOLUNTEER
-    ).count()
-
-    user_counts = (
-        queryset.filter(date_joined__range=[start_date, end_date])
-        .annotate(bucket=trunc_func("date_joined"))
-        .values("bucket")
-        .annotate(count=Count("id"))
-        .order_by("bucket")
-    )
-    volunteer_only_users = (
-        queryset.filter(date_joined__range=[start_date, end_date], profile__user_type=Profile.TypeChoices.VOLUNTEER)
-        .annotate(bucket=trunc_func("date_joined"))
-        .values("bucket")
-        .annotate(count=Count("id"))
-        .order_by("bucket")
-    )
-
-    print("user_counts", user_counts)
-    print("volunteer_only_users", volunteer_only_users)
+    list_name, queryset, use_rollups = get_statistics_base(request)
+    metrics = [StatisticRollup.Metric.SIGNUPS, StatisticRollup.Metric.VOLUNTEER_SIGNUPS]
+    values = daily_values(metrics, list_name, queryset, start_date, end_date, company, use_rollups)
+    user_counts = bucketed(values[StatisticRollup.Metric.SIGNUPS], bucket_size)
+    volunteer_counts = bucketed(values[StatisticRollup.Metric.VOLUNTEER_SIGNUPS], bucket_size)
 
+    # Calculate the count of users who joined before the start_date
+    cumulative_count = 0
+    cumulative_count_volunteer = 0
     if cumulative:
-        cumulative_count = pre_start_date_count
-        cumulative_count_volunteer = pre_start_data_count_volunteer
-        data = []
-        for i, stats in enumerate(user_counts):
-            cumulative_count += stats["count"]
-            if i < len(volunteer_only_users):
-                cumulative_count_volunteer += volunteer_only_users[i]["count"]
-            data.append(
-                {
-                    "date": stats["bucket"],
-                    "count": cumulative_count,
-                    "count_ler": cumulative_count - cumulative_count_volunteer,
-                    "count_vol": cumulative_count_volunteer,
-                }
-            )
-    else:
-        data = []
-        for i, stats in enumerate(user_counts):
-            volunteer_count = 0
-            if i < len(volunteer_only_users):
-                volunteer_count = volunteer_only_users[i]["count"]
-            data.append(
-                {
-                    "date": stats["bucket"],
-                    "count": stats["count"],
-                    "count_ler": stats["count"] - volunteer_count,
-                    "count_vol": volunteer_count,
-                }
-            )
+        before = daily_values(metrics, list_name, queryset, None, start_date - timedelta(days=1), company, use_rollups)
+        cumulative_count = sum(before[StatisticRollup.Metric.SIGNUPS].values())
+        cumulative_count_volunteer = sum(before[StatisticRollup.Metric.VOLUNTEER_SIGNUPS].values())
+
+    data = []
+    for bucket, count in user_counts.items():
+        volunteer_count = volunteer_counts.get(bucket, 0)
+        if cumulative:
+            cumulative_count += count
+            cumulative_count_volunteer += volunteer_count
+            count, volunteer_count = cumulative_count, cumulative_count_volunteer
+        data.append(
+            {
+                "date": bucket,
+                "count": int(count),
+                "count_ler": int(count - volunteer_count),
+                "count_vol": int(volunteer_count),
+            }
+        )
 
     return Response(data)
 
@@ -139,6 +129,7 @@ def user_signups(request):
             ),
             "start_date": serializers.DateField(default="2022-01-01"),
             "end_date": serializers.DateField(default=date.today()),
+            "company": serializers.CharField(required=False),
         },
     ),
 )
@@ -149,36 +140,22 @@ def message_statistics(request):
     today = date.today()
     bucket_size = request.data.get("bucket_size", 1)
 
-    start_date = request.data.get("start_date", "2022-01-01")
-    end_date = request.data.get("end_date", today)
-
-    list_name = request.data.get("base_list", "all")
-    selected_filter = next(filter(lambda entry: entry.name == list_name, FILTER_LISTS))
+    start_date = to_date(request.data.get("start_date", "2022-01-01"))
+    end_date = to_date(request.data.get("end_date", today))
+    company = request.data.get("company", None)
 
-    pre_filtered_users = User.objects.all()
-    if not request.user.is_staff:
-        pre_filtered_users = pre_filtered_users.filter(id__in=request.user.state.managed_users.all())
-
-    queryset = selected_filter.queryset(qs=pre_filtered_users)
-
-    if bucket_size == 1:
-        trunc_func = TruncDay
-    elif bucket_size == 7:
-        trunc_func = TruncWeek
-    elif bucket_size == 30:
-        trunc_func = TruncMonth
-    else:
+    if bucket_size not in [1, 7, 30]:
         return Response({"msg": "Bucket size not supported only 1 & 7 days are supported"}, status=400)
 
-    message_queryset = (
-        Message.objects.filter(sender__in=queryset, recipient__in=queryset, created__range=[start_date, end_date])
-        .annotate(bucket=trunc_func("created"))
-        .values("bucket")
-        .annotate(count=Count("id"))
-        .order_by("bucket")
+    list_name, queryset, use_rollups = get_statistics_base(request)
+    values = daily_values(
+        [StatisticRollup.Metric.MESSAGES], list_name, queryset, start_date, end_date, company, use_rollups
     )
 
-    data = [{"date": stats["bucket"], "count": stats["count"]} for stats in message_queryset]
+    data = [
+        {"date": bucket, "count": int(count)}
+        for bucket, count in bucketed(values[StatisticRollup.Metric.MESSAGES], bucket_size).items()
+    ]
 
     return Response(data)
 
@@ -194,6 +171,7 @@ def message_statistics(request):
             ),
             "start_date": serializers.DateField(default="2022-01-01"),
             "end_date": serializers.DateField(default=date.today()),
+            "company": serializers.CharField(required=False),
         },
     ),
 )
@@ -205,151 +183,121 @@ def livekit_session_statistics(request):
     bucket_size = request.data.get("bucket_size", 1)
 
     min_start_date = date(2024, 4, 4)
-    start_date = request.data.get("start_date", f"{min_start_date}")
-    if start_date < f"{min_start_date}":
-        start_date = f"{min_start_date}"
-
-    end_date = request.data.get("end_date", today)
-
-    list_name = request.data.get("base_list", "all")
-
-    selected_filter = next(filter(lambda entry: entry.name == list_name, FILTER_LISTS))
-
-    pre_filtered_users = User.objects.all()
-    if not request.user.is_staff:
-        pre_filtered_users = pre_filtered_users.filter(id__in=request.user.state.managed_users.all())
-
-    queryset = selected_filter.queryset(qs=pre_filtered_users)
+    start_date = max(to_date(request.data.get("start_date", f"{min_start_date}")), min_start_date)
+    end_date = to_date(request.data.get("end_date", today))
+    company = request.data.get("company", None)
 
     aggregation = request.query_params.get("aggregation", "count")
 
-    if bucket_size == 1:
-        trunc_func = TruncDay
-    elif bucket_size == 7:
-        trunc_func = TruncWeek
-    elif bucket_size == 30:
-        trunc_func = TruncMonth
-    else:
+    if bucket_size not in [1, 7, 30]:
         return Response({"msg": "Bucket size not supported only 1 & 7 days are supported"}, status=400)
+    if aggregation not in ["count", "total_time", "average_time"]:
+        return Response({"msg": "Aggregation type not supported."}, status=400)
 
-    livekit_queryset = LivekitSession.objects.filter(
-        u1__in=queryset, u2__in=queryset, both_have_been_active=True, created_at__range=[start_date, end_date]
-    ).annotate(bucket=trunc_func("created_at"))
+    list_name, queryset, use_rollups = get_statistics_base(request)
+    metrics = [StatisticRollup.Metric.CALLS, StatisticRollup.Metric.CALL_SECONDS]
+    values = daily_values(metrics, list_name, queryset, start_date, end_date, company, use_rollups)
+    calls = bucketed(values[StatisticRollup.Metric.CALLS], bucket_size)
+    call_seconds = bucketed(values[StatisticRollup.Metric.CALL_SECONDS], bucket_size)
 
     if aggregation == "count":
-        livekit_queryset = livekit_queryset.values("bucket").annotate(count=Count("id")).order_by("bucket")
-        data = [{"date": stats["bucket"], "count": stats["count"]} for stats in livekit_queryset]
+        data = [{"date": bucket, "count": int(count)} for bucket, count in calls.items()]
     elif aggregation == "total_time":
-        livekit_queryset = (
-            livekit_queryset.values("bucket")
-            .annotate(total_time=Sum(F("end_time") - F("created_at")))
-            .order_by("bucket")
-        )
-        data = [
-            {"date": stats["bucket"], "count": stats["total_time"].total_seconds() / 60.0} for stats in livekit_queryset
-        ]
-    elif aggregation == "average_time":
-        livekit_queryset = (
-            livekit_queryset.values("bucket")
-            .annotate(average_time=Avg(F("end_time") - F("created_at")))
-            .order_by("bucket")
-        )
+        data = [{"date": bucket, "count": call_seconds.get(bucket, 0) / 60.0} for bucket in calls]
+    else:
         data = [
-            {"date": stats["bucket"], "count": stats["average_time"].total_seconds() / 60.0}
-            for stats in livekit_queryset
+            {"date": bucket, "count": call_seconds.get(bucket, 0) / count / 60.0} for bucket, count in calls.items()
         ]
-    else:
-        return Response({"msg": "Aggregation type not supported."}, status=400)
 
     return Response(data)
 
 
-def get_bucket_statistics(pre_filtered_users, selected_filters=None, filter_lists=FILTER_LISTS):
+def bucket_statistics_from_snapshot(
+    snapshot, selected_filters_list, durations, all_name, refreshed_at=None, selected_filters=None
+):
     """
-    Calculate bucket statistics for a given set of users and filters.
-
-    Args:
-        pre_filtered_users: QuerySet of pre-filtered User objects
-        selected_filters: List of filter names to apply (default: None, uses all filters)
-        filter_lists: List of filter definitions to use (default: FILTER_LISTS)
-
-    Returns:
-        dict: Contains buckets, missing_ids, and intersecting_ids_lists
+    Counts, intersections and missing ids of the `selected_filters_list` buckets in `snapshot`,
+    intersections are checked in the order of `selected_filters` if given.
     """
     if selected_filters is None:
-        selected_filters = [entry.name for entry in filter_lists]
-
-    user_buckets = []
-    selected_filters_list = []
-    pre_filtered_uj_lists = {entry.name: entry for entry in filter_lists if entry.name in selected_filters}
-
-    for filter_name in selected_filters:
-        filter_list_entry = pre_filtered_uj_lists[filter_name]
-        selected_filters_list.append(filter_list_entry)
-
-    query_logger = QueryLogger()
-    last_query_log_index = 0
-    user_list_ids = {}
-    all_ids_set = set()
-
-    with connection.execute_wrapper(query_logger):
-        for i, filter_list in enumerate(selected_filters_list):
-            queryset = filter_list.queryset(qs=pre_filtered_users)
-            count = queryset.count()
-            duration = sum([query["duration"] for query in query_logger.queries[last_query_log_index:]])
-            last_query_log_index = len(query_logger.queries) - 1
-
-            user_buckets.append(
-                {
-                    "name": filter_list.name,
-                    "description": filter_list.description,
-                    "count": count,
-                    "id": i,
-                    "query_duration": duration,
-                }
-            )
+        selected_filters = [filter_list.name for filter_list in selected_filters_list]
 
-            user_list_ids[filter_list.name] = {
-                "ids": queryset.values_list("id", flat=True),
-            }
-
-            if filter_list.name != "all":
-                all_ids_set.update(user_list_ids[filter_list.name]["ids"])
+    buckets = [
+        {
+            "name": filter_list.name,
+            "description": filter_list.description,
+            "count": snapshot.count(filter_list.name),
+            "id": i,
+            "query_duration": durations[filter_list.name],
+        }
+        for i, filter_list in enumerate(selected_filters_list)
+    ]
 
     # Calculate intersecting IDs
     exclude_intersection_check = [
         "all",
         "needs_matching",
+        "match_journey_v2__all",
         "match_journey_v2__proposed_matches",
         "match_journey_v2__expired_proposals",
     ]
-
-    intersecting_ids_lists = {}
     intersection_check_lists = [
         list_name for list_name in selected_filters if list_name not in exclude_intersection_check
     ]
-    intersection_check_lists_not_processed = intersection_check_lists.copy()
+    intersecting_ids_lists = snapshot.intersections(intersection_check_lists)
 
-    for list_name in intersection_check_lists:
-        intersection_check_lists_not_processed.remove(list_name)
-        for other_list_name in intersection_check_lists_not_processed:
-            if list_name != other_list_name:
-                intersecting_ids = set(user_list_ids[list_name]["ids"]).intersection(
-                    user_list_ids[other_list_name]["ids"]
-                )
-                if len(intersecting_ids) > 0:
-                    intersecting_ids_lists[f"{list_name}---{other_list_name}"] = intersecting_ids
-
-    all_ids = set(user_list_ids["all"]["ids"])
-    missing_ids = all_ids.difference(all_ids_set)
+    # the `all` bucket are the pre filtered users / matches them selfs
+    bucketed_ids = set().union(*[ids for name, ids in snapshot.members.items() if name != all_name])
+    missing_ids = set(snapshot.ids).difference(bucketed_ids)
 
     return {
-        "buckets": user_buckets,
+        "buckets": buckets,
         "missing_ids": list(missing_ids),
         "intersecting_ids_lists": intersecting_ids_lists,
+        # None if the buckets were calculated live, otherwise the oldest refresh of the materialized buckets
+        "refreshed_at": refreshed_at,
     }
 
 
+def get_bucket_statistics(pre_filtered_users, selected_filters=None, filter_lists=FILTER_LISTS, live=False):
+    """
+    Calculate bucket statistics for a given set of users and filters.
+
+    Args:
+        pre_filtered_users: QuerySet of pre-filtered User objects
+        selected_filters: List of filter names to apply (default: None, uses all filters)
+        filter_lists: List of filter definitions to use (default: FILTER_LISTS)
+        live: Always evaluate the filters, instead of reading recently refreshed `BucketMembership`s
+
+    Returns:
+        dict: Contains buckets, missing_ids, intersecting_ids_lists and refreshed_at
+    """
+    if selected_filters is None:
+        selected_filters = [entry.name for entry in filter_lists]
+
+    pre_filtered_uj_lists = {entry.name: entry for entry in filter_lists if entry.name in selected_filters}
+    selected_filters_list = [pre_filtered_uj_lists[filter_name] for filter_name in selected_filters]
+
+    refreshed_at = None if live else get_refreshed_at(BucketMembership.Kind.USER, selected_filters)
+
+    # All buckets are evaluated in one query, so every bucket reports the duration of that shared query
+    query_logger = QueryLogger()
+    with connection.execute_wrapper(query_logger):
+        if refreshed_at is not None:
+            snapshot = materialized_snapshot(BucketMembership.Kind.USER, pre_filtered_users, selected_filters)
+        else:
+            snapshot = classify_users(pre_filtered_users, selected_filters_list)
+    duration = sum([query["duration"] for query in query_logger.queries])
+
+    return bucket_statistics_from_snapshot(
+        snapshot,
+        selected_filters_list,
+        {name: duration for name in selected_filters},
+        all_name="all",
+        refreshed_at=refreshed_at,
+    )
+
+
 @extend_schema(
     request=inline_serializer(
         name="BucketStatisticsCountOverTimeRequest",
@@ -363,6 +311,7 @@ def get_bucket_statistics(pre_filtered_users, selected_filters=None, filter_list
             "start_date": serializers.DateField(default="2021-01-01", required=False),
             "end_date": serializers.DateField(default=date.today(), required=False),
             "volunteers_only": serializers.BooleanField(default=False, required=False),
+            "live": serializers.BooleanField(default=False, required=False),
         },
     ),
 )
@@ -388,13 +337,18 @@ def bucket_statistics(request):
 
     # Get bucket statistics using the extracted function
     stats = get_bucket_statistics(
-        pre_filtered_users=pre_filtered_users, selected_filters=selected_filters, filter_lists=FILTER_LISTS
+        pre_filtered_users=pre_filtered_users,
+        selected_filters=selected_filters,
+        filter_lists=FILTER_LISTS,
+        live=request.data.get("live", False),
     )
 
     return Response(stats)
 
 
-def get_match_bucket_statistics(pre_filtered_matches, selected_filters=None, filter_lists=MATCH_JOURNEY_FILTERS):
+def get_match_bucket_statistics(
+    pre_filtered_matches, selected_filters=None, filter_lists=MATCH_JOURNEY_FILTERS, live=False
+):
     """
     Calculate match bucket statistics for a given set of matches and filters.
 
@@ -402,9 +356,10 @@ def get_match_bucket_statistics(pre_filtered_matches, selected_filters=None, fil
         pre_filtered_matches: QuerySet of pre-filtered Match objects
         selected_filters: List of filter names to apply (default: None, uses all filters)
         filter_lists: List of filter definitions to use (default: MATCH_JOURNEY_FILTERS)
+        live: Always evaluate the filters, instead of reading recently refreshed `BucketMembership`s
 
     Returns:
-        dict: Contains buckets, missing_ids, and intersecting_ids_lists
+        dict: Contains buckets, missing_ids, intersecting_ids_lists and refreshed_at
     """
     if selected_filters is None:
         selected_filters = [entry.name for entry in filter_lists]
@@ -412,71 +367,38 @@ def get_match_bucket_statistics(pre_filtered_matches, selected_filters=None, fil
     if "match_journey_v2__all" not in selected_filters:
         selected_filters.append("match_journey_v2__all")
 
-    query_logger = QueryLogger()
-    last_query_log_index = 0
-    all_ids_set = set()
-    user_list_ids = {}
-
-    with connection.execute_wrapper(query_logger):
-        match_buckets = []
-        selected_filters_list = [entry for entry in filter_lists if entry.name in selected_filters]
-
-        for i, filter_list in enumerate(selected_filters_list):
-            queryset = filter_list.queryset(qs=pre_filtered_matches)
-            count = queryset.count()
-            duration = sum([query["duration"] for query in query_logger.queries[last_query_log_index:]])
-            last_query_log_index = len(query_logger.queries) - 1
-
-            match_buckets.append(
-                {
-                    "name": filter_list.name,
-                    "description": filter_list.description,
-                    "count": count,
-                    "id": i,
-                    "query_duration": duration,
-                }
-            )
-
-            user_list_ids[filter_list.name] = {
-                "ids": queryset.values_list("id", flat=True),
-            }
-
-            if filter_list.name != "match_journey_v2__all":
-                all_ids_set.update(user_list_ids[filter_list.name]["ids"])
-
-    # Calculate intersecting IDs
-    exclude_intersection_check = [
-        "all",
-        "needs_matching",
-        "match_journey_v2__all",
-        "match_journey_v2__proposed_matches",
-        "match_journey_v2__expired_proposals",
-    ]
+    selected_filters_list = [entry for entry in filter_lists if entry.name in selected_filters]
+    names = [entry.name for entry in selected_filters_list]
 
-    intersecting_ids_lists = {}
-    intersection_check_lists = [
-        list_name for list_name in selected_filters if list_name not in exclude_intersection_check
-    ]
-    intersection_check_lists_not_processed = intersection_check_lists.copy()
+    refreshed_at = None if live else get_refreshed_at(BucketMembership.Kind.MATCH, names)
 
-    for list_name in intersection_check_lists:
-        intersection_check_lists_not_processed.remove(list_name)
-        for other_list_name in intersection_check_lists_not_processed:
-            if list_name != other_list_name:
-                intersecting_ids = set(user_list_ids[list_name]["ids"]).intersection(
-                    user_list_ids[other_list_name]["ids"]
+    query_logger = QueryLogger()
+    durations = {}
+    with connection.execute_wrapper(query_logger):
+        if refreshed_at is not None:
+            snapshot = materialized_snapshot(BucketMembership.Kind.MATCH, pre_filtered_matches, names)
+            duration = sum([query["duration"] for query in query_logger.queries])
+            durations = {name: duration for name in names}
+        else:
+            snapshot = BucketSnapshot(members={})
+            for filter_list in selected_filters_list:
+                last_query_log_index = len(query_logger.queries)
+                snapshot.members[filter_list.name] = set(
+                    filter_list.queryset(qs=pre_filtered_matches).values_list("id", flat=True)
                 )
-                if len(intersecting_ids) > 0:
-                    intersecting_ids_lists[f"{list_name}---{other_list_name}"] = intersecting_ids
-
-    all_ids = set(user_list_ids["match_journey_v2__all"]["ids"])
-    missing_ids = all_ids.difference(all_ids_set)
-
-    return {
-        "buckets": match_buckets,
-        "intersecting_ids_lists": intersecting_ids_lists,
-        "missing_ids": list(missing_ids),
-    }
+                durations[filter_list.name] = sum(
+                    [query["duration"] for query in query_logger.queries[last_query_log_index:]]
+                )
+            snapshot.ids = list(snapshot.members["match_journey_v2__all"])
+
+    return bucket_statistics_from_snapshot(
+        snapshot,
+        selected_filters_list,
+        durations,
+        all_name="match_journey_v2__all",
+        refreshed_at=refreshed_at,
+        selected_filters=selected_filters,
+    )
 
 
 @extend_schema(
@@ -491,6 +413,7 @@ def get_match_bucket_statistics(pre_filtered_matches, selected_filters=None, fil
             ),
             "start_date": serializers.DateField(default="2021-01-01", required=False),
             "end_date": serializers.DateField(default=date.today(), required=False),
+            "live": serializers.BooleanField(default=False, required=False),
         },
     ),
 )
@@ -516,99 +439,64 @@ def match_bucket_statistics(request):
 
     # Get match bucket statistics using the extracted function
     stats = get_match_bucket_statistics(
-        pre_filtered_matches=pre_filtered_matches, selected_filters=selected_filters, filter_lists=MATCH_JOURNEY_FILTERS
+        pre_filtered_matches=pre_filtered_matches,
+        selected_filters=selected_filters,
+        filter_lists=MATCH_JOURNEY_FILTERS,
+        live=request.data.get("live", False),
     )
 
     return Response(stats)
 
 
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name="report_format",
+            type=str,
+            enum=["json", "text", "csv"],
+            default="json",
+            description="json returns the whole report at once, text & csv stream it",
+        ),
+        OpenApiParameter(
+            name="run_async",
+            type=bool,
+            default=False,
+            description="Export the report in a celery task, download it from the `download` url once done",
+        ),
+    ],
+)
 @api_view(["POST"])
 @permission_classes([IsAdminOrMatchingUser])
 def comany_video_call_and_matching_report(request, company):
-    users = User.objects.filter(state__company=company)
+    report_format = request.query_params.get("report_format", "json")
+    if report_format not in ["json", "text", "csv"]:
+        return Response({"msg": "Format not supported. Only json, text & csv are supported"}, status=400)
 
-    total_video_time_seconds_all_users = 0  # Variable to keep track of total video time for all users
+    if request.query_params.get("run_async", "false").lower() in ["true", "1"]:
+        from management.tasks import export_company_report
 
-    MAX_VIDEO_CALL_DURATION_SECONDS = 2 * 60 * 60  # 2 hours in seconds
-
-    full_report = ""
-
-    def report(text):
-        nonlocal full_report
-        full_report += text + "\n"
-
-    for user in users:
-        report(f"User: {user.username}")
-        report("=" * 40)
-
-        # Retrieve user's matches excluding support matches
-        matches_as_user1 = Match.objects.filter(user1=user, support_matching=False)
-        matches_as_user2 = Match.objects.filter(user2=user, support_matching=False)
-
-        matches = matches_as_user1.union(matches_as_user2)
-
-        report("Matches:")
-        for match in matches:
-            status = "Confirmed" if match.confirmed else "Pending Confirmation"
-            match_user1 = match.user1.username
-            match_user2 = match.user2.username
-            confirmation_status = []
-
-            if match.confirmed_by == match.user1:
-                confirmation_status.append(f"{match_user1} confirmed")
-            elif match.confirmed_by == match.user2:
-                confirmation_status.append(f"{match_user2} confirmed")
-            else:
-                if match.confirmed:
-                    confirmation_status.append("Both confirmed")
-                else:
-                    confirmation_status.append("No one confirmed")
-
-            report(
-                f"\tMatch with {match_user1 if match_user1 != user.username else match_user2} - {status} ({', '.join(confirmation_status)})"
-            )
-
-        report("=" * 20)
-
-        # Retrieve user's video calls where both users have been active
-        video_calls_as_u1 = LivekitSession.objects.filter(u1=user, both_have_been_active=True)
-        video_calls_as_u2 = LivekitSession.objects.filter(u2=user, both_have_been_active=True)
-
-        video_calls = video_calls_as_u1.union(video_calls_as_u2)
-
-        total_video_time_seconds_user = 0  # Variable to keep track of video time for the current user
-
-        report("Video Calls:")
-        for call in video_calls:
-            other_user = call.u1 if call.u1 != user else call.u2
-            active_status = "Active" if call.is_active else "Inactive"
-
-            # Calculate call duration if end time is available
-            if call.end_time:
-                start_time = call.created_at
-                end_time = call.end_time
-                duration = end_time - start_time
-                if duration.total_seconds() > MAX_VIDEO_CALL_DURATION_SECONDS:
-                    report(f"\tSkipping excessively long video call with {other_user.username}: Duration {duration}")
-                    continue  # Skip calls longer than 2 hours
-                total_video_time_seconds_user += duration.total_seconds()
-                report(f"\tVideo call with {other_user.username}: Duration {duration}, Status: {active_status}")
-            else:
-                report(f"\tVideo call with {other_user.username}: Status: {active_status}")
+        task = export_company_report.delay(
+            company, "text" if report_format == "text" else "csv", caller_id=request.user.pk
+        )
+        return Response(
+            {
+                "task_id": task.task_id,
+                "download": f"/api/matching/users/statistics/company_report/download/{task.task_id}/",
+            }
+        )
 
-        total_video_time_minutes_user = total_video_time_seconds_user / 60
-        report(f"Total Video Time for {user.username}: {total_video_time_minutes_user:.2f} minutes")
-        report("=" * 40)
+    report = CompanyReport(company)
+    if report_format == "csv":
+        return streaming_csv_response(report.csv_rows(), f"company_report_{slugify(company)}.csv")
+    if report_format == "text":
+        return streaming_text_response(report.lines())
+    return Response({"report": "".join(text_lines(report.lines()))})
 
-        # Add user's video time to the global total
-        total_video_time_seconds_all_users += total_video_time_seconds_user
 
-    # Calculate total video time for all users
-    total_video_time_minutes_all_users = total_video_time_seconds_all_users / 60
-    report(f"Total Video Time for All Users: {total_video_time_minutes_all_users:.2f} minutes")
-    total_hours = total_video_time_minutes_all_users / 60.0
-    report(f"Total Video Time for All Users: {total_hours:.2f} hours")
-    return Response({"report": full_report})
+@api_view(["GET"])
+@permission_classes([IsAdminOrMatchingUser])
+def company_report_download(request, task_id):
+    return export_download_response(request, task_id, EXPORT_KIND_COMPANY_REPORT)
 
 
 def user_signup_loss_statistic(start_date="2022-01-01", end_date=date.today(), caller=None):
@@ -865,6 +753,35 @@ def user_signup_loss_statistics(request):
     return Response(user_signup_loss_statistic_v2(start_date, end_date, caller))
 
 
+WAITING_TIME_PERCENTILES = [10, 25, 50, 75, 90]
+WAITING_TIME_HISTOGRAM_DAYS = [0, 7, 14, 30, 60, 90, 180, 365]
+
+
+def waiting_time_distribution(days):
+    """
+    Average, percentiles and a histogram of the waiting `days`,
+    the last histogram bucket contains everything above the last bound ( `to` is None )
+    """
+    if not days:
+        return {"count": 0, "average": None, "percentiles": {}, "histogram": []}
+
+    days = np.array(days)
+    bounds = [*WAITING_TIME_HISTOGRAM_DAYS, max(days.max() + 1, WAITING_TIME_HISTOGRAM_DAYS[-1] + 1)]
+    counts, _ = np.histogram(days, bins=bounds)
+    return {
+        "count": len(days),
+        "average": float(days.mean()),
+        "percentiles": {
+            f"p{percentile}": float(value)
+            for percentile, value in zip(WAITING_TIME_PERCENTILES, np.percentile(days, WAITING_TIME_PERCENTILES))
+        },
+        "histogram": [
+            {"from": bounds[i], "to": bounds[i + 1] if i + 2 < len(bounds) else None, "count": int(count)}
+            for i, count in enumerate(counts)
+        ],
+    }
+
+
 # Returns the average waiting time (from prematch call to being matched) for all eligible users
 @api_view(["POST"])
 @permission_classes([IsAdminOrMatchingUser])
@@ -880,23 +797,20 @@ def user_match_waiting_time_statistics(request):
         state__updated_at__lte=end_date,
     )
 
-    total_waiting_time = 0
-    num_users = 0
-
-    for user in eligible_users:
-        # Fixed: Using the helper function directly instead of broken self.match_waiting_time
-        waiting_time_data = get_match_waiting_time(user)
-        waiting_time = waiting_time_data.get("number_of_days")
-        if waiting_time is not None:
-            total_waiting_time += waiting_time
-            num_users += 1
-
-    if num_users > 0:
-        average_waiting_time = total_waiting_time / num_users
-        return Response({"average_waiting_time": average_waiting_time})
-    else:
+    waiting_times = get_match_waiting_times(eligible_users)
+    if not waiting_times:
         return Response({"error": "No eligible users found within the specified date range."}, status=404)
 
+    distribution = waiting_time_distribution([days for _, days, _ in waiting_times])
+    return Response(
+        {
+            "average_waiting_time": distribution["average"],
+            **distribution,
+            "first_search": waiting_time_distribution([days for _, days, first in waiting_times if first]),
+            "re_search": waiting_time_distribution([days for _, days, first in waiting_times if not first]),
+        }
+    )
+
 
 @api_view(["GET"])
 @permission_classes([IsAdminOrMatchingUser])
@@ -979,6 +893,7 @@ def kpi_dashboard_statistics_signups(request):
             "percent_volunteers_last_7_days": total_registered_volunteers_last_7_days / last_7_days * 100.0,
             "signups_last_30_days": signups_last_30_days,
             "percent_onboarded_users": modified_buckets[-1]["percentage"],
+            "buckets_refreshed_at": bucket_statistics["refreshed_at"],
         }
     )
 
@@ -1126,10 +1041,30 @@ def kpi_dashboard_statistics_matching(request):
             "matches_6_12_weeks_ago_failed_vs_ongoing_finished_percentage": round(
                 matches_6_12_weeks_ago_failed_vs_ongoing_finished_percentage, 2
             ),
+            "buckets_refreshed_at": get_refreshed_at(
+                BucketMembership.Kind.MATCH,
+                ["match_journey_v2__all", *itertools.chain(*match_journey_bucket_clusters.values())],
+            ),
         }
     )
 
 
+def availability_slot_matrix(profiles):
+    """
+    Unpacks the `availability_bitmask` of all `profiles` into a (n_profiles, len(DAYS) * len(SLOTS)) bool matrix
+    column `d * len(SLOTS) + s` is `DAYS[d]`, `SLOTS[s]`. Returns (user_ids, matrix)
+    """
+    import numpy as np
+
+    from management.validators import DAYS, SLOTS
+
+    rows = list(profiles.values_list("user_id", "availability_bitmask"))
+    user_ids = np.array([user_id for user_id, _ in rows], dtype=np.int64)
+    masks = np.array([mask for _, mask in rows], dtype="<u8").reshape(-1, 1)
+    bits = np.unpackbits(masks.view(np.uint8), axis=1, bitorder="little")
+    return user_ids, bits[:, : len(DAYS) * len(SLOTS)].astype(bool)
+
+
 @api_view(["GET"])
 @permission_classes([IsAdminOrMatchingUser])
 def time_slot_counts(request):
@@ -1144,23 +1079,13 @@ def time_slot_counts(request):
     if not request.user.is_staff:
         pre_filtered_users = pre_filtered_users.filter(id__in=request.user.state.managed_users.all())
 
-    # Initialize the counts dictionary with all days and slots set to 0
-    counts = {day: {slot: 0 for slot in SLOTS} for day in DAYS}
-
     # Get all profiles with non-null availability
     profiles = Profile.objects.filter(user__in=pre_filtered_users, availability__isnull=False)
 
     # Count the occurrences of each time slot for each day
-    for profile in profiles:
-        availability = profile.availability
-        if not availability:
-            continue
-
-        for day in DAYS:
-            if day in availability:
-                for slot in availability[day]:
-                    if slot in SLOTS:
-                        counts[day][slot] += 1
+    _, slot_matrix = availability_slot_matrix(profiles)
+    slot_counts = slot_matrix.sum(axis=0).reshape(len(DAYS), len(SLOTS))
+    counts = {day: {slot: int(slot_counts[d, s]) for s, slot in enumerate(SLOTS)} for d, day in enumerate(DAYS)}
 
     # Calculate totals for each day and each slot
     day_totals = {day: sum(counts[day].values()) for day in DAYS}
@@ -1213,148 +1138,8 @@ def time_slot_counts(request):
     )
 
 
-def optimize_availability_for_n(
-    users,
-    n=1,
-    limit_tested_combs=10000,
-    disallow_same_day_combinations=False,
-    flat_all_slots=None,
-    slots_id_maps=None,
-    slots_id_counts=None,
-):
-    """
-    Helper function to find optimal time slot combinations for a specific size n.
-
-    Args:
-        profiles: QuerySet of Profile objects with availability
-        n: Number of slots to include in each combination
-        limit_tested_combs: Maximum number of combinations to test
-        disallow_same_day_combinations: If true, combinations with slots from the same day will be excluded
-        flat_all_slots: List of all possible day-slot combinations
-        slots_id_maps: Dictionary mapping each slot to the set of user IDs available at that time
-        slots_id_counts: Dictionary mapping each slot to the count of users available at that time
-
-    Returns:
-        List of tuples (count, combo) representing the top combinations
-    """
-    import itertools
-
-    from management.validators import DAYS, SLOTS
-
-    # Initialize data structures if not provided
-    if flat_all_slots is None:
-        flat_all_slots = [f"{day}__{slot}" for day in DAYS for slot in SLOTS]
-
-    if slots_id_maps is None or slots_id_counts is None:
-        slots_id_maps = {slot: set() for slot in flat_all_slots}
-        slots_id_counts = {slot: 0 for slot in flat_all_slots}
-
-        # Count the occurrences of each time slot for each day
-        for user in users:
-            profile = user.profile
-            availability = profile.availability
-            if not availability:
-                continue
-
-            for day in DAYS:
-                if day in availability:
-                    for slot in availability[day]:
-                        if slot in SLOTS:
-                            slots_id_maps[f"{day}__{slot}"].add(user.id)
-                            slots_id_counts[f"{day}__{slot}"] += 1
-
-    # Sort slots by count in descending order
-    ordered_highest_count_slots = sorted(slots_id_counts.items(), key=lambda x: x[1], reverse=True)
-
-    # Take the top slots that are most likely to be in optimal combinations
-    top_slots_to_consider = [
-        slot for slot, _ in ordered_highest_count_slots[: min(20, len(ordered_highest_count_slots))]
-    ]
-
-    # Generate combinations, prioritizing those with high-count slots
-    combinations_to_test = []
-
-    # Function to check if a combination has slots from the same day
-    def has_same_day(combo):
-        if not disallow_same_day_combinations:
-            return False
-
-        days_in_combo = [slot.split("__")[0] for slot in combo]
-        return len(days_in_combo) != len(set(days_in_combo))
-
-    # First, try combinations that include at least one of the top slots
-    if n <= len(top_slots_to_consider):
-        # Generate combinations that include at least one top slot
-        other_slots = [slot for slot, _ in ordered_highest_count_slots[len(top_slots_to_consider) :]]
-
-        # Start with combinations of only top slots
-        for combo in itertools.combinations(top_slots_to_consider, n):
-            if not has_same_day(combo):
-                combinations_to_test.append(combo)
-
-        # If we need more combinations, add ones that mix top slots with others
-        if len(combinations_to_test) < limit_tested_combs and n > 1:
-            for i in range(1, min(n, len(top_slots_to_consider))):
-                for top_combo in itertools.combinations(top_slots_to_consider, i):
-                    remaining = n - i
-                    for other_combo in itertools.combinations(other_slots, remaining):
-                        full_combo = top_combo + other_combo
-                        if not has_same_day(full_combo):
-                            if len(combinations_to_test) >= limit_tested_combs:
-                                break
-                            combinations_to_test.append(full_combo)
-                    if len(combinations_to_test) >= limit_tested_combs:
-                        break
-                if len(combinations_to_test) >= limit_tested_combs:
-                    break
-
-    # If we still need more combinations, add random ones
-    if len(combinations_to_test) < limit_tested_combs:
-        remaining_limit = limit_tested_combs - len(combinations_to_test)
-        # Generate all possible combinations
-        all_remaining_combos = []
-
-        for combo in itertools.combinations(flat_all_slots, n):
-            if not has_same_day(combo) and combo not in combinations_to_test:
-                all_remaining_combos.append(combo)
-
-        # If the total possible combinations is manageable, test all of them
-        if len(all_remaining_combos) <= remaining_limit:
-            combinations_to_test.extend(all_remaining_combos)
-        else:
-            # Otherwise, add some random combinations from the remaining slots
-            import random
-
-            random_combos = random.sample(all_remaining_combos, min(remaining_limit, len(all_remaining_combos)))
-            combinations_to_test.extend(random_combos)
-
-    # Evaluate each combination to find the ones that cover the most users
-    top_combinations = []
-
-    for combo in combinations_to_test:
-        # Union of all user IDs covered by this combination
-        covered_users = set()
-        for slot in combo:
-            covered_users.update(slots_id_maps[slot])
-
-        # Add to results
-        top_combinations.append((len(covered_users), combo))
-
-    # Sort by coverage (descending)
-    top_combinations.sort(reverse=True)
-
-    return top_combinations
-
-
 @extend_schema(
     parameters=[
-        OpenApiParameter(
-            name="limit_tested_combs",
-            description="Maximum number of combinations to test",
-            type=OpenApiTypes.INT,
-            default=10000,
-            required=False,
-        ),
         OpenApiParameter(
             name="disallow_same_day_combinations",
             description="If true, combinations with slots from the same day will be excluded",
@@ -1395,8 +1180,6 @@ def time_slot_combination_optimization(request, n=1):
     """
     import math
 
-    from management.validators import DAYS, SLOTS
-
     list_name = request.query_params.get("base_list", "all")
     selected_filter = next(filter(lambda entry: entry.name == list_name, FILTER_LISTS))
 
@@ -1410,42 +1193,20 @@ def time_slot_combination_optimization(request, n=1):
     users = User.objects.filter(id__in=pre_filtered_users)
 
     # Get parameters
-    limit_tested_combs = int(request.query_params.get("limit_tested_combs", 10000))
     top_n_results = int(request.query_params.get("top_n_results", 100))
     disallow_same_day_combinations = (
         request.query_params.get("disallow_same_day_combinations", "false").lower() == "true"
     )
     consider_lower_n_combs = request.query_params.get("consider_lower_n_combs", "false").lower() == "true"
 
-    empty_availability_profiles = []
-
     # Initialize data structures
-    flat_all_slots = [f"{day}__{slot}" for day in DAYS for slot in SLOTS]
-    slots_id_maps = {slot: set() for slot in flat_all_slots}
-    slots_id_counts = {slot: 0 for slot in flat_all_slots}
-
-    # Count the occurrences of each time slot for each day
-    for user in users:
-        profile = user.profile
-        availability = profile.availability
-        if not availability:
-            continue
-
-        empty_availability = True
-
-        for day in DAYS:
-            if day in availability:
-                if len(availability[day]) > 0:
-                    empty_availability = False
-                for slot in availability[day]:
-                    if slot in SLOTS:
-                        slots_id_maps[f"{day}__{slot}"].add(user.id)
-                        slots_id_counts[f"{day}__{slot}"] += 1
-        if empty_availability:
-            empty_availability_profiles.append(user.id)
+    flat_all_slots = FLAT_ALL_SLOTS
+    user_ids, slot_matrix = availability_slot_matrix(Profile.objects.filter(user__in=users))
+    slots_id_counts = {slot: int(count) for slot, count in zip(flat_all_slots, slot_matrix.sum(axis=0))}
+    empty_availability_profiles = user_ids[~slot_matrix.any(axis=1)].tolist()
 
     users = users.exclude(id__in=empty_availability_profiles)
-    pre_filtered_users = pre_filtered_users.exclude(id__in=empty_availability_profiles)
+    total_users = users.count()
 
     # Calculate total possible combinations (n choose k)
     total_slots = len(flat_all_slots)
@@ -1460,76 +1221,47 @@ def time_slot_combination_optimization(request, n=1):
     else:
         combination_sizes = [n]
 
-    # Find optimal combinations for each size
-    all_top_combinations = []
-    best_coverage_by_size = {}  # Track best coverage for each size
-
-    for size in combination_sizes:
-        # Allocate a portion of the limit to each size
-        size_limit = limit_tested_combs // len(combination_sizes)
-
-        # Find optimal combinations for this size
-        size_combinations = optimize_availability_for_n(
-            users=users,
-            n=size,
-            limit_tested_combs=size_limit,
-            disallow_same_day_combinations=disallow_same_day_combinations,
-            flat_all_slots=flat_all_slots,
-            slots_id_maps=slots_id_maps,
-            slots_id_counts=slots_id_counts,
-        )
-
-        # Find the best coverage for this size
-        if size_combinations:
-            best_count, best_combo = max(size_combinations, key=lambda x: x[0])
-            coverage_percentage = (best_count / users.count()) * 100 if users.count() > 0 else 0
+    # Find the optimal combinations for each size
+    combinations_by_size, combinations_tested, exact = best_slot_combinations(
+        slot_matrix,
+        combination_sizes,
+        top_k=top_n_results,
+        disallow_same_day_combinations=disallow_same_day_combinations,
+    )
 
-            best_coverage_by_size[size] = {
-                "combination": [slot for slot in best_combo],
-                "users_covered": best_count,
-                "coverage_percentage": round(coverage_percentage, 2),
-            }
+    def coverage_percentage(count):
+        return round((count / total_users) * 100, 2) if total_users > 0 else 0
 
-        # Add to overall results
-        all_top_combinations.extend(size_combinations)
+    best_coverage_by_size = {
+        size: {
+            "combination": list(size_combinations[0][1]),
+            "users_covered": size_combinations[0][0],
+            "coverage_percentage": coverage_percentage(size_combinations[0][0]),
+        }
+        for size, size_combinations in combinations_by_size.items()
+        if size_combinations
+    }
 
     # Sort by coverage and take top results
-    all_top_combinations.sort(reverse=True)
-    top_combinations = all_top_combinations[:top_n_results]
-
-    # Convert the results to a more readable format
-    formatted_results = []
-
-    for count, combo in top_combinations:
-        # Get the day and slot names for each slot in the combination
-        formatted_slots = []
-        for slot_code in combo:
-            day, time_slot = slot_code.split("__")
-            formatted_slots.append(slot_code)
-
-        # Calculate coverage percentage
-        coverage_percentage = (count / users.count()) * 100 if users.count() > 0 else 0
-
-        formatted_results.append(
-            {
-                "combination": formatted_slots,
-                "combination_size": len(combo),
-                "users_covered": count,
-                "coverage_percentage": round(coverage_percentage, 2),
-            }
-        )
+    all_top_combinations = sorted(itertools.chain(*combinations_by_size.values()), reverse=True)
+    formatted_results = [
+        {
+            "combination": list(combo),
+            "combination_size": len(combo),
+            "users_covered": count,
+            "coverage_percentage": coverage_percentage(count),
+        }
+        for count, combo in all_top_combinations[:top_n_results]
+    ]
 
     return Response(
         {
             "flat_all_slots": flat_all_slots,
-            "total_users": users.count(),
+            "total_users": total_users,
             "ordered_highest_count_slots": {slot: count for slot, count in ordered_highest_count_slots[:20]},
             "total_possible_combinations": total_possible_combinations,
-            "combinations_tested": sum(
-                1
-                for size in combination_sizes
-                for _ in range(min(limit_tested_combs // len(combination_sizes), math.comb(total_slots, size)))
-            ),
+            "combinations_tested": combinations_tested,
+            "exact": exact,
             "top_combinations": formatted_results,
             "best_coverage_by_size": best_coverage_by_size,
             "disallow_same_day_combinations": disallow_same_day_combinations,
@@ -1770,6 +1502,7 @@ api_urls = [
     path("api/matching/users/statistics/kpi_matching/", kpi_dashboard_statistics_matching),
     path("api/matching/users/statistics/kpi_searching/", kpi_dashboard_statistics_searching_users),
     path("api/matching/users/statistics/time_slot_counts/", time_slot_counts),
+    path("api/matching/users/statistics/company_report/download/<str:task_id>/", company_report_download),
     path("api/matching/users/statistics/company_report/<str:company>/", comany_video_call_and_matching_report),
     path("api/matching/users/statistics/marketing_campaign/", marketing_campaign_report),
 ]
@@ -0,0 +1,114 @@
+"""
+Streaming user export of the matching panel.
+
+The users are read with `values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)` and every row is written
+to the response as soon as it is read, so memory stays flat regardless of the amount of exported users.
+The joins for the selected columns are part of that single query.
+
+Columns are named like the fields of the json export, `profile.first_name` is exported as {"profile": {"first_name": }}.
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import QueryDict
+
+from management.models.user import User
+
+EXPORT_CHUNK_SIZE = 2000
+
+# column -> model field path
+EXPORT_COLUMNS = {
+    "id": "id",
+    "email": "email",
+    "hash": "hash",
+    "date_joined": "date_joined",
+    "last_login": "last_login",
+    "is_active": "is_active",
+    "profile.first_name": "profile__first_name",
+    "profile.second_name": "profile__second_name",
+    "profile.user_type": "profile__user_type",
+    "profile.postal_code": "profile__postal_code",
+    "profile.gender": "profile__gender",
+    "profile.birth_year": "profile__birth_year",
+    "profile.newsletter_subscribed": "profile__newsletter_subscribed",
+    "state.company": "state__company",
+    "state.searching_state": "state__searching_state",
+    "state.email_authenticated": "state__email_authenticated",
+    "state.had_prematching_call": "state__had_prematching_call",
+}
+
+# the fields the json export always had
+DEFAULT_EXPORT_COLUMNS = [
+    "id",
+    "email",
+    "hash",
+    "profile.first_name",
+    "profile.second_name",
+    "profile.user_type",
+    "profile.postal_code",
+    "profile.gender",
+    "profile.birth_year",
+]
+
+
+def get_export_columns(value=None):
+    """
+    Parses the comma separated `columns` parameter, raises `ValueError` for unknown columns
+    """
+    if not value:
+        return DEFAULT_EXPORT_COLUMNS
+    columns = [column.strip() for column in value.split(",") if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(EXPORT_COLUMNS)}")
+    return columns
+
+
+def get_export_queryset(caller, params):
+    """
+    The users `caller` may see, filtered by the `UserFilter` query `params` ( {name: [values]} )
+    """
+    from management.api.user_advanced import UserFilter
+
+    if caller.is_staff:
+        users = User.objects.all()
+    else:
+        users = User.objects.filter(id__in=caller.state.managed_users.all(), is_active=True)
+
+    data = QueryDict(mutable=True)
+    for name, values in params.items():
+        data.setlist(name, values)
+    return UserFilter(data, queryset=users).qs
+
+
+def export_values(users, columns):
+    if not users.query.order_by:
+        users = users.order_by("pk")
+    return users.values_list(*[EXPORT_COLUMNS[column] for column in columns]).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_csv_rows(users, columns):
+    yield columns
+    yield from export_values(users, columns)
+
+
+def nested(columns, values):
+    entry = {}
+    for column, value in zip(columns, values):
+        *parents, name = column.split(".")
+        target = entry
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return entry
+
+
+def export_json_chunks(users, columns):
+    """
+    A json list of the users, one chunk per user
+    """
+    yield "["
+    for i, values in enumerate(export_values(users, columns)):
+        yield ("," if i else "") + json.dumps(nested(columns, values), cls=DjangoJSONEncoder)
+    yield "]"
@@ -0,0 +1,102 @@
+"""
+Classifies users into all journey buckets with a single scan.
+
+Every `FilterListEntry.queryset` in `user_advanced_filter_lists` is a separate heavy query.
+Instead of running them one by one and intersecting id sets in python, `classify_users` puts every
+bucket predicate into one query as a boolean column ( `id IN (<bucket queryset>)` ):
+
+    SELECT id, id IN (...) AS bucket_0, id IN (...) AS bucket_1, ... FROM user WHERE <pre filter>
+
+The resulting `BucketSnapshot` answers bucket counts, bucket intersections and the bucket label of a user.
+
+Some of the filters use JSONField `__contains` lookups that are only supported on PostgreSQL.
+"""
+
+from dataclasses import dataclass, field
+
+from django.db.models import BooleanField, ExpressionWrapper, Q
+
+from management.api.user_advanced_filter_lists import USER_JOURNEY_FILTER_LISTS
+
+# Buckets a user is assigned to, if a user is in multiple of these the last one wins
+USER_CATEGORY_BUCKETS = [
+    "journey_v2__user_created",
+    "journey_v2__email_verified",
+    "journey_v2__user_form_completed",
+    "journey_v2__booked_onboarding_call",
+    "journey_v2__too_low_german_level",
+    "journey_v2__pre_matching",
+    "journey_v2__match_takeoff",
+    "journey_v2__ongoing_non_completed_match",
+    "journey_v2__first_search_v2",
+    "journey_v2__happy_inactive",
+    "journey_v2__happy_active",
+    "journey_v2__no_show",
+    "journey_v2__failed_matching",
+    "journey_v2__gave_up_searching",
+    "journey_v2__user_deleted",
+    "journey_v2__marked_unresponsive",
+]
+
+
+@dataclass
+class BucketSnapshot:
+    ids: list = field(default_factory=list)  # all classified user ( or match ) ids
+    members: dict = field(default_factory=dict)  # bucket name -> set of ids
+
+    def count(self, name):
+        return len(self.members[name])
+
+    def buckets_of(self, user_id):
+        return [name for name, ids in self.members.items() if user_id in ids]
+
+    def bucket_of(self, user_id, bucket_names=USER_CATEGORY_BUCKETS):
+        bucket = "unknown"
+        for name in bucket_names:
+            if user_id in self.members.get(name, ()):
+                bucket = name
+        return bucket
+
+    def intersections(self, names):
+        """
+        Users that are in more than one of `names`, keyed by 'list_a---list_b' like `get_bucket_statistics` always did
+        """
+        intersecting = {}
+        for i, name in enumerate(names):
+            for other_name in names[i + 1 :]:
+                if name == other_name:
+                    continue
+                ids = self.members[name] & self.members[other_name]
+                if ids:
+                    intersecting[f"{name}---{other_name}"] = ids
+        return intersecting
+
+
+def journey_bucket_entries(bucket_names=USER_CATEGORY_BUCKETS):
+    entries = {entry.name: entry for entry in USER_JOURNEY_FILTER_LISTS}
+    return [entries[name] for name in bucket_names]
+
+
+def classify_users(users, filter_lists=None):
+    """
+    Evaluates every entry of `filter_lists` ( default: the `USER_CATEGORY_BUCKETS` ) for all `users` in one query.
+    The bucket querysets are built on `users` as well, so filters that depend on the pre filtered users behave the same.
+    """
+    if filter_lists is None:
+        filter_lists = journey_bucket_entries()
+    filter_lists = [entry for entry in filter_lists if entry.queryset is not None]
+
+    columns = {
+        f"bucket_{i}": ExpressionWrapper(
+            Q(pk__in=entry.queryset(qs=users).order_by().values("pk")), output_field=BooleanField()
+        )
+        for i, entry in enumerate(filter_lists)
+    }
+
+    snapshot = BucketSnapshot(members={entry.name: set() for entry in filter_lists})
+    for user_id, *flags in users.order_by().annotate(**columns).values_list("pk", *columns.keys()):
+        snapshot.ids.append(user_id)
+        for entry, flag in zip(filter_lists, flags):
+            if flag:
+                snapshot.members[entry.name].add(user_id)
+    return snapshot
@@ -92,7 +92,7 @@ def get_user_models(user):
     # cause you need to first get the usr and that should be done with get_user_*
     d = {}
     for k in user_models:
-        elem = user_models[k][0].objects.get(user=user) if k != "user" else user
+        elem = getattr(user, k) if k != "user" else user
         d[k] = elem
     return d
 
@@ -129,7 +129,7 @@ def make_tim_support_user(
     def copy_chat():
         old_chat = Chat.get_chat({admin_user, user})
         new_chat = Chat.get_chat({base_management_user, user})
-        from chat.models import Message
+        from chat.models import ChatUnreadCount, Message
 
         if old_chat and new_chat:
             for message in old_chat.get_messages():
@@ -145,6 +145,7 @@ def make_tim_support_user(
                 # Afterwards overwrite the 'created' time
                 new_message.created = message.created
                 new_message.save()
+            ChatUnreadCount.repair(chats=[new_chat])
 
     # Wait for DB transactions to complete
     transaction.on_commit(copy_chat)
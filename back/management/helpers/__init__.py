@@ -1,6 +1,7 @@
 from .detailed_pagination import DetailedPagination, DetailedPaginationMixin
 from .is_admin_or_matching_user import IsAdminOrMatchingUser
 from .path_rename import PathRename
+from .postal_codes import PostalCodeIndex, get_postal_code_index
 from .query_logger import QueryLogger
 from .user_staff_restricted_viewset import UserStaffRestricedModelViewsetMixin
 
@@ -9,6 +10,8 @@ __all__ = [
     "DetailedPaginationMixin",
     "DetailedPagination",
     "PathRename",
+    "PostalCodeIndex",
+    "get_postal_code_index",
     "QueryLogger",
     "UserStaffRestricedModelViewsetMixin",
 ]
@@ -0,0 +1,164 @@
+"""
+Process wide postal code -> (latitude, longitude) index for distance scoring.
+
+`pgeocode.GeoDistance` reloads the postal code dataset and does a pandas lookup for every call.
+Here the coordinates are loaded once per process, from `settings.POSTAL_CODE_INDEX_FILE` if it exists
+( so no network is required ) otherwise from pgeocode, in which case the local file is written for the next start.
+Use `python manage.py build_postal_code_index` to build the file ahead of time, e.g. in the image build.
+"""
+
+import csv
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Same as `pgeocode.EARTH_RADIUS`
+EARTH_RADIUS = 6371.009
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance in km, works on scalars and ( broadcastable ) arrays.
+    Same formula & operation order as `pgeocode.haversine_distance` so distances are identical to
+    `pgeocode.GeoDistance.query_postal_code`.
+    """
+    x_lat, x_lon = np.radians(lat1), np.radians(lon1)
+    y_lat, y_lon = np.radians(lat2), np.radians(lon2)
+
+    dlat = y_lat - x_lat
+    dlon = y_lon - x_lon
+
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(x_lat) * np.cos(y_lat) * np.sin(dlon / 2.0) ** 2
+    c = 2 * np.arcsin(np.sqrt(a))
+    return EARTH_RADIUS * c
+
+
+def normalize_postal_code(postal_code):
+    return str(postal_code).strip().upper() if postal_code is not None else ""
+
+
+class PostalCodeIndex:
+    def __init__(self, coordinates: dict):
+        self.coordinates_by_code = coordinates
+
+    @classmethod
+    def from_file(cls, path):
+        coordinates = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                coordinates[row["postal_code"]] = (float(row["latitude"]), float(row["longitude"]))
+        return cls(coordinates)
+
+    @classmethod
+    def from_pgeocode(cls, country="de"):
+        import pgeocode
+
+        frame = pgeocode.Nominatim(country)._data_frame
+        coordinates = {}
+        for postal_code, lat, lon in zip(frame["postal_code"], frame["latitude"], frame["longitude"]):
+            if isinstance(postal_code, str) and not (math.isnan(lat) or math.isnan(lon)):
+                coordinates[normalize_postal_code(postal_code)] = (float(lat), float(lon))
+        return cls(coordinates)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["postal_code", "latitude", "longitude"])
+            for postal_code, (lat, lon) in sorted(self.coordinates_by_code.items()):
+                writer.writerow([postal_code, repr(lat), repr(lon)])
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.coordinates_by_code)
+
+    def lookup(self, postal_code):
+        """
+        Returns (lat, lon) of a postal code, (nan, nan) if unknown
+        """
+        return self.coordinates_by_code.get(normalize_postal_code(postal_code), (math.nan, math.nan))
+
+    def coordinates(self, postal_codes):
+        """
+        Returns (lat, lon) arrays for a list of postal codes, NaN for unknown codes
+        """
+        coordinates = np.array([self.lookup(postal_code) for postal_code in postal_codes], dtype=np.float64)
+        coordinates = coordinates.reshape(-1, 2)
+        return coordinates[:, 0], coordinates[:, 1]
+
+    def distance(self, postal_code1, postal_code2):
+        """
+        Distance in km between two postal codes, NaN if any of them is unknown
+        """
+        lat1, lon1 = self.lookup(postal_code1)
+        lat2, lon2 = self.lookup(postal_code2)
+        return float(haversine_distance(lat1, lon1, lat2, lon2))
+
+    def distances(self, postal_code, postal_codes):
+        """
+        Distances in km from one postal code to each of `postal_codes`
+        """
+        lat, lon = self.lookup(postal_code)
+        lats, lons = self.coordinates(postal_codes)
+        return haversine_distance(lat, lon, lats, lons)
+
+    def distance_matrix(self, postal_codes1, postal_codes2):
+        """
+        Distances in km of shape (len(postal_codes1), len(postal_codes2))
+        """
+        lat1, lon1 = self.coordinates(postal_codes1)
+        lat2, lon2 = self.coordinates(postal_codes2)
+        return haversine_distance(lat1[:, None], lon1[:, None], lat2[None, :], lon2[None, :])
+
+
+_postal_code_index = None
+_postal_code_index_lock = threading.Lock()
+
+
+def load_postal_code_index(path=None):
+    path = path or settings.POSTAL_CODE_INDEX_FILE
+    if os.path.exists(path):
+        index = PostalCodeIndex.from_file(path)
+        if not len(index):
+            logger.warning("Postal code index %s is empty, distance scoring has no coordinates", path)
+        return index
+
+    logger.warning("Postal code index %s is missing, loading it from pgeocode", path)
+    try:
+        index = PostalCodeIndex.from_pgeocode("de")
+    except OSError:
+        logger.exception("Couldn't load postal codes from pgeocode, distance scoring has no coordinates")
+        return PostalCodeIndex({})
+
+    try:
+        index.save(path)
+    except OSError:
+        logger.exception("Couldn't write postal code index to %s", path)
+    return index
+
+
+def get_postal_code_index():
+    """
+    Returns the process wide postal code index, loading it on first use
+    """
+    global _postal_code_index
+    if _postal_code_index is None:
+        with _postal_code_index_lock:
+            if _postal_code_index is None:
+                _postal_code_index = load_postal_code_index()
+    return _postal_code_index
+
+
+def set_postal_code_index(index):
+    """
+    Replaces the process wide index, e.g.: with a small in memory index in tests
+    """
+    global _postal_code_index
+    _postal_code_index = index
@@ -0,0 +1,86 @@
+"""
+Helpers to stream large reports & exports or to write them to the file storage from a celery task.
+"""
+
+import csv
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.response import Response
+
+from management.utils import check_task_status
+
+EXPORT_DIRECTORY = "exports"
+
+# `kind` of the export task results, every download url only serves its own kind
+EXPORT_KIND_USERS = "users"
+EXPORT_KIND_COMPANY_REPORT = "company_report"
+
+
+class Echo:
+    """
+    File like object for `csv.writer`, returns the written line instead of storing it
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def text_lines(lines):
+    for line in lines:
+        yield line + "\n"
+
+
+def streaming_csv_response(rows, filename):
+    response = StreamingHttpResponse(csv_lines(rows), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_text_response(lines):
+    return StreamingHttpResponse(text_lines(lines), content_type="text/plain")
+
+
+def save_export(chunks, filename):
+    """
+    Writes the text `chunks` to the default storage, returns the storage path.
+    The chunks are spooled to a temporary file, so the export is never held in memory as a whole.
+    """
+    with tempfile.TemporaryFile() as file:
+        for chunk in chunks:
+            file.write(chunk.encode("utf-8"))
+        file.seek(0)
+        return default_storage.save(f"{EXPORT_DIRECTORY}/{timezone.now():%Y%m%d-%H%M%S}-{filename}", File(file))
+
+
+def export_task_result(path, filename, caller_id, kind):
+    """
+    Result of export tasks, so `export_download_response` can find the file and who may download it
+    """
+    return {"export_path": path, "filename": filename, "caller_id": caller_id, "kind": kind}
+
+
+def export_download_response(request, task_id, kind):
+    """
+    The exported file of a finished export task of `kind`, otherwise the task state.
+    Only the user that started the export can download it.
+    """
+    task_status = check_task_status(task_id)
+    info = task_status["info"]
+    if task_status["state"] != "SUCCESS":
+        return Response(task_status, status=500 if task_status["state"] == "FAILURE" else 202)
+    if not isinstance(info, dict) or not str(info.get("export_path", "")).startswith(f"{EXPORT_DIRECTORY}/"):
+        return Response({"msg": "Task is not an export"}, status=400)
+    if info.get("kind") != kind or info.get("caller_id") != request.user.pk:
+        return Response({"msg": "Export not found"}, status=404)
+
+    return FileResponse(default_storage.open(info["export_path"], "rb"), as_attachment=True, filename=info["filename"])
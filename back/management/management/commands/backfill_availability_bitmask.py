@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from management.models.profile import Profile
+from management.validators import availability_to_bitmask
+
+
+class Command(BaseCommand):
+    help = (
+        "Repairs `Profile.availability_bitmask` from the `availability` JSON, the migration fills it initially"
+        " ( use --check to only report mismatches )"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only check that the bitmasks match the availability JSON, don't write anything",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        check_only = options["check"]
+        batch_size = options["batch_size"]
+
+        total = Profile.objects.count()
+        outdated = []
+        c = 0
+        for profile in Profile.objects.only("id", "availability", "availability_bitmask").iterator(
+            chunk_size=batch_size
+        ):
+            c += 1
+            expected = availability_to_bitmask(profile.availability)
+            if profile.availability_bitmask != expected:
+                profile.availability_bitmask = expected
+                outdated.append(profile)
+
+            if not check_only and len(outdated) >= batch_size:
+                Profile.objects.bulk_update(outdated, ["availability_bitmask"])
+                print(f"Updated availability bitmasks {c}/{total}")
+                outdated = []
+
+        if check_only:
+            for profile in outdated:
+                print(f"Profile {profile.id} has an outdated availability bitmask")
+            if outdated:
+                raise CommandError(f"{len(outdated)}/{total} profiles have an outdated availability bitmask")
+            print(f"Availability bitmasks of all {total} profiles are consistent")
+            return
+
+        if outdated:
+            Profile.objects.bulk_update(outdated, ["availability_bitmask"])
+        print(f"Availability bitmasks of {total} profiles are up to date")
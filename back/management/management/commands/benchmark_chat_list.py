@@ -0,0 +1,32 @@
+from chat.benchmark import run_chat_list_benchmark
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = "Times the chat list endpoint for users with many chats, e.g.: --chats 50 200 500"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chats", type=int, nargs="+", default=[50, 200, 500])
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeats", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if settings.IS_PROD:
+            raise CommandError("Refusing to create synthetic users on production")
+
+        print(f"{'variant':<12}{'chats':>8}{'page size':>12}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}")
+        for amount in options["chats"]:
+            with transaction.atomic():
+                results = run_chat_list_benchmark(
+                    amount, page_size=options["page_size"], repeats=options["repeats"], seed=options["seed"]
+                )
+                transaction.set_rollback(True)
+
+            for res in results:
+                print(
+                    f"{res.name:<12}{res.chats:>8}{res.page_size:>12}{res.p50_ms:>10.2f}{res.p95_ms:>10.2f}"
+                    f"{res.queries:>10}"
+                )
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from management.scores_benchmark import delete_synthetic_population, run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Times the matching score pipeline on synthetic populations, e.g.: --sizes 100 1000 5000"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--sample-users", type=int, default=3, help="Users to run calculate_scores_user for")
+        parser.add_argument("--sample-pairs", type=int, default=200, help="Pairs to time every scoring function on")
+        parser.add_argument("--max-burst-pairs", type=int, default=2000, help="Pairs for the non vectorized burst")
+        parser.add_argument("--time-budget", type=float, default=10.0, help="Seconds for the max-weight matching")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic users instead of rolling back")
+        parser.add_argument("--delete", action="store_true", help="Only delete the synthetic users kept by --keep")
+
+    def handle(self, *args, **options):
+        if settings.IS_PROD:
+            raise CommandError("Refusing to create synthetic users on production")
+
+        if options["delete"]:
+            deleted, _ = delete_synthetic_population()
+            print(f"Deleted {deleted} synthetic objects")
+            return
+
+        for size in options["sizes"]:
+            with transaction.atomic():
+                results = run_benchmark(
+                    size,
+                    seed=options["seed"],
+                    sample_users=options["sample_users"],
+                    sample_pairs=options["sample_pairs"],
+                    max_burst_pairs=options["max_burst_pairs"],
+                    time_budget=options["time_budget"],
+                )
+                if not options["keep"]:
+                    transaction.set_rollback(True)
+
+            print(f"\n{size} users")
+            print(
+                f"{'step':<48}{'calls':>10}{'total s':>12}{'ms / call':>12}{'queries':>10}{'queries / call':>16}"
+                f"{'errors':>8}"
+            )
+            for res in results:
+                print(
+                    f"{res.name:<48}{res.calls:>10}{res.seconds:>12.3f}{res.ms_per_call:>12.3f}"
+                    f"{res.queries:>10}{res.queries_per_call:>16.2f}{res.errors:>8}"
+                )
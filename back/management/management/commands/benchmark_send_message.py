@@ -0,0 +1,24 @@
+from chat.benchmark import run_send_message_benchmark
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = "Times sending a chat message and its background step, e.g.: --repeats 50"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeats", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if settings.IS_PROD:
+            raise CommandError("Refusing to create synthetic users on production")
+
+        with transaction.atomic():
+            results = run_send_message_benchmark(repeats=options["repeats"], seed=options["seed"])
+            transaction.set_rollback(True)
+
+        print(f"{'variant':<24}{'messages':>10}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}")
+        for res in results:
+            print(f"{res.name:<24}{res.messages:>10}{res.p50_ms:>10.2f}{res.p95_ms:>10.2f}{res.queries:>10}")
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from management.helpers.postal_codes import PostalCodeIndex
+
+
+class Command(BaseCommand):
+    help = "Writes the postal code -> (lat, lon) table used for distance scoring from the pgeocode dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", type=str, default=settings.POSTAL_CODE_INDEX_FILE)
+
+    def handle(self, *args, **options):
+        index = PostalCodeIndex.from_pgeocode("de")
+        index.save(options["path"])
+        print(f"Wrote {len(index)} postal codes to {options['path']}")
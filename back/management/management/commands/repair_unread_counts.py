@@ -0,0 +1,22 @@
+from chat.models import ChatUnreadCount
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Recomputes the unread message counters of all chats ( use --dry-run to only print the differences )"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only print the counters that would change, don't write anything",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+
+        changes = ChatUnreadCount.repair(dry_run=dry_run, batch_size=options["batch_size"])
+        for (chat_id, user_id), (stored, actual) in changes.items():
+            print(f"Chat {chat_id}, user {user_id}: {stored} -> {actual}")
+        print(f"{'Would repair' if dry_run else 'Repaired'} {len(changes)} unread counters")
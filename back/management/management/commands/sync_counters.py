@@ -1,13 +1,26 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 
+from management.api.match_counters import SYNC_CHUNK_SIZE, sync_match_counters
 from management.models.matches import Match
 from management.models.profile import Profile
 from management.models.user import User
 
 
 class Command(BaseCommand):
+    help = "Syncs the message & video call counters of all matches ( use --dry-run to only print the differences )"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only print the counters that would change, don't write anything",
+        )
+        parser.add_argument("--chunk-size", type=int, default=SYNC_CHUNK_SIZE)
+
     def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+
         print("Re-activating Inactive-Support Matches")
         inactive_support_matches = Match.objects.filter(active=False, support_matching=True)
         c = 0
@@ -21,13 +34,11 @@ class Command(BaseCommand):
         #    match.save()
 
         print("Syncing Match Counters")
-        c = 0
         total = Match.objects.all().count()
-
-        for match in Match.objects.all():
-            c += 1
-            print(f"Syncing match {c}/{total}")
-            match.sync_counters()
+        changes = sync_match_counters(dry_run=dry_run, chunk_size=options["chunk_size"])
+        for match_id, diff in changes.items():
+            print(f"Match {match_id}: " + ", ".join(f"{field} {old} -> {new}" for field, (old, new) in diff.items()))
+        print(f"{'Would update' if dry_run else 'Updated'} the counters of {len(changes)}/{total} matches")
 
         print("Fixing mininum language level of volunteers beeing level-2")
 
@@ -47,6 +58,9 @@ class Command(BaseCommand):
 
         c = 0
         total = volunteers_impossible_lang_level.count()
+        if dry_run:
+            print(f"Would fix {total} volunteers")
+            return
         for vol in volunteers_impossible_lang_level:
             c += 1
             print(f"Fixing volunteer {c}/{total}")
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.3 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+from management.validators import availability_to_bitmask
+
+
+def populate_availability_bitmask(apps, schema_editor):
+    profile_model = apps.get_model('management', 'Profile')
+    outdated = []
+    for profile in profile_model.objects.only('id', 'availability').iterator(chunk_size=1000):
+        profile.availability_bitmask = availability_to_bitmask(profile.availability)
+        if profile.availability_bitmask:
+            outdated.append(profile)
+        if len(outdated) >= 1000:
+            profile_model.objects.bulk_update(outdated, ['availability_bitmask'])
+            outdated = []
+    profile_model.objects.bulk_update(outdated, ['availability_bitmask'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0120_alter_state_extra_user_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='availability_bitmask',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_availability_bitmask, reverse_code=migrations.RunPython.noop),
+    ]
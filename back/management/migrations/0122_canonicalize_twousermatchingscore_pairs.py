@@ -0,0 +1,36 @@
+# Generated by Django 5.0.3 on 2026-10-18 13:32
+
+from django.db import migrations
+
+
+def canonicalize_scores(apps, schema_editor):
+    # Scores should always have been stored as user1.id < user2.id, but the `__save__` hook never ran.
+    # Keep only the latest score per unordered pair and store it in the canonical order.
+    score_model = apps.get_model('management', 'TwoUserMatchingScore')
+    seen_pairs = set()
+    duplicate_ids = []
+    swapped = []
+    for score in score_model.objects.order_by('-latest_update', '-id').iterator():
+        pair = (min(score.user1_id, score.user2_id), max(score.user1_id, score.user2_id))
+        if pair in seen_pairs:
+            duplicate_ids.append(score.id)
+            continue
+        seen_pairs.add(pair)
+        if score.user1_id > score.user2_id:
+            score.user1_id, score.user2_id = pair
+            swapped.append(score)
+
+    for i in range(0, len(duplicate_ids), 1000):
+        score_model.objects.filter(id__in=duplicate_ids[i : i + 1000]).delete()
+    score_model.objects.bulk_update(swapped, ['user1', 'user2'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0121_profile_availability_bitmask'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_scores, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0122_canonicalize_twousermatchingscore_pairs'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='twousermatchingscore',
+            constraint=models.UniqueConstraint(fields=('user1', 'user2'), name='unique_two_user_matching_score'),
+        ),
+    ]
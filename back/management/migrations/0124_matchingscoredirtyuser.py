@@ -0,0 +1,23 @@
+# Generated by Django 5.0.3 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0123_twousermatchingscore_unique_pair'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchingScoreDirtyUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='matching_score_dirty', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0124_matchingscoredirtyuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BucketRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('USER', 'User'), ('MATCH', 'Match')], max_length=16)),
+                ('bucket', models.CharField(max_length=255)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('duration', models.FloatField(default=0.0)),
+                ('failed', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BucketMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('USER', 'User'), ('MATCH', 'Match')], max_length=16)),
+                ('bucket', models.CharField(max_length=255)),
+                ('object_id', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='bucket_membership_object')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bucketmembership',
+            constraint=models.UniqueConstraint(fields=('kind', 'bucket', 'object_id'), name='unique_bucket_membership'),
+        ),
+        migrations.AddConstraint(
+            model_name='bucketrefresh',
+            constraint=models.UniqueConstraint(fields=('kind', 'bucket'), name='unique_bucket_refresh'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0125_bucket_memberships'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticRollupRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_list', models.CharField(max_length=255, unique=True)),
+                ('rolled_up_until', models.DateField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('duration', models.FloatField(default=0.0)),
+                ('failed', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatisticRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('SIGNUPS', 'Signups'), ('VOLUNTEER_SIGNUPS', 'Volunteer Signups'), ('MESSAGES', 'Messages'), ('CALLS', 'Calls'), ('CALL_SECONDS', 'Call Seconds')], max_length=32)),
+                ('base_list', models.CharField(max_length=255)),
+                ('company', models.CharField(blank=True, default='', max_length=255)),
+                ('day', models.DateField()),
+                ('value', models.FloatField(default=0.0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['base_list', 'metric', 'day'], name='statistic_rollup_lookup')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statisticrollup',
+            constraint=models.UniqueConstraint(fields=('metric', 'base_list', 'company', 'day'), name='unique_statistic_rollup'),
+        ),
+    ]
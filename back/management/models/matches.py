@@ -1,10 +1,9 @@
 from uuid import uuid4
 
-from chat.models import Message
 from django.db import models
 from django.db.models import Q
+from django.dispatch import receiver
 from django.utils import timezone
-from video.models import LivekitSession
 
 from management.models import profile
 from management.models import user as user_model
@@ -47,42 +46,13 @@ class Match(models.Model):
     is_random_call_match = models.BooleanField(default=False)
 
     def sync_counters(self):
-        self.total_messages_counter = Message.objects.filter(
-            Q(sender=self.user1, recipient=self.user2) | Q(sender=self.user2, recipient=self.user1)
-        ).count()
-        self.total_mutal_video_calls_counter = LivekitSession.objects.filter(
-            Q(u1=self.user1, u2=self.user2) | Q(u1=self.user2, u2=self.user1), both_have_been_active=True
-        ).count()
-
-        newest_message = (
-            Message.objects.filter(
-                Q(sender=self.user1, recipient=self.user2) | Q(sender=self.user2, recipient=self.user1)
-            )
-            .order_by("-created")
-            .first()
-        )
-        newest_video_call = (
-            LivekitSession.objects.filter(
-                Q(u1=self.user1, u2=self.user2) | Q(u1=self.user2, u2=self.user1), both_have_been_active=True
-            )
-            .order_by("-created_at")
-            .first()
-        )
-
-        if newest_message and newest_video_call:
-            self.latest_interaction_at = max(newest_message.created, newest_video_call.created_at)
-
-        # also we have to check if a match is falsely confirmed=False
-        if self.total_messages_counter > 0 or self.total_mutal_video_calls_counter > 0:
-            self.confirmed = True
-
-        # check if the match should permanently be marked as completed!
-        from management.api.match_journey_filters import completed_match
-
-        if completed_match(Match.objects.filter(id=self.id)).exists():
-            self.completed = True
+        """
+        Re-computes the message & video call counters, see `management.api.match_counters`
+        """
+        from management.api.match_counters import SYNCED_FIELDS, sync_match_counters
 
-        self.save()
+        sync_match_counters(Match.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=[*SYNCED_FIELDS, "updated_at"])
 
     @classmethod
     def get_match(cls, user1, user2, random_call_match=False):
@@ -186,3 +156,11 @@ class Match(models.Model):
             match.save()
 
         return active_matches
+
+
+# the chat partners of the users are cached for the online / offline notifications
+@receiver([models.signals.post_save, models.signals.post_delete], sender=Match)
+def invalidate_presence_partners(sender, instance, **kwargs):
+    from chat.presence import invalidate_partners
+
+    invalidate_partners(instance.user1_id, instance.user2_id)
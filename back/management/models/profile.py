@@ -1,3 +1,4 @@
+import copy
 import os
 
 from back.utils import _double_uuid, get_options_serializer
@@ -14,6 +15,7 @@ from management.validators import (
     DAYS,
     SLOT_TRANS,
     SLOTS,
+    availability_to_bitmask,
     get_default_availability,
     model_validate_first_name,
     model_validate_second_name,
@@ -237,6 +239,12 @@ class Profile(models.Model):
         validators=[validate_availability],
     )  # type: ignore
 
+    """
+    The same time slots encoded as bitmask ( see `availability_to_bitmask` ), updated on every `save()`
+    this allows computing slot overlaps via `popcount(a & b)` without parsing the JSON
+    """
+    availability_bitmask = models.BigIntegerField(default=0)
+
     class LiabilityChoices(models.TextChoices):
         DECLINED = "declined", get_translation("profile.liability.declined")
         ACCEPTED = "accepted", get_translation("profile.liability.accepted")
@@ -604,6 +612,76 @@ class Profile(models.Model):
 
     push_notifications_enabled = models.BooleanField(default=False)
 
+    # Fields read by `management.api.scores.ScoringBase` or `get_users_to_consider`,
+    # changing one of them marks the user for `management.tasks.incremental_update_matching_scores`
+    SCORING_FIELDS = [
+        "user_type",
+        "lang_skill",
+        "min_lang_level_partner",
+        "availability",
+        "postal_code",
+        "gender",
+        "partner_gender",
+        "interests",
+        "speech_medium",
+        "target_group",
+        "target_groups",
+        "country_of_residence",
+    ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_scoring_fields()
+        return instance
+
+    def snapshot_scoring_fields(self, fields=None):
+        # copies, as e.g. `availability` or `lang_skill` are often changed in place
+        snapshot = getattr(self, "_scoring_fields_snapshot", {})
+        for field in fields or self.SCORING_FIELDS:
+            if field in self.__dict__:
+                snapshot[field] = copy.deepcopy(self.__dict__[field])
+        self._scoring_fields_snapshot = snapshot
+
+    def save(self, *args, **kwargs):
+        self.availability_bitmask = availability_to_bitmask(self.availability)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "availability" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "availability_bitmask"}
+
+        scoring_fields_changed = self.scoring_fields_changed(update_fields)
+
+        super().save(*args, **kwargs)
+        self.snapshot_scoring_fields(update_fields)
+
+        if scoring_fields_changed:
+            from management.models.scores import MatchingScoreDirtyUser
+
+            MatchingScoreDirtyUser.mark(self.user_id)
+
+    def scoring_fields_changed(self, update_fields=None):
+        if self.pk is None:
+            return False
+
+        fields = self.SCORING_FIELDS
+        if update_fields is not None:
+            fields = [field for field in fields if field in update_fields]
+            if not fields:
+                return False
+
+        # compared to the values loaded from the db, fields that weren't loaded ( `only()` ) count as changed
+        original = getattr(self, "_scoring_fields_snapshot", {})
+
+        def prep(field, value):
+            # e.g.: `MultiSelectField` loads lists but defaults to ''
+            return self._meta.get_field(field).get_prep_value(value)
+
+        return any(
+            field not in original or prep(field, original[field]) != prep(field, getattr(self, field))
+            for field in fields
+        )
+
     def add_profile_picture_from_local_path(self, path):
         print("Trying to add the pic", path)
         self.image.save(os.path.basename(path), File(open(path, "rb")))
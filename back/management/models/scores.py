@@ -14,12 +14,18 @@ class TwoUserMatchingScore(models.Model):
     scoring_results = models.JSONField(default=dict)
     latest_update = models.DateTimeField(auto_now=True)
 
-    def __save__(self, *args, **kwargs):
-        if self.user1.id > self.user2.id:
+    class Meta:
+        constraints = [
+            # Scores are always stored with `user1.id < user2.id`, see `save()` and `TwoUserMatchingScoreWriter`
+            models.UniqueConstraint(fields=["user1", "user2"], name="unique_two_user_matching_score"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.user1_id > self.user2_id:
             self.user1, self.user2 = self.user2, self.user1
 
         self.latest_update = timezone.now()
-        super().__save__(*args, **kwargs)
+        super().save(*args, **kwargs)
 
     @classmethod
     def get_score(cls, user1, user2):
@@ -35,10 +41,7 @@ class TwoUserMatchingScore(models.Model):
         if user1.id > user2.id:
             user1, user2 = user2, user1
 
-        score = cls.objects.filter(user1=user1, user2=user2)
-        if score.exists():
-            return score.first()
-        score = cls.objects.create(user1=user1, user2=user2)
+        score, _ = cls.objects.get_or_create(user1=user1, user2=user2)
         return score
 
     @classmethod
@@ -48,7 +51,81 @@ class TwoUserMatchingScore(models.Model):
         return cls.objects.filter(Q(user1=user) | Q(user2=user))
 
     @classmethod
-    def delete_if_exists(user1, user2):
+    def delete_if_exists(cls, user1, user2):
         if user1.id > user2.id:
             user1, user2 = user2, user1
-        TwoUserMatchingScore.objects.filter(user1=user1, user2=user2).delete()
+        cls.objects.filter(user1=user1, user2=user2).delete()
+
+
+class TwoUserMatchingScoreWriter:
+    """
+    Collects matching scores in memory and upserts them with one `bulk_create(update_conflicts=True)` per chunk.
+    Use as context manager, remaining scores are written when the block exits:
+
+        with TwoUserMatchingScoreWriter(chunk_size=500) as writer:
+            for user1, user2 in pairs:
+                writer.add(user1.id, user2.id, *ScoringBase(user1, user2).calculate_score())
+    """
+
+    UPDATE_FIELDS = ["score", "matchable", "scoring_results", "latest_update"]
+
+    def __init__(self, chunk_size=500):
+        self.chunk_size = chunk_size
+        self.pending = {}
+        self.written = 0
+
+    def add(self, user1_id, user2_id, score, matchable, scoring_results):
+        if user1_id > user2_id:
+            user1_id, user2_id = user2_id, user1_id
+
+        # a pair added twice within one chunk would conflict with itself, the latest result wins
+        self.pending[(user1_id, user2_id)] = TwoUserMatchingScore(
+            user1_id=user1_id,
+            user2_id=user2_id,
+            score=score,
+            matchable=matchable,
+            scoring_results=scoring_results,
+            latest_update=timezone.now(),
+        )
+
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        TwoUserMatchingScore.objects.bulk_create(
+            list(self.pending.values()),
+            update_conflicts=True,
+            unique_fields=["user1", "user2"],
+            update_fields=self.UPDATE_FIELDS,
+        )
+        self.written += len(self.pending)
+        self.pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+
+class MatchingScoreDirtyUser(models.Model):
+    """
+    Users whose scoring relevant `Profile` / `State` fields changed since their scores were last calculated.
+    Marked from `Profile.save()` and `State.save()`, consumed by `management.tasks.incremental_update_matching_scores`.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="matching_score_dirty")
+    marked_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def mark(cls, *user_ids):
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, marked_at=timezone.now()) for user_id in user_ids],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["marked_at"],
+        )
@@ -229,15 +229,38 @@ class State(models.Model):
 
     to_low_german_level = models.BooleanField(default=False)
 
+    # Fields filtered on by `management.api.scores.get_users_to_consider`,
+    # changing one of them marks the user for `management.tasks.incremental_update_matching_scores`
+    SCORING_FIELDS = [
+        "searching_state",
+        "user_form_state",
+        "had_prematching_call",
+        "email_authenticated",
+        "user_category",
+    ]
+
     def save(self, *args, **kwargs):
+        scoring_fields_changed = False
         # Check if searching_state has changed
         if self.pk:  # Only for existing instances
             original = State.objects.get(pk=self.pk)
             if original.searching_state != self.searching_state:
                 self.searching_state_last_updated = timezone.now()
 
+            update_fields = kwargs.get("update_fields")
+            scoring_fields_changed = any(
+                getattr(original, field) != getattr(self, field)
+                for field in self.SCORING_FIELDS
+                if update_fields is None or field in update_fields
+            )
+
         super().save(*args, **kwargs)
 
+        if scoring_fields_changed:
+            from management.models.scores import MatchingScoreDirtyUser
+
+            MatchingScoreDirtyUser.mark(self.user_id)
+
     def has_extra_user_permission(self, permission):
         if self.extra_user_permissions is None:
             return False
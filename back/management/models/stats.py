@@ -16,3 +16,93 @@ class Statistic(models.Model):
         MATCH_BUCKET_IDS = "MATCH_BUCKET_IDS"
 
     kind = models.CharField(max_length=255, choices=StatisticTypes.choices, default=StatisticTypes.USER_BUCKET_IDS)
+
+
+class BucketMembership(models.Model):
+    """
+    One row per user / match that is part of a filter list bucket.
+    Refreshed by `management.tasks.refresh_bucket_memberships`, see `management.api.bucket_memberships`.
+    """
+
+    class Kind(models.TextChoices):
+        USER = "USER"
+        MATCH = "MATCH"
+
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    bucket = models.CharField(max_length=255)
+    object_id = models.BigIntegerField()  # `User.id` or `Match.id` depending on `kind`
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "bucket", "object_id"], name="unique_bucket_membership"),
+        ]
+        indexes = [
+            models.Index(fields=["kind", "object_id"], name="bucket_membership_object"),
+        ]
+
+
+class BucketRefresh(models.Model):
+    """
+    When the members of a bucket were last refreshed successfully
+    """
+
+    kind = models.CharField(max_length=16, choices=BucketMembership.Kind.choices)
+    bucket = models.CharField(max_length=255)
+
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    count = models.IntegerField(default=0)
+    duration = models.FloatField(default=0.0)  # seconds
+
+    # the last refresh failed, the members are from `refreshed_at`
+    failed = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "bucket"], name="unique_bucket_refresh"),
+        ]
+
+
+class StatisticRollup(models.Model):
+    """
+    Daily totals of one metric for the users of a filter list, see `management.api.statistic_rollups`.
+    Days without any events have no row.
+    """
+
+    class Metric(models.TextChoices):
+        SIGNUPS = "SIGNUPS"
+        VOLUNTEER_SIGNUPS = "VOLUNTEER_SIGNUPS"
+        MESSAGES = "MESSAGES"
+        CALLS = "CALLS"
+        CALL_SECONDS = "CALL_SECONDS"
+
+    metric = models.CharField(max_length=32, choices=Metric.choices)
+    base_list = models.CharField(max_length=255)
+    # `State.company` of the user, for messages & calls the company both users share, "" for none
+    company = models.CharField(max_length=255, blank=True, default="")
+    day = models.DateField()
+
+    value = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["metric", "base_list", "company", "day"], name="unique_statistic_rollup"),
+        ]
+        indexes = [
+            models.Index(fields=["base_list", "metric", "day"], name="statistic_rollup_lookup"),
+        ]
+
+
+class StatisticRollupRefresh(models.Model):
+    """
+    Up to which day the rollups of a filter list are complete
+    """
+
+    base_list = models.CharField(max_length=255, unique=True)
+
+    rolled_up_until = models.DateField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(default=0.0)  # seconds
+
+    failed = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default="")
@@ -203,10 +203,15 @@ class ProposedMatch(models.Model):
 # We automaticly send the new-match proposal mail when a new proposal is created
 @receiver(models.signals.post_save, sender=ProposedMatch)
 def execute_after_save(sender, instance, created, *args, **kwargs):
+    from management.models.scores import MatchingScoreDirtyUser
+
     if created:
         # Send the new match proposal email
         instance.send_initial_mail()
 
+    # Open proposals remove both users from the scoring pool, closed ones put them back
+    MatchingScoreDirtyUser.mark(instance.user1_id, instance.user2_id)
+
 
 def get_unconfirmed_matches(user):
     # First check if the user is 'volunteer' cause we only allow learners to confirm matches, otherwise return empty list
@@ -1,4 +1,4 @@
-from chat.models import Chat, ChatSerializer, Message, MessageSerializer
+from chat.models import Chat, ChatSerializer, ChatUnreadCount, Message, MessageSerializer
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
@@ -47,6 +47,12 @@ class UserManager(BaseUserManager):
         settings.Settings.objects.create(user=user)
         return user
 
+    def with_related(self, *names):
+        """
+        Users with `state`, `profile` & `settings` ( or only `names` ) loaded in the same query
+        """
+        return self.get_queryset().select_related(*(names or ["state", "profile", "settings"]))
+
     def create_user(self, email, password, **kwargs):
         kwargs["is_staff"] = False
         kwargs["is_superuser"] = False
@@ -82,23 +88,10 @@ class User(AbstractUser):
         super().__init__(*args, **kwargs)
         self.__original_username = self.username
 
-    @property
-    def state(self):
-        from . import state
-
-        return state.State.objects.get(user=self)
-
-    @property
-    def profile(self):
-        from . import profile
-
-        return profile.Profile.objects.get(user=self)
-
-    @property
-    def settings(self):
-        from . import settings
-
-        return settings.Settings.objects.get(user=self)
+    """
+    `user.state`, `user.profile` & `user.settings` are the reverse one-to-one relations of `State`, `Profile` & `Settings`.
+    They are cached on the instance after the first access and can be joined with `User.objects.with_related()`.
+    """
 
     # Not only having but also displaying the full hashes is not necessary
     def _abr_hash(self):
@@ -245,6 +238,8 @@ class User(AbstractUser):
             text=msg,
             parsable_message=parsable_message,
         )
+        if not auto_mark_read:
+            ChatUnreadCount.increment(chat, self)
 
         serialized_message = MessageSerializer(message).data
 
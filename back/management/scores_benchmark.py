@@ -0,0 +1,260 @@
+"""
+Benchmarks for the matching score pipeline on synthetic populations.
+
+`create_synthetic_population` bulk creates learners & volunteers that are all part of the scoring pool
+( `management.api.scores.get_users_to_consider` ) with randomized availability, language levels, postal codes, interests ...
+`run_benchmark` then measures wall time and query count of:
+- every single scoring function of `ScoringBase` on a sample of pairs
+- `calculate_scores_user` for a sample of users
+- `burst_calculate_matching_scores` on a sample of combinations and `burst_calculate_matching_scores_vectorized` on all users
+- the max-weight assignment in `management.api.scores_matching`
+
+Used by `manage.py benchmark_matching_scores`, see there for running it at different population sizes.
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from django.db import connection
+
+from management.helpers.query_logger import QueryLogger
+from management.models.profile import Profile
+from management.models.settings import Settings
+from management.models.state import State
+from management.models.user import User
+from management.validators import DAYS, SLOTS, availability_to_bitmask
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_EMAIL_DOMAIN = "benchmark.little-world.com"
+
+# Most people are only available in the evenings and on weekends
+SLOT_WEIGHTS = {"08_10": 0.5, "10_12": 0.6, "12_14": 0.6, "14_16": 0.7, "16_18": 1.0, "18_20": 1.6, "20_22": 1.3}
+DAY_WEIGHTS = {"mo": 1.0, "tu": 1.0, "we": 1.0, "th": 1.0, "fr": 0.8, "sa": 1.4, "su": 1.4}
+
+FALLBACK_POSTAL_CODES = ["10115", "20095", "50667", "60311", "70173", "80331", "01067", "04109", "30159", "90402"]
+
+
+@dataclass
+class BenchmarkTiming:
+    name: str
+    seconds: float
+    queries: int
+    calls: int
+    errors: int = 0
+
+    @property
+    def ms_per_call(self):
+        return 1000 * self.seconds / max(self.calls, 1)
+
+    @property
+    def queries_per_call(self):
+        return self.queries / max(self.calls, 1)
+
+    def dict(self):
+        return {**asdict(self), "ms_per_call": self.ms_per_call, "queries_per_call": self.queries_per_call}
+
+
+@contextmanager
+def measure(name, results, calls=1):
+    """
+    Appends a `BenchmarkTiming` to `results` for the wrapped block,
+    `calls` is the amount of pairs / users processed so per call values can be compared between population sizes.
+    """
+    query_logger = QueryLogger()
+    start = time.monotonic()
+    with connection.execute_wrapper(query_logger):
+        yield
+    results.append(BenchmarkTiming(name, time.monotonic() - start, len(query_logger.queries), calls))
+
+
+def random_availability(rand: random.Random):
+    activity = rand.uniform(0.05, 0.35)
+    return {
+        day: [slot for slot in SLOTS if rand.random() < activity * DAY_WEIGHTS[day] * SLOT_WEIGHTS[slot]]
+        for day in DAYS
+    }
+
+
+def random_profile_fields(rand: random.Random, user_type, postal_codes):
+    if user_type == Profile.TypeChoices.VOLUNTEER:
+        german_level = Profile.LanguageSkillChoices.LEVEL_3
+    else:
+        german_level = rand.choices(Profile.LanguageSkillChoices.values[:4], weights=[3, 4, 2, 1])[0]
+
+    gender = rand.choice(Profile.GenderChoices.values)
+    availability = random_availability(rand)
+    return {
+        "user_type": user_type,
+        "availability": availability,
+        "availability_bitmask": availability_to_bitmask(availability),
+        "lang_skill": [{"lang": Profile.LanguageChoices.GERMAN, "level": german_level}],
+        "min_lang_level_partner": rand.choice(Profile.MinLangLevelPartnerChoices.values),
+        "gender": gender,
+        "partner_gender": rand.choices([Profile.PartnerGenderChoices.ANY, gender], weights=[4, 1])[0],
+        "interests": rand.sample(Profile.InterestChoices.values, rand.randint(0, 6)),
+        "target_group": rand.choice(Profile.TargetGroupChoices2.values),
+        "target_groups": rand.sample(Profile.TargetGroupChoices2.values, rand.randint(0, 2)),
+        "postal_code": rand.choice(postal_codes),
+        "country_of_residence": "DE",
+    }
+
+
+def create_synthetic_population(amount, seed=42, batch_size=1000):
+    """
+    Bulk creates `amount` users, half learners half volunteers, that are all in the scoring pool.
+    The rows are created with `bulk_create`, so no emails, question decks or other signals are triggered.
+    Returns the user ids.
+    """
+    from management.helpers.postal_codes import get_postal_code_index
+
+    rand = random.Random(seed)
+    # the index is empty without a local postal code file when pgeocode can't download
+    postal_codes = list(get_postal_code_index().coordinates_by_code.keys()) or FALLBACK_POSTAL_CODES
+    # sampling from the whole country would give almost no close by users, real users cluster in cities
+    postal_codes = rand.sample(postal_codes, min(len(postal_codes), 200))
+
+    offset = User.objects.filter(email__endswith=f"@{SYNTHETIC_EMAIL_DOMAIN}").count()
+    users = User.objects.bulk_create(
+        [
+            User(
+                email=f"user{offset + i}@{SYNTHETIC_EMAIL_DOMAIN}",
+                username=f"user{offset + i}@{SYNTHETIC_EMAIL_DOMAIN}",
+                first_name=f"Benchmark{offset + i}",
+                last_name="User",
+            )
+            for i in range(amount)
+        ],
+        batch_size=batch_size,
+    )
+    if any(usr.pk is None for usr in users):
+        # backends that don't return primary keys from bulk inserts
+        users = list(User.objects.filter(email__in=[usr.email for usr in users]).order_by("email"))
+
+    user_types = [Profile.TypeChoices.LEARNER, Profile.TypeChoices.VOLUNTEER]
+    Profile.objects.bulk_create(
+        [
+            Profile(
+                user=usr,
+                first_name=usr.first_name,
+                second_name=usr.last_name,
+                **random_profile_fields(rand, user_types[i % 2], postal_codes),
+            )
+            for i, usr in enumerate(users)
+        ],
+        batch_size=batch_size,
+    )
+    State.objects.bulk_create(
+        [
+            State(
+                user=usr,
+                searching_state=State.SearchingStateChoices.SEARCHING,
+                user_form_state=State.UserFormStateChoices.FILLED,
+                had_prematching_call=True,
+                email_authenticated=True,
+            )
+            for usr in users
+        ],
+        batch_size=batch_size,
+    )
+    Settings.objects.bulk_create([Settings(user=usr) for usr in users], batch_size=batch_size)
+
+    return [usr.pk for usr in users]
+
+
+def delete_synthetic_population():
+    return User.objects.filter(email__endswith=f"@{SYNTHETIC_EMAIL_DOMAIN}").delete()
+
+
+@contextmanager
+def eager_celery_tasks():
+    from back.celery import app
+
+    always_eager = app.conf.task_always_eager
+    app.conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        app.conf.task_always_eager = always_eager
+
+
+def benchmark_scoring_functions(user_ids, sample_pairs=200, seed=42):
+    from management.api.scores import PairRelationshipIndex, ScoringBase
+
+    rand = random.Random(seed)
+    users = User.objects.with_related("profile").in_bulk(user_ids)
+    relationships = PairRelationshipIndex(user_ids)
+    pairs = [tuple(rand.sample(user_ids, 2)) for _ in range(sample_pairs)]
+
+    scorings = [ScoringBase(users[user1], users[user2], relationships=relationships) for user1, user2 in pairs]
+
+    results = []
+    for function_name in ScoringBase(None, None).scoring_fuctions:
+        errors = 0
+        with measure(f"score__{function_name}", results, calls=len(pairs)):
+            for scoring in scorings:
+                try:
+                    scoring.scoring_fuctions[function_name]()
+                except Exception:
+                    # counted as unmatchable by `calculate_score`, the time still counts
+                    if not errors:
+                        logger.exception("score__%s failed", function_name)
+                    errors += 1
+        results[-1].errors = errors
+    return results
+
+
+def random_pairs(user_ids, amount, rand):
+    """
+    `amount` distinct unordered pairs of `user_ids`, without building all pairs first
+    """
+    amount = min(amount, len(user_ids) * (len(user_ids) - 1) // 2)
+    pairs = []
+    seen = set()
+    while len(pairs) < amount:
+        pair = tuple(rand.sample(user_ids, 2))
+        if frozenset(pair) not in seen:
+            seen.add(frozenset(pair))
+            pairs.append(pair)
+    return pairs
+
+
+def run_benchmark(size, seed=42, sample_users=3, sample_pairs=200, max_burst_pairs=2000, time_budget=10.0):
+    """
+    Creates a population of `size` users and measures the full pipeline on it.
+    Doesn't clean up, wrap in a rolled back transaction or call `delete_synthetic_population` ( `--delete` ).
+    """
+    from management.api.scores import calculate_scores_user
+    from management.api.scores_matching import solve_score_maximization
+    from management.tasks import burst_calculate_matching_scores, burst_calculate_matching_scores_vectorized
+
+    rand = random.Random(seed)
+    results = []
+
+    with measure("create_synthetic_population", results, calls=size):
+        user_ids = create_synthetic_population(size, seed=seed)
+
+    results += benchmark_scoring_functions(user_ids, sample_pairs=sample_pairs, seed=seed)
+
+    pool_size = size - 1
+    for user_id in rand.sample(user_ids, min(sample_users, size)):
+        with measure("calculate_scores_user", results, calls=pool_size):
+            calculate_scores_user(user_id, report=lambda data: None)
+
+    combinations = random_pairs(user_ids, max_burst_pairs, rand)
+
+    with eager_celery_tasks():
+        with measure("burst_calculate_matching_scores", results, calls=len(combinations)):
+            burst_calculate_matching_scores.apply(args=(combinations,))
+
+        learner_volunteer_pairs = (size // 2) * (size - size // 2)
+        with measure("burst_calculate_matching_scores_vectorized", results, calls=learner_volunteer_pairs):
+            burst_calculate_matching_scores_vectorized.apply(args=(user_ids,))
+
+    with measure("solve_score_maximization", results, calls=learner_volunteer_pairs):
+        solve_score_maximization(time_budget=time_budget)
+
+    return results
@@ -310,7 +310,7 @@ def request_streamed_ai_response(messages, model="gpt-3.5-turbo", backend="defau
 
 
 @shared_task
-def matching_algo_v2(user_pk, consider_only_registered_within_last_x_days=None, exlude_user_ids=[]):
+def matching_algo_v2(user_pk, consider_only_registered_within_last_x_days=None, exlude_user_ids=None, top_k=None):
     from management.api.scores import calculate_scores_user
 
     def report_progress(progress):
@@ -320,22 +320,30 @@ def matching_algo_v2(user_pk, consider_only_registered_within_last_x_days=None,
         user_pk,
         consider_only_registered_within_last_x_days=consider_only_registered_within_last_x_days,
         report=report_progress,
-        exlude_user_ids=exlude_user_ids,
+        exlude_user_ids=exlude_user_ids or [],
+        top_k=top_k,
     )
 
     return res
 
 
 @shared_task
-def burst_calculate_matching_scores(user_combinations=[]):
-    from management.api.scores import score_between_db_update
+def burst_calculate_matching_scores(user_combinations=None, write_chunk_size=500, profile_scoring=False):
+    from management.api.scores import PairRelationshipIndex, ScoringBase, ScoringProfiler
+    from management.models.scores import TwoUserMatchingScoreWriter
 
     """
     Calculates the matching scores for all users requiring a match at the moment 
+    With `profile_scoring` the progress contains time & queries per scoring function
     """
     print("combination")
 
+    user_combinations = user_combinations or []
+    profiler = ScoringProfiler() if profile_scoring else None
+
     def report_progress(progress):
+        if profiler:
+            progress["scoring_profile"] = profiler.dict()
         burst_calculate_matching_scores.backend.mark_as_started(
             burst_calculate_matching_scores.request.id, progress=progress
         )
@@ -350,18 +358,24 @@ def burst_calculate_matching_scores(user_combinations=[]):
         }
     )
 
-    for comb in user_combinations:
-        user1 = User.objects.get(pk=comb[0])
-        user2 = User.objects.get(pk=comb[1])
-        score_between_db_update(user1, user2)
-        combinations_processed += 1
-
-        report_progress(
-            {
-                "total_combinations": total_combinations,
-                "combinations_processed": combinations_processed,
-            }
-        )
+    user_ids = {user_id for comb in user_combinations for user_id in comb}
+    users = User.objects.with_related("profile").in_bulk(user_ids)
+    relationships = PairRelationshipIndex(user_ids)
+
+    with TwoUserMatchingScoreWriter(chunk_size=write_chunk_size) as writer:
+        for comb in user_combinations:
+            user1 = users[comb[0]]
+            user2 = users[comb[1]]
+            scoring = ScoringBase(user1, user2, relationships=relationships, profiler=profiler)
+            writer.add(user1.pk, user2.pk, *scoring.calculate_score())
+            combinations_processed += 1
+
+            report_progress(
+                {
+                    "total_combinations": total_combinations,
+                    "combinations_processed": combinations_processed,
+                }
+            )
 
     random_delay = math.floor(random.random() * 5)
 
@@ -372,6 +386,132 @@ def burst_calculate_matching_scores(user_combinations=[]):
     return {
         "total_combinations": total_combinations,
         "combinations_processed": combinations_processed,
+        **({"scoring_profile": profiler.dict()} if profiler else {}),
+    }
+
+
+@shared_task
+def burst_calculate_matching_scores_vectorized(user_ids=None, chunk_size=2000, profile_scoring=False):
+    """
+    Same as `burst_calculate_matching_scores` but scores all learner / volunteer pairs of `user_ids` at once
+    using `management.api.scores_batch`, then writes them in chunks.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+
+    from management.api.scores import ScoringProfiler
+    from management.api.scores_batch import BatchScoringEngine
+    from management.models.scores import TwoUserMatchingScore, TwoUserMatchingScoreWriter
+
+    user_ids = user_ids or []
+    profiler = ScoringProfiler() if profile_scoring else None
+
+    def report_progress(progress):
+        if profiler:
+            progress["scoring_profile"] = profiler.dict()
+        burst_calculate_matching_scores_vectorized.backend.mark_as_started(
+            burst_calculate_matching_scores_vectorized.request.id, progress=progress
+        )
+
+    result = BatchScoringEngine(user_ids, profiler=profiler).calculate()
+
+    total_combinations = result.score.size
+    combinations_processed = 0
+
+    report_progress(
+        {
+            "total_combinations": total_combinations,
+            "combinations_processed": combinations_processed,
+        }
+    )
+
+    with transaction.atomic():
+        # also drops stale learner + learner / volunteer + volunteer scores, these are not part of the matrix
+        TwoUserMatchingScore.objects.filter(Q(user1_id__in=user_ids) & Q(user2_id__in=user_ids)).delete()
+
+        with TwoUserMatchingScoreWriter(chunk_size=chunk_size) as writer:
+            for chunk in result.iter_pairs(chunk_size=chunk_size):
+                for learner_id, volunteer_id, score, matchable, scoring_results in chunk:
+                    writer.add(learner_id, volunteer_id, score, matchable, scoring_results)
+                combinations_processed += len(chunk)
+
+                report_progress(
+                    {
+                        "total_combinations": total_combinations,
+                        "combinations_processed": combinations_processed,
+                    }
+                )
+
+    random_delay = math.floor(random.random() * 5)
+
+    mark_burst_task_completed_check_for_finish.apply_async(
+        (burst_calculate_matching_scores_vectorized.request.id,), countdown=2 + random_delay
+    )
+
+    return {
+        "total_combinations": total_combinations,
+        "combinations_processed": combinations_processed,
+        **({"scoring_profile": profiler.dict()} if profiler else {}),
+    }
+
+
+@shared_task
+def incremental_update_matching_scores(write_chunk_size=500):
+    """
+    Periodic alternative to a full burst: rescores only the users marked in `MatchingScoreDirtyUser`
+    against the current candidate pool and drops the scores of marked users that left the pool.
+    Skipped while a burst calculation runs, the marked users are then picked up by the next run.
+    """
+    from django.db.models import Q
+    from django.utils import timezone
+
+    from management.api.scores import PairRelationshipIndex, ScoringBase, get_users_to_consider
+    from management.models.scores import MatchingScoreDirtyUser, TwoUserMatchingScore, TwoUserMatchingScoreWriter
+
+    if BackendState.objects.filter(slug=BackendState.BackendStateEnum.updating_matching_scores).exists():
+        return {"state": "skipped"}
+
+    started_at = timezone.now()
+    dirty_user_ids = set(
+        MatchingScoreDirtyUser.objects.filter(marked_at__lte=started_at).values_list("user_id", flat=True)
+    )
+
+    if not dirty_user_ids:
+        return {"state": "finished", "dirty_users": 0, "scores_cleaned": 0, "scores_updated": 0}
+
+    pool_ids = set(get_users_to_consider().values_list("pk", flat=True))
+    left_pool_ids = dirty_user_ids - pool_ids
+    rescore_ids = dirty_user_ids & pool_ids
+
+    scores_cleaned, _ = TwoUserMatchingScore.objects.filter(
+        Q(user1_id__in=left_pool_ids) | Q(user2_id__in=left_pool_ids)
+    ).delete()
+
+    users = User.objects.with_related("profile").in_bulk(pool_ids)
+    relationships = PairRelationshipIndex(pool_ids)
+
+    scored_pairs = set()
+    with TwoUserMatchingScoreWriter(chunk_size=write_chunk_size) as writer:
+        for user_id in rescore_ids:
+            for other_id in pool_ids:
+                pair = PairRelationshipIndex.pair(user_id, other_id)
+                if user_id == other_id or pair in scored_pairs:
+                    continue
+                scored_pairs.add(pair)
+
+                user1, user2 = users[user_id], users[other_id]
+                writer.add(
+                    user1.pk, user2.pk, *ScoringBase(user1, user2, relationships=relationships).calculate_score()
+                )
+
+    # Users marked again while this task ran stay dirty for the next run
+    MatchingScoreDirtyUser.objects.filter(user_id__in=dirty_user_ids, marked_at__lte=started_at).delete()
+
+    return {
+        "state": "finished",
+        "dirty_users": len(dirty_user_ids),
+        "scores_cleaned": scores_cleaned,
+        "scores_updated": writer.written,
     }
 
 
@@ -405,33 +545,110 @@ def mark_burst_task_completed_check_for_finish(task_id=None):
 
 
 @shared_task
-def record_bucket_ids():
-    from management.api.match_journey_filter_list import MATCH_JOURNEY_FILTERS
-    from management.api.user_advanced_filter_lists import FILTER_LISTS
-    from management.models.stats import Statistic
-
-    # 1 - record all user bucket ids
-    data = {}
-    for fl in FILTER_LISTS:
-        try:
-            qs = fl.queryset()
-            data[fl.name] = list(qs.values_list("id", flat=True))
-        except Exception:
-            # the id -500 indicates a filter error!
-            data[fl.name] = str(-500)
+def refresh_bucket_memberships(kinds=None):
+    """
+    Re-evaluates the user & match filter lists and stores the members in `BucketMembership`
+    """
+    from management.api.bucket_memberships import refresh_bucket_memberships
+
+    return refresh_bucket_memberships(kinds=kinds)
+
+
+@shared_task
+def sync_match_counters():
+    """
+    Re-computes the message & video call counters of all matches, see `management.api.match_counters`
+    """
+    from management.api.match_counters import sync_match_counters
+
+    return len(sync_match_counters())
+
+
+@shared_task
+def update_statistic_rollups(base_lists=None, rebuild=False):
+    """
+    Rolls up the signup, message & call statistics of the last days, see `management.api.statistic_rollups`
+    """
+    from management.api.statistic_rollups import update_statistic_rollups
+
+    return update_statistic_rollups(base_lists=base_lists, rebuild=rebuild)
+
+
+@shared_task
+def export_company_report(company, file_format="csv", caller_id=None):
+    """
+    Writes the video call & matching report of `company` to the file storage, only `caller_id` can download it
+    """
+    from django.utils.text import slugify
+
+    from management.api.company_report import CompanyReport
+    from management.helpers.report_export import (
+        EXPORT_KIND_COMPANY_REPORT,
+        csv_lines,
+        export_task_result,
+        save_export,
+        text_lines,
+    )
+
+    report = CompanyReport(company)
+    if file_format == "text":
+        filename = f"company_report_{slugify(company)}.txt"
+        path = save_export(text_lines(report.lines()), filename)
+    else:
+        filename = f"company_report_{slugify(company)}.csv"
+        path = save_export(csv_lines(report.csv_rows()), filename)
+    return export_task_result(path, filename, caller_id, EXPORT_KIND_COMPANY_REPORT)
 
-    Statistic.objects.create(kind=Statistic.StatisticTypes.USER_BUCKET_IDS, data=data)
 
-    # 2 - record all match bucket ids
-    data = {}
-    for fl in MATCH_JOURNEY_FILTERS:
-        try:
-            qs = fl.queryset()
-            data[fl.name] = list(qs.values_list("id", flat=True))
-        except Exception:
+@shared_task
+def export_users(caller_id, params, columns, export_format="csv"):
+    """
+    Writes the matching panel user export to the file storage, `params` are the `UserFilter` query params
+    """
+    from management.api.user_export import export_csv_rows, export_json_chunks, get_export_queryset
+    from management.helpers.report_export import EXPORT_KIND_USERS, csv_lines, export_task_result, save_export
+
+    users = get_export_queryset(User.objects.get(pk=caller_id), params)
+    if export_format == "json":
+        filename = "users.json"
+        path = save_export(export_json_chunks(users, columns), filename)
+    else:
+        filename = "users.csv"
+        path = save_export(csv_lines(export_csv_rows(users, columns)), filename)
+    return export_task_result(path, filename, caller_id, EXPORT_KIND_USERS)
+
+
+@shared_task
+def record_bucket_ids():
+    from management.api.bucket_memberships import get_filter_lists
+    from management.api.bucket_memberships import refresh_bucket_memberships as refresh
+    from management.models.stats import BucketMembership, BucketRefresh, Statistic
+
+    refresh()
+
+    for kind, statistic_kind in [
+        (BucketMembership.Kind.USER, Statistic.StatisticTypes.USER_BUCKET_IDS),
+        (BucketMembership.Kind.MATCH, Statistic.StatisticTypes.MATCH_BUCKET_IDS),
+    ]:
+        refreshed = set(
+            BucketRefresh.objects.filter(kind=kind, failed=False, refreshed_at__isnull=False).values_list(
+                "bucket", flat=True
+            )
+        )
+        data = {}
+        for fl in get_filter_lists(kind):
+            # the id -500 indicates a filter error!
             data[fl.name] = str(-500)
+            if fl.name in refreshed:
+                data[fl.name] = []
+        for bucket, object_id in (
+            BucketMembership.objects.filter(kind=kind, bucket__in=refreshed)
+            .order_by("bucket", "object_id")
+            .values_list("bucket", "object_id")
+        ):
+            data[bucket].append(object_id)
 
-    Statistic.objects.create(kind=Statistic.StatisticTypes.MATCH_BUCKET_IDS, data=data)
+        Statistic.objects.create(kind=statistic_kind, data=data)
 
 
 @shared_task
@@ -486,12 +703,13 @@ def send_email_background(
     user_id=None,
     match_id=None,
     proposed_match_id=None,
-    context={},
+    context=None,
     patenmatch=False,
     patenmatch_org=False,
 ):
     from emails.api.send_email import send_template_email
 
+    context = context or {}
     if not patenmatch:
         send_template_email(
             template_name,
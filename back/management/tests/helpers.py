@@ -4,6 +4,7 @@ from rest_framework.test import APIRequestFactory
 
 from management.api import register
 from management.controller import get_user_by_email
+from management.helpers.postal_codes import PostalCodeIndex, set_postal_code_index
 
 valid_register_request_data = dict(
     email="benjamin.tim@gmx.de",
@@ -22,6 +23,29 @@ valid_profile_data = dict(
     birth_year=valid_register_request_data["birth_year"],
 )
 
+POSTAL_CODES = {
+    "10115": (52.5323, 13.3846),
+    "20095": (53.5511, 10.0),
+    "80331": (48.1351, 11.5820),
+}
+
+
+class PostalCodeIndexMixin:
+    """
+    Replaces the process wide postal code index with `postal_codes` during each test, so scoring needs no pgeocode data
+    """
+
+    postal_codes = POSTAL_CODES
+
+    def setUp(self):
+        super().setUp()
+        set_postal_code_index(PostalCodeIndex(self.postal_codes))
+
+    def tearDown(self):
+        set_postal_code_index(None)
+        super().tearDown()
+
+
 GLOB_TEST_USER_COUNT = 0
 CREATED_USERS = []
 
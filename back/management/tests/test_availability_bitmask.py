@@ -0,0 +1,51 @@
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from management.models.profile import Profile
+from management.models.user import User
+from management.validators import DAYS, SLOTS, availability_to_bitmask, bitmask_to_availability
+
+
+class AvailabilityBitmaskTests(TestCase):
+    def _create_user(self):
+        return User.objects.create_user(
+            email="bitmask.test@little-world.com", password="Test123!", first_name="Bit", last_name="Mask"
+        )
+
+    def test_bitmask_roundtrip(self):
+        availability = {day: [] for day in DAYS}
+        availability["mo"] = ["08_10", "20_22"]
+        availability["su"] = SLOTS
+        mask = availability_to_bitmask(availability)
+
+        assert mask.bit_count() == 2 + len(SLOTS)
+        assert bitmask_to_availability(mask) == availability
+        assert availability_to_bitmask(None) == 0
+        assert availability_to_bitmask({"mo": ["unknown"]}) == 0
+
+    def test_profile_save_updates_bitmask(self):
+        profile = self._create_user().profile
+        assert profile.availability_bitmask == 0
+
+        profile.availability = {**profile.availability, "we": ["12_14", "14_16"]}
+        profile.save(update_fields=["availability"])
+        profile.refresh_from_db()
+
+        assert profile.availability_bitmask == availability_to_bitmask(profile.availability)
+        assert bitmask_to_availability(profile.availability_bitmask)["we"] == ["12_14", "14_16"]
+
+    def test_backfill_command(self):
+        profile = self._create_user().profile
+        profile.availability = {**profile.availability, "tu": ["10_12"]}
+        profile.save()
+
+        # Queryset updates bypass `Profile.save`
+        Profile.objects.filter(id=profile.id).update(availability_bitmask=0)
+        with self.assertRaises(CommandError):
+            call_command("backfill_availability_bitmask", "--check")
+
+        call_command("backfill_availability_bitmask")
+        call_command("backfill_availability_bitmask", "--check")
+
+        profile.refresh_from_db()
+        assert profile.availability_bitmask == availability_to_bitmask(profile.availability)
@@ -0,0 +1,90 @@
+import itertools
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from management.api.availability_optimizer import FLAT_ALL_SLOTS, best_slot_combinations
+from management.api.user_advanced_statistics import time_slot_combination_optimization
+from management.models.user import User
+
+
+def brute_force(slot_matrix, n, disallow_same_day_combinations=False):
+    combinations = []
+    for combination in itertools.combinations(range(slot_matrix.shape[1]), n):
+        days = [FLAT_ALL_SLOTS[i].split("__")[0] for i in combination]
+        if disallow_same_day_combinations and len(set(days)) != len(days):
+            continue
+        covered = int(slot_matrix[:, list(combination)].any(axis=1).sum())
+        combinations.append((covered, tuple(sorted(FLAT_ALL_SLOTS[i] for i in combination))))
+    return sorted(combinations, reverse=True)
+
+
+class AvailabilityOptimizerTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        # 21 slots = the first 3 days, skewed so some slots are a lot more popular than others
+        self.slot_matrix = rng.random((400, 21)) < rng.uniform(0.02, 0.4, size=21)
+
+    def test_equals_brute_force(self):
+        for disallow_same_day_combinations in [False, True]:
+            results, combinations_tested, exact = best_slot_combinations(
+                self.slot_matrix,
+                [1, 2, 3, 4],
+                top_k=25,
+                disallow_same_day_combinations=disallow_same_day_combinations,
+                slot_names=FLAT_ALL_SLOTS[:21],
+            )
+            assert exact
+            for n in [1, 2, 3, 4]:
+                expected = brute_force(self.slot_matrix, n, disallow_same_day_combinations)
+                assert [covered for covered, _ in results[n]] == [covered for covered, _ in expected[:25]], n
+                for covered, combination in results[n]:
+                    assert (covered, combination) in expected
+
+            # the search prunes most of the 8000 combinations of size 4
+            assert combinations_tested < len(brute_force(self.slot_matrix, 4))
+
+    def test_node_budget_falls_back_to_greedy(self):
+        results, _, exact = best_slot_combinations(
+            self.slot_matrix, [4, 21], top_k=25, slot_names=FLAT_ALL_SLOTS[:21], max_nodes=10
+        )
+        assert not exact
+        expected = brute_force(self.slot_matrix, 4)
+        assert results[4]
+        for covered, combination in results[4]:
+            assert (covered, combination) in expected
+        # the greedy fallback still finds the combinations that need every slot
+        assert results[21] == [(int(self.slot_matrix.any(axis=1).sum()), tuple(sorted(FLAT_ALL_SLOTS[:21])))]
+
+    def test_more_slots_than_available(self):
+        results, _, _ = best_slot_combinations(self.slot_matrix[:, :2], [3], slot_names=FLAT_ALL_SLOTS[:2])
+        assert results == {3: []}
+
+
+class TimeSlotCombinationOptimizationTests(TestCase):
+    def test_endpoint(self):
+        admin = User.objects.create_superuser(
+            email="slot.optimizer.admin@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+        availabilities = [{"mo": ["08_10"]}, {"mo": ["08_10"], "tu": ["18_20"]}, {"tu": ["18_20"]}, {"mo": ["08_10"]}]
+        for i, availability in enumerate(availabilities):
+            usr = User.objects.create_user(
+                email=f"slot.optimizer{i}@little-world.com", password="Test123!", first_name="Slot", last_name="Test"
+            )
+            usr.profile.availability = availability
+            usr.profile.save()
+
+        request = APIRequestFactory().get("/optimization/", {"consider_lower_n_combs": "true", "top_n_results": 3})
+        force_authenticate(request, user=admin)
+        data = time_slot_combination_optimization(request, n=2).data
+
+        assert data["exact"]
+        assert data["best_coverage_by_size"][1]["combination"] == ["mo__08_10"]
+        assert data["best_coverage_by_size"][2] == {
+            "combination": ["mo__08_10", "tu__18_20"],
+            "users_covered": 4,
+            "coverage_percentage": round(4 / data["total_users"] * 100, 2),
+        }
+        assert len(data["top_combinations"]) == 3
+        assert data["top_combinations"][0]["combination"] == ["mo__08_10", "tu__18_20"]
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from management.api.bucket_memberships import get_refreshed_at, refresh_bucket_memberships
+from management.api.user_advanced_statistics import get_bucket_statistics
+from management.models.stats import BucketMembership, BucketRefresh
+from management.models.unconfirmed_matches import ProposedMatch
+from management.models.user import User
+
+# filters that don't use PostgreSQL only lookups
+SQLITE_LISTS = [
+    "all",
+    "journey_v2__user_created",
+    "journey_v2__email_verified",
+    "journey_v2__marked_unresponsive",
+    "users_with_open_proposals",
+]
+
+USER = BucketMembership.Kind.USER
+
+
+def counts(stats):
+    return {bucket["name"]: bucket["count"] for bucket in stats["buckets"]}
+
+
+class BucketMembershipTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f"bucket.membership{i}@little-world.com",
+                password="Test123!",
+                first_name="Bucket",
+                last_name="Test",
+            )
+            for i in range(5)
+        ]
+        self.users[1].state.email_authenticated = True
+        self.users[1].state.save()
+        ProposedMatch.objects.create(user1=self.users[0], user2=self.users[2], closed=False)
+
+    def members(self, name):
+        return set(BucketMembership.objects.filter(kind=USER, bucket=name).values_list("object_id", flat=True))
+
+    def test_refresh_stores_members(self):
+        summary = refresh_bucket_memberships(kinds=[USER], names=SQLITE_LISTS)
+
+        assert self.members("journey_v2__email_verified") == {self.users[1].id}
+        assert self.members("users_with_open_proposals") == {self.users[0].id, self.users[2].id}
+        assert summary[f"{USER}:users_with_open_proposals"] == {"added": 2, "removed": 0}
+        assert get_refreshed_at(USER, SQLITE_LISTS) is not None
+
+    def test_refresh_only_writes_changes(self):
+        refresh_bucket_memberships(kinds=[USER], names=SQLITE_LISTS)
+
+        self.users[1].state.unresponsive = True
+        self.users[1].state.save()
+        summary = refresh_bucket_memberships(kinds=[USER], names=SQLITE_LISTS)
+
+        assert summary[f"{USER}:journey_v2__marked_unresponsive"] == {"added": 1, "removed": 0}
+        assert summary[f"{USER}:all"] == {"added": 0, "removed": 0}
+        assert self.members("journey_v2__marked_unresponsive") == {self.users[1].id}
+
+    def test_statistics_read_fresh_memberships(self):
+        users = User.objects.filter(email__startswith="bucket.membership")
+        live = get_bucket_statistics(users, selected_filters=SQLITE_LISTS)
+        assert live["refreshed_at"] is None
+
+        refresh_bucket_memberships(kinds=[USER], names=SQLITE_LISTS)
+        materialized = get_bucket_statistics(users, selected_filters=SQLITE_LISTS)
+        assert materialized["refreshed_at"] is not None
+        assert counts(materialized) == counts(live)
+        assert materialized["missing_ids"] == live["missing_ids"]
+        assert materialized["intersecting_ids_lists"] == live["intersecting_ids_lists"]
+
+        # stale memberships are not used anymore
+        BucketRefresh.objects.update(refreshed_at=timezone.now() - timedelta(days=1))
+        assert get_bucket_statistics(users, selected_filters=SQLITE_LISTS)["refreshed_at"] is None
+
+    def test_failing_bucket_is_marked(self):
+        summary = refresh_bucket_memberships(kinds=[USER], names=["journey_v2__user_form_completed"])
+
+        assert "error" in summary[f"{USER}:journey_v2__user_form_completed"]
+        assert BucketRefresh.objects.get(kind=USER, bucket="journey_v2__user_form_completed").failed
+        assert get_refreshed_at(USER, ["journey_v2__user_form_completed"]) is None
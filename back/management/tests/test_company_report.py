@@ -0,0 +1,115 @@
+import csv
+import io
+import tempfile
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from video.models import LivekitSession
+
+from management.api.company_report import CompanyReport
+from management.api.user_advanced_statistics import comany_video_call_and_matching_report
+from management.models.matches import Match
+from management.models.user import User
+from management.tasks import export_company_report
+
+
+class CompanyReportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="company.report.admin@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+        self.users = []
+        for i in range(4):
+            usr = User.objects.create_user(
+                email=f"company.report{i}@little-world.com", password="Test123!", first_name="Report", last_name="Test"
+            )
+            if i < 3:
+                usr.state.company = "accenture"
+                usr.state.save()
+            self.users.append(usr)
+        self.outsider = self.users[3]
+
+    def _match(self, user1, user2, confirmed_by=()):
+        match = Match.objects.create(user1=user1, user2=user2, confirmed=len(confirmed_by) == 2)
+        match.confirmed_by.add(*confirmed_by)
+        return match
+
+    def _call(self, user1, user2, minutes):
+        session = LivekitSession.objects.create(u1=user1, u2=user2, both_have_been_active=True, is_active=False)
+        LivekitSession.objects.filter(pk=session.pk).update(
+            end_time=session.created_at + timedelta(minutes=minutes) if minutes is not None else None
+        )
+
+    def _report(self, report_format):
+        request = APIRequestFactory().post(f"/company_report/?report_format={report_format}")
+        force_authenticate(request, user=self.admin)
+        return comany_video_call_and_matching_report(request, company="accenture")
+
+    def test_report(self):
+        user0, user1, user2 = self.users[:3]
+        self._match(user0, user1, confirmed_by=[user0, user1])
+        self._match(user2, self.outsider, confirmed_by=[self.outsider])
+        Match.objects.create(user1=self.admin, user2=user0, support_matching=True)
+        self._call(user0, user1, 30)
+        self._call(user0, user1, 3 * 60)
+        self._call(user2, self.outsider, 10)
+        self._call(user2, self.outsider, None)
+
+        report = self._report("json").data["report"]
+        assert f"\tMatch with {user1.username} - Confirmed (Both confirmed)" in report
+        assert (
+            f"\tMatch with {self.outsider.username} - Pending Confirmation ({self.outsider.username} confirmed)"
+            in report
+        )
+        assert self.admin.username not in report
+        assert f"\tSkipping excessively long video call with {user1.username}: Duration 3:00:00" in report
+        assert f"\tVideo call with {self.outsider.username}: Status: Inactive" in report
+        assert f"Total Video Time for {user0.username}: 30.00 minutes" in report
+        assert f"Total Video Time for {user2.username}: 10.00 minutes" in report
+        # calls between two users of the company count for both of them
+        assert "Total Video Time for All Users: 70.00 minutes" in report
+        assert f"User: {self.outsider.username}" not in report
+
+        text = b"".join(self._report("text").streaming_content).decode()
+        assert text == report
+
+        rows = list(csv.reader(io.StringIO(b"".join(self._report("csv").streaming_content).decode())))
+        assert rows[0] == ["user", "record", "partner", "status", "details", "duration_minutes"]
+        assert rows[-1] == ["", "total", "", "", "", "70.00"]
+        assert [user2.username, "total", "", "", "", "10.00"] in rows
+
+    def test_query_count_is_constant(self):
+        self._match(self.users[0], self.users[1])
+        self._call(self.users[0], self.users[1], 10)
+        with CaptureQueriesContext(connection) as small:
+            list(CompanyReport("accenture").lines())
+
+        for i in range(5):
+            usr = User.objects.create_user(
+                email=f"company.report.more{i}@little-world.com",
+                password="Test123!",
+                first_name="More",
+                last_name="Test",
+            )
+            usr.state.company = "accenture"
+            usr.state.save()
+            self._match(usr, self.users[i % 3], confirmed_by=[usr])
+            self._call(usr, self.users[i % 3], 20)
+        with CaptureQueriesContext(connection) as large:
+            list(CompanyReport("accenture").lines())
+
+        assert len(small.captured_queries) == len(large.captured_queries)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_export_task(self):
+        self._call(self.users[0], self.users[1], 30)
+        result = export_company_report("accenture")
+
+        assert result["filename"] == "company_report_accenture.csv"
+        with default_storage.open(result["export_path"]) as file:
+            rows = list(csv.reader(io.StringIO(file.read().decode())))
+        assert rows[-1] == ["", "total", "", "", "", "60.00"]
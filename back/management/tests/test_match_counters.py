@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from chat.models import Chat, Message
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from video.models import LivekitSession
+
+from management.api.match_counters import sync_match_counters
+from management.models.matches import Match
+from management.models.user import User
+
+
+class MatchCounterTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f"match.counters{i}@little-world.com", password="Test123!", first_name="Counter", last_name="Test"
+            )
+            for i in range(5)
+        ]
+        self.now = timezone.now()
+
+    def _match(self, user1, user2):
+        return Match.objects.create(user1=user1, user2=user2)
+
+    def _messages(self, sender, recipient, days_ago):
+        chat = Chat.get_or_create_chat(sender, recipient)
+        for days in days_ago:
+            message = Message.objects.create(chat=chat, sender=sender, recipient=recipient, text="Hi")
+            Message.objects.filter(pk=message.pk).update(created=self.now - timedelta(days=days))
+
+    def _call(self, user1, user2, days_ago, both_have_been_active=True):
+        session = LivekitSession.objects.create(u1=user1, u2=user2, both_have_been_active=both_have_been_active)
+        LivekitSession.objects.filter(pk=session.pk).update(created_at=self.now - timedelta(days=days_ago))
+
+    def test_sync(self):
+        user0, user1, user2, user3, user4 = self.users
+        match = self._match(user0, user1)
+        self._messages(user0, user1, [5, 3])
+        self._messages(user1, user0, [4])
+        self._call(user1, user0, 2)
+        self._call(user0, user1, 1, both_have_been_active=False)
+
+        messages_only = self._match(user2, user3)
+        self._messages(user3, user2, [1])
+        self._messages(user3, user4, [1])
+
+        stale = self._match(user4, user0)
+        Match.objects.filter(pk=stale.pk).update(total_messages_counter=7, total_mutal_video_calls_counter=2)
+
+        latest_interaction_at = messages_only.latest_interaction_at
+        changes = sync_match_counters()
+
+        match.refresh_from_db()
+        assert match.total_messages_counter == 3
+        assert match.total_mutal_video_calls_counter == 1
+        assert match.latest_interaction_at == self.now - timedelta(days=2)
+        assert match.confirmed
+
+        messages_only.refresh_from_db()
+        assert messages_only.total_messages_counter == 1
+        assert messages_only.total_mutal_video_calls_counter == 0
+        assert messages_only.confirmed
+        # only set when there are messages and calls
+        assert messages_only.latest_interaction_at == latest_interaction_at
+
+        stale.refresh_from_db()
+        assert (stale.total_messages_counter, stale.total_mutal_video_calls_counter) == (0, 0)
+        assert not stale.confirmed
+
+        assert changes[stale.pk] == {"total_messages_counter": (7, 0), "total_mutal_video_calls_counter": (2, 0)}
+        assert sync_match_counters() == {}
+
+    def test_dry_run(self):
+        match = self._match(self.users[0], self.users[1])
+        self._messages(self.users[0], self.users[1], [1])
+
+        changes = sync_match_counters(dry_run=True)
+
+        assert changes == {match.pk: {"total_messages_counter": (0, 1), "confirmed": (False, True)}}
+        match.refresh_from_db()
+        assert match.total_messages_counter == 0
+        assert not match.confirmed
+
+    def test_query_count_is_constant(self):
+        self._match(self.users[0], self.users[1])
+        self._messages(self.users[0], self.users[1], [1])
+        with CaptureQueriesContext(connection) as small:
+            sync_match_counters(chunk_size=10)
+
+        for i, (user1, user2) in enumerate([(1, 2), (2, 3), (3, 4), (4, 0)]):
+            self._match(self.users[user1], self.users[user2])
+            self._messages(self.users[user2], self.users[user1], [i])
+            self._call(self.users[user1], self.users[user2], i)
+        with CaptureQueriesContext(connection) as large:
+            sync_match_counters(chunk_size=10)
+
+        assert len(small.captured_queries) == len(large.captured_queries)
+
+    def test_sync_single_match(self):
+        match = self._match(self.users[0], self.users[1])
+        other = self._match(self.users[2], self.users[3])
+        self._messages(self.users[0], self.users[1], [1, 2])
+        self._messages(self.users[2], self.users[3], [1])
+
+        match.sync_counters()
+
+        assert match.total_messages_counter == 2
+        other.refresh_from_db()
+        assert other.total_messages_counter == 0
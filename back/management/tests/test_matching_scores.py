@@ -0,0 +1,111 @@
+from django.db.models import F
+from django.test import TestCase
+
+from management.models.profile import Profile
+from management.models.scores import MatchingScoreDirtyUser, TwoUserMatchingScore, TwoUserMatchingScoreWriter
+from management.models.state import State
+from management.models.user import User
+from management.tasks import incremental_update_matching_scores
+from management.tests.helpers import PostalCodeIndexMixin
+
+
+class TwoUserMatchingScoreWriterTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f"score.writer{i}@little-world.com", password="Test123!", first_name="Score", last_name="Writer"
+            )
+            for i in range(4)
+        ]
+
+    def test_save_stores_canonical_order(self):
+        low, high = self.users[0], self.users[1]
+        score = TwoUserMatchingScore.objects.create(user1=high, user2=low)
+        assert (score.user1_id, score.user2_id) == (low.id, high.id)
+        assert TwoUserMatchingScore.get_or_create(high, low).id == score.id
+
+        TwoUserMatchingScore.delete_if_exists(high, low)
+        assert not TwoUserMatchingScore.objects.exists()
+
+    def test_writer_upserts_in_chunks(self):
+        pairs = [(u1.id, u2.id) for u1 in self.users for u2 in self.users if u1.id > u2.id]
+
+        # 6 pairs in chunks of 4 -> 2 queries
+        with self.assertNumQueries(2):
+            with TwoUserMatchingScoreWriter(chunk_size=4) as writer:
+                for user1_id, user2_id in pairs:
+                    writer.add(user1_id, user2_id, 10.0, True, [])
+
+        assert writer.written == len(pairs)
+        assert TwoUserMatchingScore.objects.count() == len(pairs)
+        assert not TwoUserMatchingScore.objects.filter(user1_id__gt=F("user2_id")).exists()
+
+        with TwoUserMatchingScoreWriter() as writer:
+            writer.add(pairs[0][0], pairs[0][1], 42.0, False, [{"score_function": "test"}])
+
+        assert TwoUserMatchingScore.objects.count() == len(pairs)
+        score = TwoUserMatchingScore.objects.get(user1_id=pairs[0][1], user2_id=pairs[0][0])
+        assert score.score == 42.0
+        assert not score.matchable
+        assert score.scoring_results == [{"score_function": "test"}]
+
+
+class IncrementalMatchingScoreTests(PostalCodeIndexMixin, TestCase):
+    postal_codes = {}
+
+    def setUp(self):
+        super().setUp()
+        self.users = [
+            User.objects.create_user(
+                email=f"score.dirty{i}@little-world.com", password="Test123!", first_name="Score", last_name="Dirty"
+            )
+            for i in range(3)
+        ]
+        for usr in self.users:
+            profile = usr.profile
+            profile.user_type = Profile.TypeChoices.VOLUNTEER
+            profile.save()
+
+            state = usr.state
+            state.searching_state = State.SearchingStateChoices.SEARCHING
+            state.user_form_state = State.UserFormStateChoices.FILLED
+            state.had_prematching_call = True
+            state.email_authenticated = True
+            state.save()
+
+    def test_only_scoring_fields_mark_users(self):
+        MatchingScoreDirtyUser.objects.all().delete()
+
+        profile = Profile.objects.get(user=self.users[0])
+        profile.description = "Not relevant for scoring"
+        # only the update, the scoring fields are compared to the values loaded with the profile
+        with self.assertNumQueries(1):
+            profile.save()
+        assert not MatchingScoreDirtyUser.objects.exists()
+
+        profile.postal_code = "10115"
+        profile.save(update_fields=["postal_code"])
+        assert list(MatchingScoreDirtyUser.objects.values_list("user_id", flat=True)) == [self.users[0].id]
+
+        MatchingScoreDirtyUser.objects.all().delete()
+        profile.save()
+        assert not MatchingScoreDirtyUser.objects.exists()
+
+        profile.availability["mo"].append("08_10")
+        profile.save()
+        assert list(MatchingScoreDirtyUser.objects.values_list("user_id", flat=True)) == [self.users[0].id]
+
+    def test_rescores_dirty_users_and_drops_users_leaving_pool(self):
+        incremental_update_matching_scores()
+        assert not MatchingScoreDirtyUser.objects.exists()
+        assert TwoUserMatchingScore.objects.count() == 3
+
+        state = self.users[2].state
+        state.searching_state = State.SearchingStateChoices.IDLE
+        state.save()
+
+        res = incremental_update_matching_scores()
+        assert res["scores_cleaned"] == 2
+        assert res["scores_updated"] == 0
+        assert TwoUserMatchingScore.objects.count() == 1
+        assert not MatchingScoreDirtyUser.objects.exists()
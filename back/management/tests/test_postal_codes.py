@@ -0,0 +1,47 @@
+import math
+import os
+import tempfile
+from unittest import mock
+from urllib.error import URLError
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from management.helpers.postal_codes import PostalCodeIndex, load_postal_code_index
+from management.tests.helpers import POSTAL_CODES
+
+
+class PostalCodeIndexTests(SimpleTestCase):
+    def test_distances(self):
+        index = PostalCodeIndex(POSTAL_CODES)
+
+        assert index.distance("10115", "10115") == 0.0
+        assert 250 < index.distance("10115", "20095") < 260
+        assert math.isnan(index.distance("10115", "00000"))
+        assert index.distance(" 10115 ", "20095") == index.distance("10115", "20095")
+
+        codes = ["20095", "80331", "00000"]
+        distances = index.distances("10115", codes)
+        matrix = index.distance_matrix(["10115", "80331"], codes)
+        assert matrix.shape == (2, 3)
+        assert np.array_equal(distances, matrix[0], equal_nan=True)
+        assert matrix[1, 1] == 0.0
+        assert [index.distance("10115", code) for code in codes[:2]] == distances[:2].tolist()
+
+    def test_local_file_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "postal_codes_de.csv")
+            PostalCodeIndex(POSTAL_CODES).save(path)
+
+            index = load_postal_code_index(path)
+            assert index.coordinates_by_code == POSTAL_CODES
+
+    def test_missing_file_without_network(self):
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            mock.patch.object(PostalCodeIndex, "from_pgeocode", side_effect=URLError("offline")),
+        ):
+            with self.assertLogs("management.helpers.postal_codes", level="WARNING") as logs:
+                index = load_postal_code_index(os.path.join(tmp_dir, "postal_codes_de.csv"))
+        assert len(index) == 0
+        assert "is missing" in logs.output[0]
@@ -0,0 +1,150 @@
+import random
+
+import numpy as np
+import pgeocode
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from management.api.scores import PairRelationshipIndex, ScoringBase, ScoringProfiler, profile_scoring_functions
+from management.api.scores_batch import SCORING_FUNCTIONS, BatchScoringEngine
+from management.helpers.postal_codes import haversine_distance
+from management.models.matches import Match
+from management.models.profile import Profile
+from management.models.unconfirmed_matches import ProposedMatch
+from management.models.user import User
+from management.scores_benchmark import create_synthetic_population
+from management.tests.helpers import POSTAL_CODES as BASE_POSTAL_CODES
+from management.tests.helpers import PostalCodeIndexMixin
+from management.validators import DAYS, SLOTS
+
+POSTAL_CODES = {
+    **BASE_POSTAL_CODES,
+    "50667": (50.9384, 6.9584),
+    "14467": (52.3989, 13.0657),
+}
+
+
+class BatchScoringTests(PostalCodeIndexMixin, TestCase):
+    postal_codes = POSTAL_CODES
+
+    def _create_users(self, amount=12, seed=42):
+        rand = random.Random(seed)
+        users = []
+        for i in range(amount):
+            usr = User.objects.create_user(
+                email=f"batch.scoring{i}@little-world.com",
+                password="Test123!",
+                first_name=f"User{i}",
+                last_name="Test",
+            )
+            profile = usr.profile
+            profile.user_type = Profile.TypeChoices.LEARNER if i % 2 else Profile.TypeChoices.VOLUNTEER
+            profile.availability = {day: rand.sample(SLOTS, rand.randint(0, 3)) for day in DAYS}
+            profile.lang_skill = [
+                {"lang": "german", "level": rand.choice(Profile.LanguageSkillChoices.values)},
+            ]
+            profile.min_lang_level_partner = rand.choice(Profile.MinLangLevelPartnerChoices.values)
+            profile.gender = rand.choice(Profile.GenderChoices.values)
+            profile.partner_gender = rand.choice([Profile.PartnerGenderChoices.ANY, profile.gender])
+            profile.target_group = rand.choice(Profile.TargetGroupChoices2.values)
+            profile.target_groups = rand.sample(Profile.TargetGroupChoices2.values, rand.randint(0, 2))
+            profile.interests = rand.sample(Profile.InterestChoices.values, rand.randint(0, 8))
+            profile.postal_code = rand.choice([*POSTAL_CODES, "99999"])
+            profile.save()
+            users.append(usr)
+        return users
+
+    def test_scoring_functions_order(self):
+        assert SCORING_FUNCTIONS == list(ScoringBase(None, None).scoring_fuctions.keys())
+
+    def test_haversine_matches_pgeocode(self):
+        x = np.array([[52.5, 13.4], [48.1, 11.6], [53.6, 10.0]])
+        y = np.array([[50.1, 8.7], [52.5, 13.4], [53.6, 10.0]])
+        assert np.array_equal(haversine_distance(x[:, 0], x[:, 1], y[:, 0], y[:, 1]), pgeocode.haversine_distance(x, y))
+
+    def _create_relations(self, users):
+        Match.objects.create(user1=users[0], user2=users[1], active=True)
+        Match.objects.create(user1=users[3], user2=users[2], active=False)
+        Match.objects.create(user1=users[5], user2=users[4], support_matching=True)
+        ProposedMatch.objects.create(user1=users[6], user2=users[7], closed=False)
+        ProposedMatch.objects.create(user1=users[9], user2=users[8], closed=True)
+
+    def test_relationship_index_equals_queries(self):
+        users = self._create_users(amount=10)
+        self._create_relations(users)
+        relationships = PairRelationshipIndex([usr.id for usr in users])
+
+        checks = ["already_matched_or_proposed", "learner_no_match_bonus", "match_in_past"]
+        for user1 in users:
+            for user2 in users:
+                if user1 == user2:
+                    continue
+                expected = ScoringBase(user1, user2)
+                indexed = ScoringBase(user1, user2, relationships=relationships)
+                with CaptureQueriesContext(connection) as ctx:
+                    results = [indexed.scoring_fuctions[check]() for check in checks]
+                assert not any("match" in query["sql"].lower() for query in ctx.captured_queries)
+                assert results == [expected.scoring_fuctions[check]() for check in checks]
+
+    def test_matrix_equals_single_pair_scoring(self):
+        users = self._create_users()
+        self._create_relations(users)
+
+        result = BatchScoringEngine([usr.id for usr in users]).calculate()
+        users_by_id = {usr.id: usr for usr in users}
+
+        pairs = [pair for chunk in result.iter_pairs(chunk_size=7) for pair in chunk]
+        assert len(pairs) == 6 * 6
+        assert any(matchable for _, _, _, matchable, _ in pairs)
+
+        for learner_id, volunteer_id, score, matchable, scoring_results in pairs:
+            total_score, expected_matchable, expected_results = ScoringBase(
+                users_by_id[learner_id], users_by_id[volunteer_id]
+            ).calculate_score()
+            assert score == total_score, (learner_id, volunteer_id)
+            assert matchable == expected_matchable, (learner_id, volunteer_id)
+            for res, expected in zip(scoring_results, expected_results):
+                assert res["score_function"] == expected["score_function"]
+                assert res["res"]["score"] == expected["res"]["score"]
+                assert res["res"]["matchable"] == expected["res"]["matchable"]
+
+    def test_profiler_records_every_function(self):
+        users = self._create_users(amount=10)
+        self._create_relations(users)
+
+        profiler = ScoringProfiler()
+        for user1, user2 in [(users[0], users[1]), (users[2], users[3])]:
+            ScoringBase(user1, user2, profiler=profiler).calculate_score()
+
+        summary = profiler.dict()
+        assert set(summary["functions"]) == set(SCORING_FUNCTIONS)
+        assert all(stats["calls"] == 2 for stats in summary["functions"].values())
+        # without a `PairRelationshipIndex` the relationship checks query the db
+        assert summary["functions"]["already_matched_or_proposed"]["queries"] > 0
+        assert abs(sum(stats["time_share"] for stats in summary["functions"].values()) - 1) < 1e-9
+
+        merged = ScoringProfiler.merge([summary, summary])
+        assert merged["functions"]["gender"]["calls"] == 4
+
+        batch_profiler = ScoringProfiler()
+        result = BatchScoringEngine([usr.id for usr in users], profiler=batch_profiler).calculate()
+        # writing the pairs reuses the scores of the matrix, every function is only counted once
+        for _ in result.iter_pairs(chunk_size=7):
+            pass
+        assert batch_profiler.stats["gender"]["calls"] == 5 * 5
+
+    def test_profile_scoring_functions_api(self):
+        create_synthetic_population(6)
+        admin = User.objects.create_superuser(
+            email="batch.scoring.admin@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+
+        request = APIRequestFactory().get("/api/matching/profile_scoring_functions/", {"sample_pairs": 5})
+        force_authenticate(request, user=admin)
+        response = profile_scoring_functions(request)
+
+        assert response.status_code == 200
+        assert response.data["sample_pairs"] == 5
+        assert set(response.data["functions"]) == set(SCORING_FUNCTIONS)
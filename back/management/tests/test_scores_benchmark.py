@@ -0,0 +1,54 @@
+import random
+from unittest import mock
+
+from django.test import TestCase
+
+from management.api.scores import ScoringBase, get_users_to_consider
+from management.models.user import User
+from management.scores_benchmark import (
+    benchmark_scoring_functions,
+    create_synthetic_population,
+    delete_synthetic_population,
+    random_pairs,
+    run_benchmark,
+)
+from management.tests.helpers import PostalCodeIndexMixin
+
+
+class ScoresBenchmarkTests(PostalCodeIndexMixin, TestCase):
+    def test_synthetic_population_is_in_scoring_pool(self):
+        user_ids = create_synthetic_population(10)
+        assert set(get_users_to_consider().values_list("id", flat=True)) >= set(user_ids)
+
+    def test_vectorized_burst_queries_dont_grow_with_population(self):
+        queries = []
+        for size in [6, 12]:
+            results = {res.name: res for res in run_benchmark(size, sample_users=1, sample_pairs=10)}
+            assert "score__time_slot_overlap" in results
+            assert results["calculate_scores_user"].calls == size - 1
+            queries.append(results["burst_calculate_matching_scores_vectorized"].queries)
+
+        assert queries[0] == queries[1]
+
+    def test_failing_scoring_functions_are_reported(self):
+        user_ids = create_synthetic_population(6)
+        with (
+            mock.patch.object(ScoringBase, "score__gender", side_effect=ValueError("broken")),
+            self.assertLogs("management.scores_benchmark", level="ERROR") as logs,
+        ):
+            results = {res.name: res for res in benchmark_scoring_functions(user_ids, sample_pairs=5)}
+        assert results["score__gender"].errors == 5
+        assert results["score__time_slot_overlap"].errors == 0
+        assert len(logs.records) == 1
+
+    def test_random_pairs(self):
+        pairs = random_pairs(list(range(5)), 100, random.Random(1))
+        # capped at all 10 pairs, every pair only once
+        assert len(pairs) == 10
+        assert len({frozenset(pair) for pair in pairs}) == 10
+        assert all(user1 != user2 for user1, user2 in pairs)
+
+    def test_delete_synthetic_population(self):
+        user_ids = create_synthetic_population(4)
+        delete_synthetic_population()
+        assert not User.objects.filter(id__in=user_ids).exists()
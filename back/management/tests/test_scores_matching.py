@@ -0,0 +1,99 @@
+import itertools
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from management.api.scores_matching import hungarian_assignment, solve_score_maximization
+from management.models.profile import Profile
+from management.models.scores import TwoUserMatchingScore
+from management.models.user import User
+
+
+class HungarianAssignmentTests(SimpleTestCase):
+    def test_equals_brute_force(self):
+        rng = np.random.default_rng(7)
+        for _ in range(100):
+            n = int(rng.integers(1, 5))
+            m = int(rng.integers(n, 6))
+            cost = rng.integers(-20, 20, (n, m)).astype(float)
+
+            row_to_col = hungarian_assignment(cost)
+            best = min(sum(cost[i, cols[i]] for i in range(n)) for cols in itertools.permutations(range(m), n))
+
+            assert len(set(row_to_col.tolist())) == n
+            assert sum(cost[i, row_to_col[i]] for i in range(n)) == best
+
+    def test_deadline_returns_partial_assignment(self):
+        row_to_col = hungarian_assignment(np.zeros((3, 3)), deadline=0)
+        assert row_to_col.tolist() == [-1, -1, -1]
+
+
+class ScoreMaximizationTests(TestCase):
+    def setUp(self):
+        self.learners, self.volunteers = [], []
+        for i in range(6):
+            usr = User.objects.create_user(
+                email=f"score.max{i}@little-world.com", password="Test123!", first_name="Score", last_name="Max"
+            )
+            profile = usr.profile
+            profile.user_type = Profile.TypeChoices.LEARNER if i % 2 else Profile.TypeChoices.VOLUNTEER
+            profile.save()
+            (self.learners if i % 2 else self.volunteers).append(usr)
+
+    def _score(self, user1, user2, score, matchable=True):
+        TwoUserMatchingScore.objects.create(user1=user1, user2=user2, score=score, matchable=matchable)
+
+    def test_maximizes_pairs_then_score(self):
+        l1, l2, l3 = self.learners
+        v1, v2, v3 = self.volunteers
+        # greedy would take (l1, v1) and leave l2 without a partner
+        self._score(l1, v1, 100)
+        self._score(l1, v2, 90)
+        self._score(l2, v1, 80)
+        self._score(l3, v3, 10)
+        self._score(l3, v2, 50, matchable=False)
+
+        result = solve_score_maximization()
+        assert result.method == "hungarian"
+        assert result.total_score == 90 + 80 + 10
+        assert sorted(result.score_ids) == sorted(
+            TwoUserMatchingScore.get_score(learner, volunteer).id
+            for learner, volunteer in [(l1, v2), (l2, v1), (l3, v3)]
+        )
+
+        greedy = solve_score_maximization(time_budget=0)
+        assert greedy.method == "hungarian+greedy"
+        assert greedy.total_score == 100 + 10
+
+        assert solve_score_maximization(max_exact_cells=0).pairs == greedy.pairs
+
+        # only the component of l3 & v3 is small enough for the exact assignment
+        mixed = solve_score_maximization(max_exact_cells=2)
+        assert mixed.method == "hungarian+greedy"
+        assert mixed.pairs == greedy.pairs
+
+    def test_only_one_side_left(self):
+        v1, v2, _ = self.volunteers
+        self._score(v1, v2, 100)
+        assert solve_score_maximization().pairs == []
+
+    def test_components_equal_brute_force(self):
+        rng = np.random.default_rng(11)
+        pairs = list(itertools.product(self.learners, self.volunteers))
+        for _ in range(20):
+            TwoUserMatchingScore.objects.all().delete()
+            edges = [pair for pair in pairs if rng.random() < 0.4]
+            for learner, volunteer in edges:
+                self._score(learner, volunteer, int(rng.integers(0, 100)))
+            scores = {(s.user1_id, s.user2_id): s.score for s in TwoUserMatchingScore.objects.all()}
+
+            best = (0, 0)
+            for size in range(1, len(scores) + 1):
+                for subset in itertools.combinations(scores, size):
+                    users = [user_id for pair in subset for user_id in pair]
+                    if len(set(users)) == len(users):
+                        best = max(best, (size, sum(scores[pair] for pair in subset)))
+
+            result = solve_score_maximization()
+            assert result.method in ("hungarian", "none")
+            assert (len(result.pairs), result.total_score) == best
@@ -0,0 +1,47 @@
+from django.test import TestCase
+
+from management.api.scores import ScoringBase, calculate_scores_user
+from management.api.scores_prefilter import prefilter_candidates, top_k_candidates, upper_bound_score
+from management.models.scores import TwoUserMatchingScore
+from management.models.user import User
+from management.scores_benchmark import create_synthetic_population
+from management.tests.helpers import PostalCodeIndexMixin
+
+
+class ScoresPrefilterTests(PostalCodeIndexMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_ids = create_synthetic_population(24, seed=3)
+        self.users = User.objects.in_bulk(self.user_ids)
+
+    def _profile_values(self, usr):
+        profile = usr.profile
+        return profile.availability_bitmask, profile.gender, profile.partner_gender, profile.interests
+
+    def test_pruned_pairs_are_unmatchable(self):
+        pruned = 0
+        for usr in self.users.values():
+            others = User.objects.filter(id__in=self.user_ids).exclude(id=usr.id)
+            survivors = set(prefilter_candidates(usr, others).values_list("id", flat=True))
+
+            for other in others:
+                total_score, matchable, _ = ScoringBase(usr, other).calculate_score()
+                if other.id in survivors:
+                    bound = upper_bound_score(self._profile_values(usr), self._profile_values(other))
+                    assert total_score <= bound, (usr.id, other.id)
+                else:
+                    pruned += 1
+                    assert not matchable, (usr.id, other.id)
+
+        assert pruned > 0
+
+    def test_top_k_scores_only_best_candidates(self):
+        usr = self.users[self.user_ids[0]]
+        others = User.objects.filter(id__in=self.user_ids).exclude(id=usr.id)
+        top = top_k_candidates(usr, prefilter_candidates(usr, others), 2)
+        assert len(top) == 2
+
+        res = calculate_scores_user(usr.id, report=lambda data: None, top_k=2)
+        assert res["progress"] == len(top)
+        assert res["pruned_candidates"] == len(self.user_ids) - 1 - len(top)
+        assert TwoUserMatchingScore.get_matching_scores(usr, matchable_only=False).count() == len(top)
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+from chat.models import Chat, Message
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from video.models import LivekitSession
+
+from management.api.statistic_rollups import update_statistic_rollups
+from management.api.user_advanced_statistics import livekit_session_statistics, message_statistics, user_signups
+from management.models.profile import Profile
+from management.models.state import State
+from management.models.stats import StatisticRollup, StatisticRollupRefresh
+from management.models.user import User
+
+
+class StatisticRollupTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="rollup.admin@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+        now = timezone.now()
+        self.users = []
+        for i in range(6):
+            usr = User.objects.create_user(
+                email=f"statistic.rollup{i}@little-world.com",
+                password="Test123!",
+                first_name="Rollup",
+                last_name="Test",
+            )
+            User.objects.filter(pk=usr.pk).update(date_joined=now - timedelta(days=i * 5))
+            if i % 2:
+                Profile.objects.filter(user=usr).update(user_type=Profile.TypeChoices.VOLUNTEER)
+            self.users.append(usr)
+        for usr in self.users[:2]:
+            usr.state.company = "accenture"
+            usr.state.save()
+
+        for i, (user1, user2) in enumerate([(self.users[0], self.users[1]), (self.users[2], self.users[3])]):
+            chat = Chat.get_or_create_chat(user1, user2)
+            for days_ago in [0, 1, 9, 40]:
+                message = Message.objects.create(chat=chat, sender=user1, recipient=user2, text="Hi")
+                Message.objects.filter(pk=message.pk).update(created=now - timedelta(days=days_ago + i))
+                session = LivekitSession.objects.create(u1=user1, u2=user2, both_have_been_active=True)
+                LivekitSession.objects.filter(pk=session.pk).update(
+                    created_at=now - timedelta(days=days_ago + i),
+                    end_time=now - timedelta(days=days_ago + i) + timedelta(minutes=30),
+                )
+
+    def _post(self, view, data, query=""):
+        request = APIRequestFactory().post(f"/statistics/{query}", data, format="json")
+        force_authenticate(request, user=self.admin)
+        response = view(request)
+        assert response.status_code == 200, response.data
+        return response.data
+
+    def _live_statistics(self, **data):
+        refreshes = list(StatisticRollupRefresh.objects.all())
+        StatisticRollupRefresh.objects.all().delete()
+        live = self._all_statistics(**data)
+        StatisticRollupRefresh.objects.bulk_create(refreshes)
+        return live
+
+    def _all_statistics(self, **data):
+        start_date = (timezone.localdate() - timedelta(days=60)).isoformat()
+        data = {"start_date": start_date, "end_date": timezone.localdate().isoformat(), **data}
+        return [
+            self._post(user_signups, data),
+            self._post(user_signups, data, "?cumulative=true"),
+            self._post(message_statistics, data),
+            self._post(livekit_session_statistics, data),
+            self._post(livekit_session_statistics, data, "?aggregation=total_time"),
+            self._post(livekit_session_statistics, data, "?aggregation=average_time"),
+        ]
+
+    def test_rollups_equal_live_statistics(self):
+        for data in [{}, {"bucket_size": 7}, {"bucket_size": 30}, {"company": "accenture"}]:
+            live = self._all_statistics(**data)
+            assert all(live), data
+            update_statistic_rollups(base_lists=["all"])
+            assert self._all_statistics(**data) == live, data
+            StatisticRollupRefresh.objects.all().delete()
+
+    def test_incremental_update_and_live_tail(self):
+        update_statistic_rollups(base_lists=["all"])
+        refresh = StatisticRollupRefresh.objects.get(base_list="all")
+        assert refresh.rolled_up_until == timezone.localdate() - timedelta(days=1)
+        # today is not rolled up
+        assert not StatisticRollup.objects.filter(day=timezone.localdate()).exists()
+
+        # an old row outside of the refreshed days stays, the rolled up days are recalculated
+        old_rows = StatisticRollup.objects.filter(day__lt=refresh.rolled_up_until - timedelta(days=1)).count()
+        update_statistic_rollups(base_lists=["all"])
+        assert StatisticRollup.objects.filter(day__lt=refresh.rolled_up_until - timedelta(days=1)).count() == old_rows
+
+        # a signup of today is answered by the live tail
+        before = self._post(user_signups, {"end_date": timezone.localdate().isoformat()})
+        User.objects.create_user(
+            email="statistic.rollup.new@little-world.com", password="Test123!", first_name="New", last_name="Test"
+        )
+        after = self._post(user_signups, {"end_date": timezone.localdate().isoformat()})
+        assert sum(bucket["count"] for bucket in after) == sum(bucket["count"] for bucket in before) + 1
+
+    def test_rollups_of_changing_lists_are_not_used(self):
+        update_statistic_rollups()
+        assert set(StatisticRollupRefresh.objects.values_list("base_list", flat=True)) == {"all", "users_with_company"}
+        data = {"base_list": "users_with_company"}
+        assert self._all_statistics(**data) == self._live_statistics(**data)
+
+        # a user moves into the searching list after the rollup, its history has to show up
+        data = {"base_list": "searching"}
+        before = self._all_statistics(**data)
+        for usr in self.users[:2]:
+            State.objects.filter(user=usr).update(
+                user_form_state=State.UserFormStateChoices.FILLED,
+                email_authenticated=True,
+                had_prematching_call=False,
+                searching_state=State.SearchingStateChoices.SEARCHING,
+            )
+        update_statistic_rollups()
+        after = self._all_statistics(**data)
+        assert after != before
+        assert after == self._live_statistics(**data)
@@ -1,5 +1,7 @@
 from django.test import TestCase
 
+from management.models.user import User
+
 
 class ChangePasswordTests(TestCase):
     def test_password_change_via_api(self):
@@ -9,3 +11,18 @@ class ChangePasswordTests(TestCase):
 class ChangeEmailTests(TestCase):
     def test_email_change(self):
         pass  # TODO!
+
+
+class UserRelatedModelsTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(
+            email="related.models@little-world.com", password="Test123!", first_name="Related", last_name="Models"
+        )
+
+    def test_with_related_loads_relations_once(self):
+        with self.assertNumQueries(1):
+            usr = User.objects.with_related().get(email="related.models@little-world.com")
+            for _ in range(3):
+                assert usr.state.user == usr
+                assert usr.profile.user == usr
+                assert usr.settings.user == usr
@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from management.api.user_advanced import (
+    AdvancedUserSerializer,
+    AdvancedUserViewset,
+    get_match_waiting_time,
+    get_match_waiting_times,
+)
+from management.api.user_advanced_statistics import user_match_waiting_time_statistics
+from management.models.matches import Match
+from management.models.pre_matching_appointment import PreMatchingAppointment
+from management.models.state import State
+from management.models.unconfirmed_matches import ProposedMatch
+from management.models.user import User
+
+
+class AdvancedUserListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="advanced.list.admin@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+        self.users = [
+            User.objects.create_user(
+                email=f"advanced.list{i}@little-world.com", password="Test123!", first_name=f"User{i}", last_name="Test"
+            )
+            for i in range(8)
+        ]
+        for i, usr in enumerate(self.users):
+            state = usr.state
+            state.had_prematching_call = True
+            state.searching_state = State.SearchingStateChoices.SEARCHING
+            state.save()
+            PreMatchingAppointment.objects.create(
+                user=usr, start_time=timezone.now() - timedelta(days=i + 1), end_time=timezone.now() - timedelta(days=i)
+            )
+
+        for i in range(0, len(self.users), 2):
+            user1, user2 = self.users[i], self.users[i + 1]
+            match = Match.objects.create(user1=user1, user2=user2)
+            match.confirmed_by.add(user1)
+            Match.objects.create(user1=user1, user2=user2, active=False)
+            Match.objects.create(user1=self.admin, user2=user1, support_matching=True)
+            ProposedMatch.objects.create(user1=user1, user2=self.users[(i + 3) % len(self.users)], closed=False)
+            ProposedMatch.objects.create(
+                user1=user2, user2=self.users[(i + 4) % len(self.users)], closed=True, rejected=True
+            )
+
+    def _list(self, page_size):
+        request = APIRequestFactory().get(
+            "/api/matching/users/", {"page_size": page_size, "order_by": "id", "search": "advanced.list"}
+        )
+        force_authenticate(request, user=self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = AdvancedUserViewset.as_view({"get": "list"})(request)
+        assert response.status_code == 200
+        return response.data["results"], len(ctx.captured_queries)
+
+    def test_list_equals_single_user_serializer(self):
+        results, _ = self._list(page_size=20)
+        assert len(results) == len(self.users) + 1
+
+        for entry in results:
+            usr = User.objects.get(pk=entry["id"])
+            assert entry == AdvancedUserSerializer(usr).data, usr.email
+
+    def test_list_query_count_is_constant(self):
+        # the first listing creates missing chats
+        self._list(page_size=20)
+
+        _, small_page_queries = self._list(page_size=2)
+        _, large_page_queries = self._list(page_size=8)
+        assert small_page_queries == large_page_queries
+
+
+class MatchWaitingTimeTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="waiting.time.admin@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+        self.users = [
+            User.objects.create_user(
+                email=f"waiting.time{i}@little-world.com", password="Test123!", first_name=f"User{i}", last_name="Test"
+            )
+            for i in range(8)
+        ]
+        for i, usr in enumerate(self.users):
+            state = usr.state
+            state.had_prematching_call = i != 6
+            state.searching_state = State.SearchingStateChoices.SEARCHING
+            state.searching_state_last_updated = timezone.now() - timedelta(days=i)
+            state.save()
+            if i != 7:
+                for days in [i * 10, i * 3]:
+                    PreMatchingAppointment.objects.create(
+                        user=usr,
+                        start_time=timezone.now() - timedelta(days=days, hours=1),
+                        end_time=timezone.now() - timedelta(days=days),
+                    )
+        Match.objects.create(user1=self.users[0], user2=self.users[1], active=False)
+        Match.objects.create(user1=self.admin, user2=self.users[2], support_matching=True)
+
+    def test_bulk_equals_single_user(self):
+        users = User.objects.filter(email__startswith="waiting.time")
+        with CaptureQueriesContext(connection) as ctx:
+            waiting_times = get_match_waiting_times(users)
+        assert len(ctx.captured_queries) == 1
+
+        expected = []
+        for usr in users:
+            waiting_time = get_match_waiting_time(usr)
+            if waiting_time["number_of_days"] is not None:
+                expected.append((usr.id, waiting_time["number_of_days"], waiting_time["first_search"]))
+        assert sorted(waiting_times) == sorted(expected)
+        assert len(expected) == 6
+        assert {first_search for _, _, first_search in expected} == {True, False}
+
+    def test_statistics_distribution(self):
+        end_date = (timezone.localdate() + timedelta(days=1)).isoformat()
+        request = APIRequestFactory().post("/statistics/", {"end_date": end_date}, format="json")
+        force_authenticate(request, user=self.admin)
+        data = user_match_waiting_time_statistics(request).data
+
+        days = [days for _, days, _ in get_match_waiting_times(User.objects.filter(email__startswith="waiting.time"))]
+        assert data["count"] == len(days)
+        assert data["average_waiting_time"] == sum(days) / len(days)
+        assert data["first_search"]["count"] + data["re_search"]["count"] == len(days)
+        assert sum(bucket["count"] for bucket in data["histogram"]) == len(days)
+        assert data["percentiles"]["p50"] == sorted(days)[len(days) // 2 - 1] / 2 + sorted(days)[len(days) // 2] / 2
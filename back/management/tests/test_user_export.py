@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from management.api.user_advanced import AdvancedUserViewset
+from management.api.user_advanced_statistics import company_report_download
+from management.models.profile import Profile
+from management.models.user import User
+from management.tasks import export_users
+
+
+class UserExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="export.admin@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+        self.users = [
+            User.objects.create_user(
+                email=f"user.export{i}@little-world.com", password="Test123!", first_name=f"Export{i}", last_name="Test"
+            )
+            for i in range(5)
+        ]
+        Profile.objects.filter(user=self.users[0]).update(user_type=Profile.TypeChoices.VOLUNTEER)
+        self.users[1].state.unresponsive = True
+        self.users[1].state.save()
+
+    def _export(self, **params):
+        request = APIRequestFactory().get("/api/matching/users_export/", {"search": "user.export", **params})
+        force_authenticate(request, user=self.admin)
+        response = AdvancedUserViewset.as_view({"get": "export"})(request)
+        if response.status_code != 200:
+            return response
+        return b"".join(response.streaming_content).decode()
+
+    def test_json_export_keeps_the_old_format(self):
+        exported = json.loads(self._export())
+
+        exported = {entry["id"]: entry for entry in exported}
+        assert set(exported) == {usr.id for usr in self.users}
+        assert exported[self.users[0].id] == {
+            "id": self.users[0].id,
+            "email": self.users[0].email,
+            "hash": self.users[0].hash,
+            "profile": {
+                "first_name": "Export0",
+                "second_name": "Test",
+                "user_type": Profile.TypeChoices.VOLUNTEER,
+                "postal_code": self.users[0].profile.postal_code,
+                "gender": self.users[0].profile.gender,
+                "birth_year": self.users[0].profile.birth_year,
+            },
+        }
+
+    def test_csv_export_with_columns_and_filter_list(self):
+        rows = list(
+            csv.reader(
+                io.StringIO(
+                    self._export(
+                        export_format="csv",
+                        columns="id,state.company,profile.user_type",
+                        list="journey_v2__marked_unresponsive",
+                    )
+                )
+            )
+        )
+        assert rows == [
+            ["id", "state.company", "profile.user_type"],
+            [str(self.users[1].id), "", Profile.TypeChoices.LEARNER],
+        ]
+
+    def test_unknown_column(self):
+        response = self._export(columns="id,password")
+        assert response.status_code == 400
+
+    def test_export_is_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._export(columns="id,email,profile.first_name,state.searching_state")
+        assert len([query for query in ctx.captured_queries if "management_user" in query["sql"]]) == 1
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_export_task(self):
+        result = export_users(
+            self.admin.pk, {"search": ["user.export"], "list": ["journey_v2__marked_unresponsive"]}, ["id", "email"]
+        )
+
+        with default_storage.open(result["export_path"]) as file:
+            rows = list(csv.reader(io.StringIO(file.read().decode())))
+        assert rows == [["id", "email"], [str(self.users[1].id), self.users[1].email]]
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_export_download_only_for_the_caller(self):
+        result = export_users(self.admin.pk, {"search": ["user.export"]}, ["id", "email"])
+        other_admin = User.objects.create_superuser(
+            email="export.admin2@little-world.com", password="Test123!", first_name="Admin", second_name="Test"
+        )
+
+        def download(view, user):
+            request = APIRequestFactory().get("/download/")
+            force_authenticate(request, user=user)
+            with mock.patch(
+                "management.helpers.report_export.check_task_status",
+                return_value={"state": "SUCCESS", "info": result},
+            ):
+                return view(request, task_id="task")
+
+        users_download = AdvancedUserViewset.as_view({"get": "export_download"})
+        response = download(users_download, self.admin)
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content).decode().startswith("id,email")
+
+        assert download(users_download, other_admin).status_code == 404
+        # the company report url doesn't serve user exports
+        assert download(company_report_download, self.admin).status_code == 404
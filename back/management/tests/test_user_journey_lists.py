@@ -1,6 +1,11 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from management.api.user_advanced_filter_lists import USER_JOURNEY_FILTER_LISTS
+from management.api.user_advanced_filter_lists import USER_JOURNEY_FILTER_LISTS, get_list_by_name
+from management.api.user_advanced_statistics import get_bucket_statistics
+from management.api.user_journey_classifier import classify_users
+from management.models.unconfirmed_matches import ProposedMatch
 from management.models.user import User
 
 from .. import api
@@ -71,3 +76,69 @@ class TestUserJourneyV2(TestCase):
         #    counts[singn_up[i]] = _list.queryset(User.objects.all()).count()
         # print("CC", counts)
         pass
+
+
+# lists without JSONField `__contains` or duration lookups, so they can be evaluated on SQLite
+SQLITE_LISTS = [
+    "all",
+    "journey_v2__user_created",
+    "journey_v2__email_verified",
+    "journey_v2__happy_active",
+    "journey_v2__marked_unresponsive",
+    "users_with_open_proposals",
+]
+
+
+class UserJourneyClassifierTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f"journey.classifier{i}@little-world.com",
+                password="Test123!",
+                first_name="Journey",
+                last_name="Test",
+            )
+            for i in range(6)
+        ]
+        self.users[1].state.email_authenticated = True
+        self.users[1].state.save()
+        self.users[2].state.unresponsive = True
+        self.users[2].state.save()
+        self.users[3].is_active = False
+        self.users[3].save()
+        ProposedMatch.objects.create(user1=self.users[0], user2=self.users[4], closed=False)
+
+    def test_single_scan_equals_filter_querysets(self):
+        users = User.objects.filter(email__startswith="journey.classifier")
+        entries = [get_list_by_name(name) for name in SQLITE_LISTS]
+
+        # some filters query helper ids while the queryset is built, the buckets them selfs are one query
+        with CaptureQueriesContext(connection) as build_ctx:
+            for entry in entries:
+                entry.queryset(qs=users)
+        with CaptureQueriesContext(connection) as ctx:
+            snapshot = classify_users(users, entries)
+        assert len(ctx.captured_queries) == len(build_ctx.captured_queries) + 1
+
+        assert sorted(snapshot.ids) == sorted(usr.id for usr in self.users)
+        for entry in entries:
+            assert snapshot.members[entry.name] == set(entry.queryset(qs=users).values_list("id", flat=True)), (
+                entry.name
+            )
+
+        assert snapshot.bucket_of(self.users[1].id) == "journey_v2__email_verified"
+        assert snapshot.bucket_of(self.users[2].id) == "journey_v2__marked_unresponsive"
+        assert snapshot.bucket_of(self.users[3].id) == "unknown"
+
+    def test_bucket_statistics(self):
+        users = User.objects.filter(email__startswith="journey.classifier")
+        stats = get_bucket_statistics(users, selected_filters=SQLITE_LISTS)
+
+        counts = {bucket["name"]: bucket["count"] for bucket in stats["buckets"]}
+        assert counts["all"] == 6
+        assert counts["journey_v2__email_verified"] == 1
+        assert counts["users_with_open_proposals"] == 2
+        assert stats["missing_ids"] == [self.users[3].id]
+        assert stats["intersecting_ids_lists"] == {
+            "journey_v2__user_created---users_with_open_proposals": {self.users[0].id, self.users[4].id}
+        }
@@ -45,6 +45,7 @@ from management.api.scores import (
     delete_all_matching_scores,
     get_active_burst_calculation,
     list_top_scores,
+    profile_scoring_functions,
     score_maximization_matching,
 )
 from management.api.short_links import api_urls as short_links_api_urls
@@ -198,6 +199,7 @@ view_routes = [
     path("api/admin/optimize_possible_matches/", score_maximization_matching),
     path("api/matching/burst_update_scores/", burst_calculate_matching_scores_v2),
     path("api/matching/get_active_burst_calculation/", get_active_burst_calculation),
+    path("api/matching/profile_scoring_functions/", profile_scoring_functions),
     path("api/admin/delete_all_matching_scores/", delete_all_matching_scores),
     path("api/admin/top_scores/", list_top_scores),
     path("info_card_debug/", main_frontend.debug_info_card, name="info_card"),
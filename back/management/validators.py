@@ -115,6 +115,34 @@ def get_default_availability():
     return {d: [] for d in DAYS}
 
 
+def availability_to_bitmask(availability) -> int:
+    """
+    Encodes an availability dict as integer, bit `DAYS.index(day) * len(SLOTS) + SLOTS.index(slot)` is set per selected slot.
+    Unknown days or slots are ignored, `None` or other invalid values encode as `0` ( no availability ).
+    """
+    if not isinstance(availability, dict):
+        return 0
+
+    mask = 0
+    for d, day in enumerate(DAYS):
+        slots = availability.get(day)
+        if not isinstance(slots, (list, tuple)):
+            continue
+        for s, slot in enumerate(SLOTS):
+            if slot in slots:
+                mask |= 1 << (d * len(SLOTS) + s)
+    return mask
+
+
+def bitmask_to_availability(mask: int) -> dict:
+    """
+    Inverse of `availability_to_bitmask`
+    """
+    return {
+        day: [slot for s, slot in enumerate(SLOTS) if mask & (1 << (d * len(SLOTS) + s))] for d, day in enumerate(DAYS)
+    }
+
+
 def validate_availability(value: dict):
     for day in DAYS:
         assert day in value